@@ -0,0 +1,120 @@
+"""Per-event overhead of the Logs handlers with a 10k-guild logs config.
+
+Compares the old path (two logs.json parses per event) with the
+subscription index, for guilds with logging off and on.
+
+Run from the repo root:  python -m benchmarks.bench_logs_index [guilds] [events]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from cogs.Logs import Logs
+from utils.store import ConfigStore
+
+SUBSCRIBED_EVERY = 20  # 5% of guilds have delete logging turned on
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self.sent = 0
+
+    async def send(self, **kwargs):
+        self.sent += 1
+
+
+class DirectScheduler:
+    # delivery isn't what's being measured here, skip the rate limiting
+    async def send(self, target, priority, *args, **kwargs):
+        return await target.send(*args, **kwargs)
+
+
+class DirectOutbox:
+    # nor is durability: count the batch as sent when it's handed over
+    def put(self, channel, priority, kind, content=None, embeds=(), file=None):
+        channel.sent += 1
+
+
+def make_config(guilds):
+    config = {}
+    for gid in range(guilds):
+        if gid % SUBSCRIBED_EVERY == 0:
+            config[str(gid)] = {"channel": gid, "enabled": ["message_delete", "message_edit"]}
+        else:
+            config[str(gid)] = {"enabled": []}
+    return config
+
+
+def make_payload(guilds, gid, channel):
+    # a delete of a message the message cache doesn't have, but discord.py's does
+    guild = guilds.setdefault(gid, SimpleNamespace(id=gid, get_channel=lambda _id: channel))
+    author = SimpleNamespace(id=1, bot=False)
+    message = SimpleNamespace(id=gid, guild=guild, author=author, channel=channel, content="hello", attachments=[])
+    return SimpleNamespace(guild_id=gid, channel_id=channel.id, message_id=gid, cached_message=message)
+
+
+def old_handler_check(path, message):
+    # Logs._is_enabled + Logs._get_log_channel before the index existed
+    with open(path, "r") as f:
+        data = json.load(f)
+    if "message_delete" not in data.get(str(message.guild_id), {}).get("enabled", []):
+        return None
+    with open(path, "r") as f:
+        data = json.load(f)
+    ch_id = data.get(str(message.guild_id), {}).get("channel")
+    return message.cached_message.guild.get_channel(ch_id) if ch_id else None
+
+
+async def time_handler(handler, messages):
+    start = time.perf_counter()
+    for msg in messages:
+        await handler(msg)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+async def main():
+    guilds = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    channel = FakeChannel(1)
+    by_id = {}
+
+    off = [make_payload(by_id, gid, channel) for gid in range(guilds) if gid % SUBSCRIBED_EVERY][:count]
+    on = [make_payload(by_id, gid, channel) for gid in range(0, guilds, SUBSCRIBED_EVERY)]
+    on = (on * (count // len(on) + 1))[:count]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "logs.json")
+        with open(path, "w") as f:
+            json.dump(make_config(guilds), f, indent=4)
+
+        async def old(msg):
+            old_handler_check(path, msg)
+
+        old_us = await time_handler(old, off[:200])
+
+        store = ConfigStore(os.path.join(tmp, "config.db"))
+        await store.open(watch_interval=0)
+        await store.migrate_json("logs", path)
+        cog = Logs(SimpleNamespace(
+            store=store, scheduler=DirectScheduler(), outbox=DirectOutbox(), archive=None, get_guild=by_id.get
+        ))
+        off_us = await time_handler(cog.on_raw_message_delete, off)
+        on_us = await time_handler(cog.on_raw_message_delete, on)
+        await cog.batcher.close()
+        await store.close()
+
+    print(f"guilds={guilds} subscribed={guilds // SUBSCRIBED_EVERY}")
+    print(f"before, any guild (2x json parse):  {old_us:>10.2f} us/event")
+    print(f"after, logging off (index miss):    {off_us:>10.2f} us/event")
+    print(f"after, logging on (embed + queue):  {on_us:>10.2f} us/event")
+    print(f"log messages sent: {channel.sent} for {len(on)} events")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Messages/sec through prefix resolution, old file-per-message vs PrefixCache.
+
+Run from the repo root:  python -m benchmarks.bench_prefix [guilds] [messages]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from utils.prefixes import PrefixCache
+from utils.store import ConfigStore
+
+DEFAULT_PREFIX = "!"
+
+
+def make_prefix_file(path, guilds):
+    with open(path, "w") as f:
+        json.dump({str(gid): "?" for gid in range(guilds)}, f, indent=4)
+
+
+def old_get_server_prefix(path, message):
+    # what main.get_server_prefix used to do for every message
+    try:
+        with open(path, "r") as f:
+            prefix = json.load(f)
+        return prefix.get(str(message.guild.id), DEFAULT_PREFIX)
+    except:
+        return DEFAULT_PREFIX
+
+
+def run(resolve, messages):
+    start = time.perf_counter()
+    for msg in messages:
+        resolve(msg)
+    return len(messages) / (time.perf_counter() - start)
+
+
+async def main():
+    guilds = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "prefixes.json")
+        make_prefix_file(path, guilds)
+        messages = [SimpleNamespace(guild=SimpleNamespace(id=i % guilds)) for i in range(count)]
+
+        # the old path is orders of magnitude slower, don't make people wait for it
+        old_rate = run(lambda m: old_get_server_prefix(path, m), messages[: max(count // 20, 1)])
+
+        store = ConfigStore(os.path.join(tmp, "config.db"))
+        await store.open(watch_interval=0)
+        await store.migrate_json("prefixes", path, lambda prefix: {"prefix": prefix})
+        cache = PrefixCache(store, DEFAULT_PREFIX)
+        new_rate = run(lambda m: cache.get(m.guild.id), messages)
+        await store.close()
+
+    print(f"guilds={guilds}")
+    print(f"before (json per message): {old_rate:>14,.0f} msg/s")
+    print(f"after  (PrefixCache):      {new_rate:>14,.0f} msg/s")
+    print(f"speedup: {new_rate / old_rate:,.0f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,167 @@
+"""Lightweight stand-ins for the discord.py objects the cogs touch.
+
+Only the attributes and coroutines the cogs actually use are provided.
+REST calls (send, edit, delete) complete immediately and are counted on
+the `Rest` stub instead of going anywhere.
+"""
+import itertools
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import discord
+
+_ids = itertools.count(1_000_000)
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class Rest:
+    """Counts the REST calls the cogs would have made."""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+
+    def hit(self, route: str, count: int = 1):
+        self.calls[route] = self.calls.get(route, 0) + count
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+class DirectScheduler:
+    """SendScheduler stand-in: sends immediately, no rate limiting or queueing."""
+
+    async def send(self, target, priority, *args, **kwargs):
+        return await target.send(*args, **kwargs)
+
+    async def submit(self, route_key, priority, factory):
+        return await factory()
+
+
+class FakeAsset:
+    __slots__ = ("url",)
+
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakeUser:
+    def __init__(self, user_id: Optional[int] = None, name: str = "user", bot: bool = False):
+        self.id = user_id or next_id()
+        self.name = f"{name}{self.id % 10000}"
+        self.discriminator = "0"
+        self.bot = bot
+        self.mention = f"<@{self.id}>"
+        self.display_avatar = FakeAsset(f"https://cdn.example/avatars/{self.id}.png")
+        self.created_at = EPOCH
+
+    def __str__(self):
+        return self.name
+
+
+class FakeMember(FakeUser):
+    def __init__(self, guild: "FakeGuild", user_id: Optional[int] = None, bot: bool = False):
+        super().__init__(user_id, bot=bot)
+        self.guild = guild
+        self.joined_at = EPOCH
+
+
+class FakeMessage:
+    _state = None  # commands.Context reads it, nothing uses it
+
+    def __init__(self, rest: Rest, channel: "FakeChannel", author: FakeUser, content: str,
+                 created_at: Optional[datetime] = None):
+        self._rest = rest
+        self.id = next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.attachments: List[object] = []
+        self.created_at = created_at or discord.utils.utcnow()
+
+    async def edit(self, **kwargs):
+        self._rest.hit("PATCH message")
+        self.content = kwargs.get("content", self.content)
+        return self
+
+    async def delete(self):
+        self._rest.hit("DELETE message")
+        self.channel.remove([self])
+
+
+class FakeChannel:
+    def __init__(self, rest: Rest, guild: "FakeGuild", channel_id: Optional[int] = None):
+        self._rest = rest
+        self.id = channel_id or next_id()
+        self.guild = guild
+        self.name = f"channel-{self.id}"
+        self.mention = f"<#{self.id}>"
+        self.messages: List[FakeMessage] = []  # oldest first
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self._rest.hit("POST message")
+        self.sent += 1
+        return FakeMessage(self._rest, self, self.guild.me, content or "")
+
+    def post(self, author: FakeUser, content: str, age: timedelta = timedelta(0)) -> FakeMessage:
+        """Add a message to the channel's history without a REST call (someone else sent it)."""
+        message = FakeMessage(self._rest, self, author, content, discord.utils.utcnow() - age)
+        self.messages.append(message)
+        return message
+
+    async def history(self, limit: Optional[int] = 100, before=None):
+        messages = self.messages
+        if before is not None:
+            messages = [m for m in messages if m.id < before.id]
+        for message in reversed(messages[-limit:] if limit else messages):
+            yield message
+
+    async def delete_messages(self, messages):
+        self._rest.hit("POST bulk-delete")
+        self.remove(messages)
+
+    def remove(self, messages):
+        gone = {m.id for m in messages}
+        self.messages = [m for m in self.messages if m.id not in gone]
+
+
+class FakeGuild:
+    def __init__(self, rest: Rest, guild_id: Optional[int] = None, channels: int = 2):
+        self._rest = rest
+        self.id = guild_id or next_id()
+        self.name = f"guild-{self.id}"
+        self.shard_id = 0
+        self.me = FakeMember(self, bot=True)
+        self.members: List[FakeMember] = []
+        self.member_count = 0
+        self.channels = [FakeChannel(rest, self) for _ in range(channels)]
+        self._channels = {c.id: c for c in self.channels}
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def add_member(self, bot: bool = False) -> FakeMember:
+        member = FakeMember(self, bot=bot)
+        self.members.append(member)
+        self.member_count += 1
+        return member
+
+
+class FakeContext:
+    """Enough of commands.Context for the prefix commands being replayed."""
+
+    def __init__(self, message: FakeMessage, prefix: str = "!"):
+        self.message = message
+        self.channel = message.channel
+        self.guild = message.guild
+        self.author = message.author
+        self.prefix = prefix
+        self.clean_prefix = prefix
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
@@ -0,0 +1,225 @@
+"""End-to-end load test: main.py against a local mock Discord, fully offline.
+
+Starts benchmarks/mock_discord.py, seeds a fresh config store so a share
+of the guilds send welcomes and logs, runs main.py as a subprocess
+pointed at the mock, waits until it answers a `!help` probe, and then
+streams gateway events at it for a while. Every second it prints the
+event rate the bot is absorbing, REST calls and 429s, the bot's RSS and
+the latency of a `!help` probe (gateway event in, message POST out).
+
+Run from the repo root:
+  python -m benchmarks.loadtest --guilds 1000 --rate 2000 --duration 30
+  python -m benchmarks.loadtest --guilds 10000 --members 5 --rate 0 --shards 4
+
+--rate 0 sends as fast as the bot's socket takes them, which measures the
+sustained throughput; the drain time at the end shows how far behind the
+bot fell (events still sitting in socket buffers). The bot's own output
+goes to --bot-log.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.mock_discord import MockDiscord
+from utils.store import ConfigStore
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = "!help"
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        kind, weight = part.split("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def seed_config(path: str, mock: MockDiscord, welcome_share: float, logs_share: float):
+    store = ConfigStore(path)
+    await store.open(watch_interval=0)
+    for guild in mock.guilds:
+        share = guild.index / len(mock.guilds)
+        if share < welcome_share:
+            await store.update("welcome", guild.id, {"channel": guild.channels[0]})
+        if share < logs_share:
+            await store.update("logs", guild.id, {
+                "channel": guild.channels[-1],
+                "enabled": ["member_join", "member_remove", "message_delete", "message_edit"],
+            })
+    await store.close()
+
+
+async def probe(mock: MockDiscord, timeout: float) -> Optional[float]:
+    """Seconds from sending `!help` to the bot posting its reply, None on timeout."""
+    guild = mock.guilds[-1]
+    channel_id = guild.channels[0]
+    reply = mock.wait_for_send(channel_id)
+    start = time.perf_counter()
+    if not await mock.send_event("message", guild, content=PROBE, channel_id=channel_id):
+        return None
+    try:
+        return await asyncio.wait_for(reply, timeout) - start
+    except asyncio.TimeoutError:
+        return None
+
+
+async def flood(mock: MockDiscord, rate: float, duration: float, mix: Dict[str, float]):
+    kinds, weights = list(mix), list(mix.values())
+    rng = random.Random(2)
+    deadline = time.monotonic() + duration
+    sent = 0
+    start = time.monotonic()
+    while time.monotonic() < deadline:
+        if rate:
+            due = int((time.monotonic() - start) * rate) - sent
+            if due <= 0:
+                await asyncio.sleep(0.005)
+                continue
+        else:
+            # writes only block once the socket buffer is full; let the reporter run
+            await asyncio.sleep(0)
+            due = 100
+        for kind in rng.choices(kinds, weights, k=due):
+            await mock.send_event(kind)
+        sent += due
+
+
+async def report(mock: MockDiscord, bot: subprocess.Popen, duration: float, samples: List[dict]):
+    # probes run in the background so a slow reply doesn't stretch the sample interval
+    last, last_time = dict(mock.stats), time.monotonic()
+    pending: Optional[asyncio.Task] = None
+    for second in range(int(duration)):
+        await asyncio.sleep(1)
+        latency, probe_text = None, "waiting"
+        if pending is not None and pending.done():
+            latency = pending.result()
+            probe_text = "timeout" if latency is None else f"{latency * 1000:.0f} ms"
+            pending = None
+        if pending is None:
+            pending = asyncio.create_task(probe(mock, timeout=30))
+
+        stats, now = dict(mock.stats), time.monotonic()
+        elapsed = now - last_time
+        sample = {
+            "events": (stats["events"] - last["events"]) / elapsed,
+            "rest": (stats["rest"] - last["rest"]) / elapsed,
+            "rate_limited": (stats["rate_limited"] - last["rate_limited"]) / elapsed,
+            "rss_mb": rss_mb(bot.pid),
+            "probe_ms": latency * 1000 if latency is not None else None,
+        }
+        samples.append(sample)
+        last, last_time = stats, now
+        print(
+            f"{second + 1:>4}s  {sample['events']:>7.0f} events/s  {sample['rest']:>5.0f} REST/s  "
+            f"{sample['rate_limited']:>4.0f} 429/s  RSS {sample['rss_mb'] or 0:>6.0f} MiB  probe {probe_text}"
+        )
+    if pending is not None:
+        pending.cancel()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test main.py against a local mock Discord")
+    parser.add_argument("--guilds", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=20, help="cached members per guild at startup")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=1000, help="events per second, 0 for as fast as the bot reads")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--mix", default="message=70,edit=10,delete=10,join=10")
+    parser.add_argument("--welcome", type=float, default=0.5, help="share of guilds with welcome messages on")
+    parser.add_argument("--logs", type=float, default=0.2, help="share of guilds with logging on")
+    parser.add_argument("--profile", default="standard", help="BOT_PROFILE for the bot")
+    parser.add_argument("--bot-log", help="file for the bot's output (default: a temp file)")
+    args = parser.parse_args()
+
+    mock = MockDiscord(guilds=args.guilds, members=args.members)
+    await mock.start()
+    tmp = tempfile.mkdtemp(prefix="loadtest-")
+    config_db = os.path.join(tmp, "config.db")
+    await seed_config(config_db, mock, args.welcome, args.logs)
+
+    env = dict(
+        os.environ,
+        DISCORD_TOKEN="mock-token",
+        DISCORD_API_BASE=mock.api_base,
+        DISCORD_GATEWAY_URL=mock.gateway_url,
+        CONFIG_DB=config_db,
+        TREE_STATE=os.path.join(tmp, "tree_sync.json"),
+        ARCHIVE_DIR=os.path.join(tmp, "archive"),
+        CARD_CACHE_DIR=os.path.join(tmp, "card_cache"),
+        OUTBOX_DB=os.path.join(tmp, "outbox.db"),
+        BOT_PROFILE=args.profile,
+        METRICS_PORT="0",
+        PYTHONUNBUFFERED="1",
+    )
+    if args.shards > 1:
+        env["SHARD_COUNT"] = str(args.shards)
+    log_path = args.bot_log or os.path.join(tmp, "bot.log")
+    log = open(log_path, "w")
+    bot = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, "main.py")], env=env, cwd=BASE_DIR,
+                           stdout=log, stderr=subprocess.STDOUT)
+    print(f"mock Discord on {mock.api_base}, {args.guilds} guilds; bot pid {bot.pid}, log {log_path}")
+
+    try:
+        start = time.perf_counter()
+        await mock.wait_ready(args.shards, timeout=300)
+        # GUILD_CREATEs are sent; the bot is ready once it answers commands
+        while await probe(mock, timeout=2) is None:
+            if bot.poll() is not None:
+                raise SystemExit(f"bot exited with {bot.returncode}, see {log_path}")
+        print(f"bot ready in {time.perf_counter() - start:.1f}s, RSS {rss_mb(bot.pid) or 0:.0f} MiB")
+
+        samples: List[dict] = []
+        await asyncio.gather(
+            flood(mock, args.rate, args.duration, parse_mix(args.mix)),
+            report(mock, bot, args.duration, samples),
+        )
+        drain_start = time.perf_counter()
+        drained = await probe(mock, timeout=120)
+        drain = time.perf_counter() - drain_start
+
+        events = sum(s["events"] for s in samples)
+        probes = sorted(s["probe_ms"] for s in samples if s["probe_ms"] is not None)
+        rss = [s["rss_mb"] for s in samples if s["rss_mb"] is not None]
+        print()
+        print(f"sustained:  {events / max(1, len(samples)):.0f} events/s over {len(samples)}s")
+        if probes:
+            print(f"probe:      p50 {probes[len(probes) // 2]:.0f} ms, max {probes[-1]:.0f} ms "
+                  f"over {len(probes)} probes")
+        if rss:
+            print(f"memory:     {rss[0]:.0f} MiB at start, {max(rss):.0f} MiB peak, {rss[-1]:.0f} MiB at end")
+        print(f"REST:       {mock.stats['rest']} requests, {mock.stats['messages_created']} messages, "
+              f"{mock.stats['rate_limited']} rate limited")
+        if drained is None:
+            print("drain:      the bot did not catch up within 120s after the flood stopped")
+        else:
+            print(f"drain:      {drain:.1f}s after the flood stopped")
+    finally:
+        bot.terminate()
+        try:
+            bot.wait(10)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        log.close()
+        await mock.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
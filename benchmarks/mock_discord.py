@@ -0,0 +1,443 @@
+"""A local stand-in for Discord's gateway and REST API, for end-to-end load tests.
+
+It speaks just enough of the protocol for main.py to log in, identify
+(sharded or not, zlib-stream compressed), receive READY and a
+GUILD_CREATE per guild, and then take a stream of MESSAGE_CREATE,
+MESSAGE_UPDATE, MESSAGE_DELETE and GUILD_MEMBER_ADD events. Message
+sends are accepted with Discord-style per-channel rate limits: 5 per 5
+seconds with X-RateLimit-* headers, and 429s once a bucket is empty.
+
+Point the bot at it with DISCORD_API_BASE and DISCORD_GATEWAY_URL (see
+main.py); benchmarks/loadtest.py does that and drives the load.
+"""
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+from aiohttp import WSMsgType, web
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DISCORD_EPOCH_MS = 1420070400000
+API_PREFIX = "/api/v10"
+
+OP_DISPATCH, OP_HEARTBEAT, OP_IDENTIFY, OP_RESUME, OP_HELLO, OP_INVALID_SESSION, OP_HEARTBEAT_ACK = 0, 1, 2, 6, 10, 9, 11
+HEARTBEAT_INTERVAL_MS = 41250
+
+# a guild's @everyone role: view, send, read history, manage messages, ...
+EVERYONE_PERMISSIONS = "1071698660929"
+
+_ROUTES = [
+    ("GET", re.compile(r"^/users/@me$"), "current_user"),
+    ("GET", re.compile(r"^/oauth2/applications/@me$"), "application"),
+    ("GET", re.compile(r"^/gateway(/bot)?$"), "gateway"),
+    ("PUT", re.compile(r"^/applications/(\d+)/(guilds/\d+/)?commands$"), "sync_commands"),
+    ("POST", re.compile(r"^/channels/(\d+)/messages$"), "create_message"),
+    ("PATCH", re.compile(r"^/channels/(\d+)/messages/(\d+)$"), "edit_message"),
+    ("GET", re.compile(r"^/channels/(\d+)/messages$"), "history"),
+]
+
+
+def _json(data, status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    # discord.py only parses bodies whose content-type is exactly application/json,
+    # while web.json_response appends a charset
+    return web.Response(body=json.dumps(data).encode(), status=status, headers={
+        **(headers or {}), "Content-Type": "application/json",
+    })
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _Snowflakes:
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def next(self) -> int:
+        ms = int(time.time() * 1000) - DISCORD_EPOCH_MS
+        return (ms << 22) | (next(self._counter) & 0x3FFFFF)
+
+
+class _Bucket:
+    """Discord's per-route token bucket, as the server sees it."""
+
+    __slots__ = ("limit", "window", "remaining", "reset_at")
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def take(self, now: float) -> bool:
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        if self.remaining == 0:
+            return False
+        self.remaining -= 1
+        return True
+
+    def headers(self, now: float, key: str) -> Dict[str, str]:
+        reset_after = max(0.0, self.reset_at - now)
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": key,
+        }
+
+
+class _Session:
+    """One identified gateway connection (one shard)."""
+
+    def __init__(self, ws: web.WebSocketResponse, compress: Optional[str]):
+        self.ws = ws
+        self.seq = 0
+        self.shard: Tuple[int, int] = (0, 1)
+        self._lock = asyncio.Lock()
+        if compress == "zlib-stream":
+            zlib_stream = zlib.compressobj()
+            self._encode = lambda raw: zlib_stream.compress(raw) + zlib_stream.flush(zlib.Z_SYNC_FLUSH)
+        elif compress == "zstd-stream":
+            zstd_stream = zstandard.ZstdCompressor().compressobj()
+            self._encode = lambda raw: zstd_stream.compress(raw) + zstd_stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        else:
+            self._encode = None
+
+    async def send(self, op: int, data, event: Optional[str] = None):
+        payload = {"op": op, "d": data, "s": None, "t": event}
+        # the compression stream and sequence numbers must stay in send order
+        async with self._lock:
+            if op == OP_DISPATCH:
+                self.seq += 1
+                payload["s"] = self.seq
+            raw = json.dumps(payload, separators=(",", ":"))
+            if self._encode is None:
+                await self.ws.send_str(raw)
+            else:
+                await self.ws.send_bytes(self._encode(raw.encode()))
+
+    async def dispatch(self, event: str, data):
+        await self.send(OP_DISPATCH, data, event)
+
+
+class _Guild:
+    __slots__ = ("id", "index", "channels", "members")
+
+    def __init__(self, guild_id: int, index: int, channels: List[int], members: List[int]):
+        self.id = guild_id
+        self.index = index
+        self.channels = channels
+        self.members = members
+
+
+class MockDiscord:
+    """Gateway + REST server on one local port.
+
+    `guilds` guilds are created up front, each with `channels` text
+    channels and `members` members besides the bot. Per-second counters
+    (events sent, REST requests, 429s) are kept in `stats`.
+    """
+
+    def __init__(self, guilds: int = 1000, channels: int = 2, members: int = 20,
+                 host: str = "127.0.0.1", port: int = 0, bucket_limit: int = 5, bucket_window: float = 5.0,
+                 seed: int = 1):
+        self.host = host
+        self.port = port
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.rng = random.Random(seed)
+        self.ids = _Snowflakes()
+
+        self.application_id = self.ids.next()
+        self.bot_user = self._user(self.ids.next(), "LoadTestBot", bot=True)
+        self.owner = self._user(self.ids.next(), "owner")
+
+        base_ms = int(time.time() * 1000) - DISCORD_EPOCH_MS - 86_400_000
+        self.guilds: List[_Guild] = []
+        for i in range(guilds):
+            # consecutive millisecond parts spread guilds evenly over shards
+            guild_id = ((base_ms + i) << 22) | 1
+            self.guilds.append(_Guild(
+                guild_id, i,
+                [self.ids.next() for _ in range(channels)],
+                [self.ids.next() for _ in range(members)],
+            ))
+        self._guilds_by_channel = {c: g for g in self.guilds for c in g.channels}
+
+        self.sessions: Dict[int, _Session] = {}
+        self.ready_shards: Dict[int, asyncio.Event] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        self._recent: Deque[Tuple[int, int, int]] = deque(maxlen=5000)  # (message, channel, guild)
+        self._waiters: Dict[int, asyncio.Future] = {}  # channel id -> future resolved on the next send there
+
+        self.stats = {"events": 0, "rest": 0, "rate_limited": 0, "messages_created": 0}
+        self._runner: Optional[web.AppRunner] = None
+
+    # --------- lifecycle ---------
+    @property
+    def api_base(self) -> str:
+        return f"http://{self.host}:{self.port}{API_PREFIX}"
+
+    @property
+    def gateway_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/gateway"
+
+    async def start(self):
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_get("/gateway", self._gateway)
+        app.router.add_route("*", API_PREFIX + "/{path:.*}", self._rest)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for session in list(self.sessions.values()):
+            await session.ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def wait_ready(self, shard_count: int, timeout: float = 60.0):
+        """Wait until every shard identified and was sent all its guilds."""
+        deadline = time.monotonic() + timeout
+        for shard_id in range(shard_count):
+            event = self.ready_shards.setdefault(shard_id, asyncio.Event())
+            await asyncio.wait_for(event.wait(), max(0.0, deadline - time.monotonic()))
+
+    # --------- payloads ---------
+    @staticmethod
+    def _user(user_id: int, name: str, bot: bool = False) -> dict:
+        return {"id": str(user_id), "username": name, "global_name": None, "discriminator": "0",
+                "avatar": None, "bot": bot, "flags": 0, "public_flags": 0}
+
+    def _member(self, user_id: int, name: str) -> dict:
+        return {"user": self._user(user_id, name), "roles": [], "joined_at": _now_iso(),
+                "deaf": False, "mute": False, "flags": 0, "nick": None, "avatar": None}
+
+    def _guild_payload(self, guild: _Guild) -> dict:
+        members = [self._member(m, f"member{m % 100000}") for m in guild.members]
+        members.append({**self._member(int(self.bot_user["id"]), "LoadTestBot"), "user": self.bot_user})
+        channels = [
+            {"id": str(c), "type": 0, "name": f"channel-{n}", "position": n, "permission_overwrites": [],
+             "nsfw": False, "topic": None, "last_message_id": None, "rate_limit_per_user": 0, "parent_id": None}
+            for n, c in enumerate(guild.channels)
+        ]
+        return {
+            "id": str(guild.id), "name": f"guild-{guild.index}", "icon": None, "owner_id": self.owner["id"],
+            "member_count": len(members), "large": len(members) > 250, "unavailable": False, "features": [],
+            "roles": [{"id": str(guild.id), "name": "@everyone", "permissions": EVERYONE_PERMISSIONS, "position": 0,
+                       "color": 0, "hoist": False, "managed": False, "mentionable": False, "flags": 0}],
+            "emojis": [], "stickers": [], "channels": channels, "threads": [], "members": members,
+            "presences": [], "voice_states": [], "stage_instances": [], "guild_scheduled_events": [],
+            "joined_at": _now_iso(), "premium_tier": 0, "verification_level": 0, "default_message_notifications": 0,
+            "explicit_content_filter": 0, "mfa_level": 0, "nsfw_level": 0, "system_channel_flags": 0,
+            "preferred_locale": "en-US", "afk_timeout": 300, "afk_channel_id": None, "system_channel_id": None,
+        }
+
+    def _message(self, message_id: int, channel_id: int, author: dict, content: str,
+                 guild_id: Optional[int] = None, embeds: Optional[list] = None, edited: bool = False) -> dict:
+        data = {
+            "id": str(message_id), "channel_id": str(channel_id), "author": author, "content": content,
+            "timestamp": _now_iso(), "edited_timestamp": _now_iso() if edited else None, "tts": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+            "embeds": embeds or [], "pinned": False, "type": 0, "flags": 0, "components": [],
+        }
+        if guild_id is not None:
+            data["guild_id"] = str(guild_id)
+            data["member"] = {"roles": [], "joined_at": _now_iso(), "deaf": False, "mute": False, "flags": 0}
+        return data
+
+    # --------- gateway ---------
+    async def _gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        session = _Session(ws, request.query.get("compress"))
+        await session.send(OP_HELLO, {"heartbeat_interval": HEARTBEAT_INTERVAL_MS})
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(msg.data)
+            op = payload.get("op")
+            if op == OP_HEARTBEAT:
+                await session.send(OP_HEARTBEAT_ACK, None)
+            elif op == OP_IDENTIFY:
+                asyncio.create_task(self._identify(session, payload["d"]))
+            elif op == OP_RESUME:
+                # sessions aren't kept; make the client identify again
+                await session.send(OP_INVALID_SESSION, False)
+
+        for shard_id, current in list(self.sessions.items()):
+            if current is session:
+                del self.sessions[shard_id]
+                self.ready_shards.pop(shard_id, None)
+        return ws
+
+    async def _identify(self, session: _Session, data: dict):
+        shard_id, shard_count = data.get("shard") or (0, 1)
+        session.shard = (shard_id, shard_count)
+        self.sessions[shard_id] = session
+        guilds = [g for g in self.guilds if (g.id >> 22) % shard_count == shard_id]
+        await session.dispatch("READY", {
+            "v": 10, "user": self.bot_user, "session_id": f"mock-{shard_id}-{self.ids.next()}",
+            "resume_gateway_url": self.gateway_url, "shard": [shard_id, shard_count],
+            "application": {"id": str(self.application_id), "flags": 0},
+            "guilds": [{"id": str(g.id), "unavailable": True} for g in guilds],
+        })
+        for guild in guilds:
+            await session.dispatch("GUILD_CREATE", self._guild_payload(guild))
+        self.ready_shards.setdefault(shard_id, asyncio.Event()).set()
+
+    def _session_for(self, guild: _Guild) -> Optional[_Session]:
+        for session in self.sessions.values():
+            shard_id, shard_count = session.shard
+            if (guild.id >> 22) % shard_count == shard_id:
+                return session
+        return None
+
+    async def send_event(self, kind: str, guild: Optional[_Guild] = None, content: Optional[str] = None,
+                         channel_id: Optional[int] = None) -> bool:
+        """Dispatch one synthetic event: message, edit, delete or join."""
+        guild = guild or self.rng.choice(self.guilds)
+        session = self._session_for(guild)
+        if session is None:
+            return False
+        channel_id = channel_id or self.rng.choice(guild.channels)
+
+        if kind == "message" or (kind in ("edit", "delete") and not self._recent):
+            message_id = self.ids.next()
+            author_id = self.rng.choice(guild.members) if guild.members else self.ids.next()
+            data = self._message(message_id, channel_id, self._user(author_id, f"member{author_id % 100000}"),
+                                 content or f"load test message {message_id}", guild.id)
+            self._recent.append((message_id, channel_id, guild.id))
+            await session.dispatch("MESSAGE_CREATE", data)
+        elif kind == "edit":
+            message_id, channel_id, guild_id = self._recent[self.rng.randrange(len(self._recent))]
+            author_id = self.ids.next()
+            data = self._message(message_id, channel_id, self._user(author_id, "editor"),
+                                 f"edited {self.ids.next()}", guild_id, edited=True)
+            await self._session_for(self._guild(guild_id)).dispatch("MESSAGE_UPDATE", data)
+        elif kind == "delete":
+            message_id, channel_id, guild_id = self._recent.popleft()
+            await self._session_for(self._guild(guild_id)).dispatch(
+                "MESSAGE_DELETE", {"id": str(message_id), "channel_id": str(channel_id), "guild_id": str(guild_id)}
+            )
+        elif kind == "join":
+            user_id = self.ids.next()
+            guild.members.append(user_id)
+            member = self._member(user_id, f"joiner{user_id % 100000}")
+            await session.dispatch("GUILD_MEMBER_ADD", {**member, "guild_id": str(guild.id)})
+        else:
+            raise ValueError(f"Unknown event kind {kind!r}")
+        self.stats["events"] += 1
+        return True
+
+    def _guild(self, guild_id: int) -> _Guild:
+        return self.guilds[(guild_id >> 22) - (self.guilds[0].id >> 22)]
+
+    def wait_for_send(self, channel_id: int) -> asyncio.Future:
+        """Future resolved when the bot next posts a message in `channel_id`."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[channel_id] = future
+        return future
+
+    # --------- REST ---------
+    async def _rest(self, request: web.Request) -> web.StreamResponse:
+        self.stats["rest"] += 1
+        path = "/" + request.match_info["path"]
+        for method, pattern, name in _ROUTES:
+            if request.method == method:
+                match = pattern.match(path)
+                if match:
+                    return await getattr(self, "_rest_" + name)(request, *match.groups())
+        if request.method == "GET":
+            return _json({"message": "Unknown route", "code": 0}, status=404)
+        return web.Response(status=204)
+
+    async def _rest_current_user(self, request):
+        return _json(self.bot_user)
+
+    async def _rest_application(self, request):
+        return _json({
+            "id": str(self.application_id), "name": "LoadTestBot", "icon": None, "description": "",
+            "bot_public": True, "bot_require_code_grant": False, "owner": self.owner, "verify_key": "0" * 64,
+            "flags": 0, "team": None, "summary": "",
+        })
+
+    async def _rest_gateway(self, request, _bot=None):
+        return _json({
+            "url": self.gateway_url, "shards": 1,
+            "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 16},
+        })
+
+    async def _rest_sync_commands(self, request, application_id, _guild=None):
+        commands = await request.json()
+        return _json([
+            {**command, "id": str(self.ids.next()), "application_id": application_id, "version": "1",
+             "default_member_permissions": command.get("default_member_permissions"), "dm_permission": True,
+             "nsfw": False, "description": command.get("description", "")}
+            for command in commands
+        ])
+
+    async def _rest_create_message(self, request, channel_id):
+        now = time.monotonic()
+        key = f"channel:{channel_id}"
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.bucket_limit, self.bucket_window)
+        if not bucket.take(now):
+            self.stats["rate_limited"] += 1
+            retry_after = max(0.0, bucket.reset_at - now)
+            headers = bucket.headers(now, key)
+            headers.update({"X-RateLimit-Scope": "user", "Retry-After": f"{retry_after:.3f}"})
+            return _json(
+                {"message": "You are being rate limited.", "retry_after": retry_after, "global": False},
+                status=429, headers=headers,
+            )
+
+        body = await self._body(request)
+        channel_id = int(channel_id)
+        guild = self._guilds_by_channel.get(channel_id)
+        self.stats["messages_created"] += 1
+        waiter = self._waiters.pop(channel_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.perf_counter())
+        data = self._message(self.ids.next(), channel_id, self.bot_user, body.get("content") or "",
+                             guild.id if guild else None, body.get("embeds"))
+        return _json(data, headers=bucket.headers(now, key))
+
+    async def _rest_edit_message(self, request, channel_id, message_id):
+        body = await self._body(request)
+        guild = self._guilds_by_channel.get(int(channel_id))
+        data = self._message(int(message_id), int(channel_id), self.bot_user, body.get("content") or "",
+                             guild.id if guild else None, body.get("embeds"), edited=True)
+        return _json(data)
+
+    async def _rest_history(self, request, channel_id):
+        return _json([])
+
+    @staticmethod
+    async def _body(request: web.Request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == "payload_json":
+                    return json.loads(await part.text())
+        return {}
@@ -0,0 +1,337 @@
+"""Replays synthetic gateway event streams through the real cogs, offline.
+
+Each scenario builds a fresh config store and bot, loads the cogs through
+`load_extension` like main.py does, and feeds events to the listeners the
+bot has registered (or to the command callbacks). Discord is replaced by
+the fakes in benchmarks/fakes.py, and sends go through a scheduler that
+delivers immediately, so what is measured is the bot's own work per event.
+
+Scenarios:
+  message_flood   chat messages through process_commands (prefix lookup)
+                  and Logs.on_message (message cache), every 10th one
+                  edited (Logs.on_raw_message_edit)
+  join_wave       member joins (Welcome + Logs on_member_join), some guilds
+                  bursting hard enough to switch to digests
+  delete_storm    !clear purges (Moderation) and the bulk delete event
+                  they cause (Logs.on_raw_bulk_message_delete)
+  setprefix_churn !setprefix (Utility) and guild joins (Events) writing the
+                  store, interleaved with prefix lookups
+
+Run from the repo root:
+  python -m benchmarks.replay [scenario ...] [--events N] [--guilds N]
+                              [--json results.json] [--baseline results.json]
+
+With --baseline, exits non-zero if any scenario lost more than --tolerance
+of its throughput or p99 latency against the saved results.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, Iterator, List
+
+import discord
+from discord.ext import commands
+
+from benchmarks.fakes import DirectScheduler, FakeContext, FakeGuild, FakeMessage, FakeUser, Rest
+from utils.archive import EventArchive
+from utils.outbox import Outbox
+from utils.prefixes import PrefixCache
+from utils.store import ConfigStore
+
+COGS = ("Events", "Logs", "Moderation", "Utility", "Welcome")
+DEFAULT_PREFIX = "!"
+# the background tasks (log batching, digests) get the loop this often
+YIELD_EVERY = 100
+# events replayed under tracemalloc, after the timed run
+ALLOC_SAMPLE = 1000
+
+Event = Callable[[], Awaitable[None]]
+
+
+class Env:
+    """A bot with the real cogs over a fake set of guilds."""
+
+    def __init__(self, bot: commands.Bot, store: ConfigStore, rest: Rest, guilds: List[FakeGuild]):
+        self.bot = bot
+        self.store = store
+        self.rest = rest
+        self.guilds = guilds
+
+    def listeners(self, event: str):
+        return self.bot.extra_events.get(event, [])
+
+    async def dispatch(self, event: str, *args):
+        # like bot.dispatch, minus one task per listener so the time is attributable
+        for listener in self.listeners(event):
+            await listener(*args)
+
+
+async def make_env(tmp: str, guild_count: int, rng: random.Random) -> Env:
+    rest = Rest()
+    guilds = [FakeGuild(rest) for _ in range(guild_count)]
+
+    store = ConfigStore(os.path.join(tmp, "config.db"))
+    await store.open(watch_interval=0)
+    for i, guild in enumerate(guilds):
+        # every guild has a prefix, half send welcomes, a fifth log everything
+        await store.update("prefixes", guild.id, {"prefix": rng.choice("!?.$")})
+        if i % 2 == 0:
+            await store.update("welcome", guild.id, {"channel": guild.channels[0].id, "message": "Hi {user}, welcome to {server}!"})
+        if i % 5 == 0:
+            await store.update("logs", guild.id, {
+                "channel": guild.channels[1].id,
+                "enabled": ["member_join", "member_remove", "message_delete", "message_edit"],
+                "flush_delay": 1.0,
+            })
+
+    def get_server_prefix(client, message):
+        # same as main.get_server_prefix
+        if message.guild is None:
+            return DEFAULT_PREFIX
+        return client.prefixes.get(message.guild.id)
+
+    bot = commands.Bot(command_prefix=get_server_prefix, intents=discord.Intents.none())
+    await bot._async_setup_hook()
+    bot._connection.user = FakeUser(bot=True)
+    bot.store = store
+    bot.prefixes = PrefixCache(store, DEFAULT_PREFIX)
+    bot.archive = EventArchive(os.path.join(tmp, "archive"))
+    await bot.archive.open()
+    bot.cards = None  # welcome cards need Discord's CDN
+    bot.scheduler = DirectScheduler()
+    bot.outbox = Outbox(os.path.join(tmp, "outbox.db"), bot)
+    await bot.outbox.open()
+    # the outbox starts delivering once the bot is ready
+    bot._ready.set()
+    for guild in guilds:
+        bot._connection._add_guild(guild)
+    for name in COGS:
+        await bot.load_extension(f"cogs.{name}")
+    return Env(bot, store, rest, guilds)
+
+
+async def close_env(env: Env):
+    for name in COGS:
+        await env.bot.unload_extension(f"cogs.{name}")
+    if not await env.bot.outbox.drain(timeout=60):
+        print("outbox did not drain, REST counts are low")
+    await env.bot.outbox.close()
+    await env.bot.archive.close()
+    await env.store.close()
+
+
+# ------------------ scenarios ------------------
+def message_flood(env: Env, rng: random.Random) -> Iterator[Event]:
+    while True:
+        guild = rng.choice(env.guilds)
+        channel = rng.choice(guild.channels)
+        author = rng.choice(guild.members) if guild.members else guild.add_member()
+        message = FakeMessage(env.rest, channel, author, f"message {rng.random():.6f} in a busy channel")
+
+        async def event(message=message):
+            await env.dispatch("on_message", message)
+            await env.bot.process_commands(message)
+            if message.id % 10 == 0:
+                edited = SimpleNamespace(**vars(message))
+                edited.content = message.content + " (edited)"
+                await env.dispatch("on_raw_message_edit", SimpleNamespace(
+                    message_id=message.id, channel_id=message.channel.id, guild_id=message.guild.id,
+                    data={"content": edited.content}, message=edited, cached_message=None,
+                ))
+
+        yield event
+
+
+def join_wave(env: Env, rng: random.Random) -> Iterator[Event]:
+    # a tenth of the guilds take most of the joins, like a raid or a listing
+    hot = env.guilds[: max(1, len(env.guilds) // 10)]
+    while True:
+        guild = rng.choice(hot) if rng.random() < 0.7 else rng.choice(env.guilds)
+        member = guild.add_member()
+
+        async def event(member=member):
+            await env.dispatch("on_member_join", member)
+
+        yield event
+
+
+def delete_storm(env: Env, rng: random.Random) -> Iterator[Event]:
+    moderation = env.bot.get_cog("Moderation")
+    logs = env.bot.get_cog("Logs")
+    flags = SimpleNamespace(user=None, bots=False, contains=None, attachments=False)
+    while True:
+        guild = rng.choice(env.guilds)
+        channel = guild.channels[0]
+        author = guild.add_member()
+        moderator = guild.add_member()
+        for i in range(150):
+            channel.post(author, f"spam {i}")
+        command = channel.post(moderator, "!clear 150")
+        ctx = FakeContext(command, DEFAULT_PREFIX)
+        if logs._caches_messages(guild.id):
+            # Logs.on_message saw them when they were sent; not part of the timed purge
+            for message in channel.messages:
+                logs.messages.add(message)
+        deleted = SimpleNamespace(message_ids={m.id for m in channel.messages}, channel_id=channel.id,
+                                  guild_id=guild.id, cached_messages=[])
+
+        async def purge(ctx=ctx):
+            await moderation.clear.callback(moderation, ctx, 150, flags=flags)
+
+        yield purge
+
+        # Discord then sends one bulk delete event for the purge
+        async def event(deleted=deleted):
+            await env.dispatch("on_raw_bulk_message_delete", deleted)
+
+        yield event
+
+
+def setprefix_churn(env: Env, rng: random.Random) -> Iterator[Event]:
+    utility = env.bot.get_cog("Utility")
+    while True:
+        guild = rng.choice(env.guilds)
+        admin = guild.members[0] if guild.members else guild.add_member()
+        roll = rng.random()
+        if roll < 0.45:
+            message = FakeMessage(env.rest, guild.channels[0], admin, f"{DEFAULT_PREFIX}setprefix {rng.choice('!?.$%&')}")
+
+            async def event(message=message):
+                await utility.setprefix.callback(utility, FakeContext(message), newPrefix=message.content[-1])
+        elif roll < 0.5:
+            new_guild = FakeGuild(env.rest)
+            env.guilds.append(new_guild)
+            env.bot._connection._add_guild(new_guild)
+
+            async def event(guild=new_guild):
+                await env.dispatch("on_guild_join", guild)
+        else:
+            message = FakeMessage(env.rest, guild.channels[1], admin, "just chatting")
+
+            async def event(message=message):
+                await env.bot.process_commands(message)
+        yield event
+
+
+SCENARIOS: Dict[str, Callable[[Env, random.Random], Iterator[Event]]] = {
+    "message_flood": message_flood,
+    "join_wave": join_wave,
+    "delete_storm": delete_storm,
+    "setprefix_churn": setprefix_churn,
+}
+
+
+# ------------------ measurement ------------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(name: str, events: int, guilds: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = await make_env(tmp, guilds, rng)
+        stream = SCENARIOS[name](env, rng)
+
+        latencies = []
+        start = time.perf_counter()
+        for i in range(events):
+            event = next(stream)
+            t = time.perf_counter()
+            await event()
+            latencies.append(time.perf_counter() - t)
+            if i % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        wall = time.perf_counter() - start
+
+        # allocations: peak traced memory above the starting point, per event
+        tracemalloc.start()
+        peak_total = retained_total = 0
+        for _ in range(ALLOC_SAMPLE):
+            event = next(stream)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            await event()
+            current, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - before
+            retained_total += current - before
+        tracemalloc.stop()
+
+        # unloading flushes queued log batches, which count as REST calls too
+        await close_env(env)
+        rest_calls = env.rest.total()
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "events": events,
+        "events_per_sec": events / wall,
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+        "alloc_kib_per_event": peak_total / ALLOC_SAMPLE / 1024,
+        "retained_bytes_per_event": retained_total / ALLOC_SAMPLE,
+        "rest_calls": rest_calls,
+    }
+
+
+def print_results(results: List[dict]):
+    print(f"{'scenario':<16} {'events/s':>10} {'p50 us':>9} {'p99 us':>9} {'alloc KiB/ev':>13} {'kept B/ev':>10} {'REST':>7}")
+    for r in results:
+        print(
+            f"{r['scenario']:<16} {r['events_per_sec']:>10.0f} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f} "
+            f"{r['alloc_kib_per_event']:>13.2f} {r['retained_bytes_per_event']:>10.0f} {r['rest_calls']:>7}"
+        )
+
+
+def compare(results: List[dict], baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path, "r") as f:
+        baseline = {r["scenario"]: r for r in json.load(f)}
+    ok = True
+    for r in results:
+        old = baseline.get(r["scenario"])
+        if old is None:
+            continue
+        if r["events_per_sec"] < old["events_per_sec"] * (1 - tolerance):
+            print(f"REGRESSION {r['scenario']}: {r['events_per_sec']:.0f} events/s, was {old['events_per_sec']:.0f}")
+            ok = False
+        if r["p99_us"] > old["p99_us"] * (1 + tolerance):
+            print(f"REGRESSION {r['scenario']}: p99 {r['p99_us']:.1f} us, was {old['p99_us']:.1f}")
+            ok = False
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic event streams through the cogs")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--events", type=int, default=20_000)
+    parser.add_argument("--guilds", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+
+    results = []
+    for name in args.scenarios or list(SCENARIOS):
+        results.append(await run_scenario(name, args.events, args.guilds, args.seed))
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,9 @@
 # cogs/events.py
 import discord
 from discord.ext import commands
-import json
-import os
 
-PREFIX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prefixes.json")
+# gateway intents this cog needs (read by utils.profiles before the bot starts)
+INTENTS = ("guilds",)
 
 class Events(commands.Cog):
     def __init__(self, client):
@@ -12,13 +11,7 @@ class Events(commands.Cog):
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild):
-        with open(PREFIX_PATH, "r") as f:
-            prefix = json.load(f)
-
-        prefix[str(guild.id)] = "!"
-
-        with open(PREFIX_PATH, "w") as f:
-            json.dump(prefix, f, indent=4)
+        await self.client.prefixes.set(guild.id, "!")
 
 
 async def setup(client):
@@ -1,297 +1,106 @@
+import time
+
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
-import os
-from json import JSONDecodeError
-from datetime import datetime, timezone
-from typing import Optional, Dict
+from typing import Dict, List, Optional
 
+from utils.archive import COUNT_LIMIT
+from utils.batching import EmbedBatcher
+from utils.message_cache import CachedMessage, MessageCache
+from utils.scheduler import Priority
 
-SIMPLE_EVENTS = ["message_delete", "message_edit", "member_join", "member_remove"]
+# gateway intents this cog needs (read by utils.profiles before the bot starts)
+INTENTS = ("members", "guild_messages", "message_content")
 
 
 class Logs(commands.Cog):
-    """Beginner-friendly logging cog.
-
-    Features (4):
-    - Message Delete log
-    - Message Edit log
-    - Member Join log
-    - Member Remove log
-
-    Simple commands:
-    - /setlogchannel <channel>
-    - /showlogchannel
-    - /enablelogs (enable all 4)
-    - /disablelogs (disable all)
-
-    JSON format (simple):
-    {
-      "guild_id": {
-         "log_channel": 1234567890,
-         "enabled": ["message_delete", ...]
-      }
-    }
-    """
-
-    def __init__(self, bot: commands.Bot):
-        self.bot = bot
-        self.file_path = os.path.join(os.getcwd(), "logs.json")
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump({}, f, indent=4)
-
-    # --------- JSON helpers ---------
-    def load(self) -> Dict:
-        try:
-            with open(self.file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except (FileNotFoundError, JSONDecodeError):
-            return {}
-
-    def save(self, data: Dict):
-        try:
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
-        except Exception:
-            pass
-
-    def _ensure(self, gid: str) -> Dict:
-        data = self.load()
-        conf = data.get(gid)
-        if conf is None:
-            conf = {"log_channel": None, "enabled": []}
-            data[gid] = conf
-            self.save(data)
-        return conf
-
-    def _ts(self):
-        return datetime.now(timezone.utc)
-
-    def _get_channel(self, guild: discord.Guild) -> Optional[discord.TextChannel]:
-        data = self.load()
-        conf = data.get(str(guild.id), {})
-        ch = conf.get("log_channel")
-        if not ch:
-            return None
-        return guild.get_channel(ch)
-
-    def _is_enabled(self, guild: discord.Guild, event: str) -> bool:
-        data = self.load()
-        conf = data.get(str(guild.id), {})
-        enabled = conf.get("enabled", [])
-        return event in enabled
-
-    async def _send(self, guild: discord.Guild, embed: discord.Embed):
-        ch = self._get_channel(guild)
-        if not ch:
-            return
-        try:
-            await ch.send(embed=embed)
-        except Exception:
-            return
-
-    # --------- Commands ---------
-    @app_commands.command(name="setlogchannel", description="Set the channel where logs are sent.")
-    async def setlogchannel(self, interaction: discord.Interaction, channel: discord.TextChannel):
-        if not interaction.guild:
-            await interaction.response.send_message("Run this command in a server.", ephemeral=True)
-            return
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("You need Manage Server permission.", ephemeral=True)
-            return
-
-        data = self.load()
-        gid = str(interaction.guild.id)
-        conf = data.get(gid, {})
-        conf["log_channel"] = channel.id
-        conf.setdefault("enabled", conf.get("enabled", []))
-        data[gid] = conf
-        self.save(data)
-
-        embed = discord.Embed(title="Log Channel Set", description=f"Logs will be sent to {channel.mention}", color=discord.Color.green(), timestamp=self._ts())
-        await interaction.response.send_message(embed=embed)
-
-    @app_commands.command(name="showlogchannel", description="Show the current log channel.")
-    async def showlogchannel(self, interaction: discord.Interaction):
-        if not interaction.guild:
-            await interaction.response.send_message("Run this command in a server.", ephemeral=True)
-            return
-
-        data = self.load()
-        conf = data.get(str(interaction.guild.id), {})
-        ch = conf.get("log_channel")
-        desc = f"{f'<#{ch}>' if ch else 'Not set'}"
-        embed = discord.Embed(title="Log Channel", description=desc, color=discord.Color.blurple(), timestamp=self._ts())
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-
-    @app_commands.command(name="enablelogs", description="Enable all simple logs (no args).")
-    async def enablelogs(self, interaction: discord.Interaction):
-        if not interaction.guild:
-            await interaction.response.send_message("Run in server.", ephemeral=True)
-            return
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("Manage Server permission required.", ephemeral=True)
-            return
-
-        data = self.load()
-        gid = str(interaction.guild.id)
-        conf = self._ensure(gid)
-        conf["enabled"] = SIMPLE_EVENTS.copy()
-        data[gid] = conf
-        self.save(data)
-        await interaction.response.send_message("Enabled simple logs.", ephemeral=True)
-
-    @app_commands.command(name="disablelogs", description="Disable all simple logs (no args).")
-    async def disablelogs(self, interaction: discord.Interaction):
-        if not interaction.guild:
-            await interaction.response.send_message("Run in server.", ephemeral=True)
-            return
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("Manage Server permission required.", ephemeral=True)
-            return
-
-        data = self.load()
-        gid = str(interaction.guild.id)
-        conf = self._ensure(gid)
-        conf["enabled"] = []
-        data[gid] = conf
-        self.save(data)
-        await interaction.response.send_message("Disabled simple logs.", ephemeral=True)
-
-    # --------- Event handlers (4 simple) ---------
-    @commands.Cog.listener()
-    async def on_message_delete(self, message: discord.Message):
-        event = "message_delete"
-        if not message.guild or not self._is_enabled(message.guild, event):
-            return
-
-        author = message.author
-        author_name = getattr(author, "display_name", "Unknown") if author else "Unknown"
-        author_id = getattr(author, "id", "N/A")
-        content = message.content or "(no content)"
-
-        embed = discord.Embed(title="Message Deleted", color=discord.Color.red(), timestamp=self._ts())
-        embed.add_field(name="Author", value=f"{author_name} ({author_id})", inline=False)
-        embed.add_field(name="Channel", value=message.channel.mention if message.channel else "Unknown", inline=False)
-        embed.add_field(name="Content", value=content[:1024], inline=False)
-        try:
-            if author and getattr(author, "display_avatar", None):
-                embed.set_thumbnail(url=author.display_avatar.url)
-        except Exception:
-            pass
-
-        await self._send(message.guild, embed)
-
-    @commands.Cog.listener()
-    async def on_message_edit(self, before: discord.Message, after: discord.Message):
-        event = "message_edit"
-        if not before.guild or not self._is_enabled(before.guild, event):
-            return
-        if before.author and before.author.bot:
-            return
-        if before.content == after.content:
-            return
-
-        author = before.author
-        name = getattr(author, "display_name", "Unknown") if author else "Unknown"
-        uid = getattr(author, "id", "N/A")
-
-        embed = discord.Embed(title="Message Edited", color=discord.Color.orange(), timestamp=self._ts())
-        embed.add_field(name="Author", value=f"{name} ({uid})", inline=False)
-        embed.add_field(name="Channel", value=before.channel.mention if before.channel else "Unknown", inline=False)
-        embed.add_field(name="Before", value=(before.content or "(no content)")[:1024], inline=False)
-        embed.add_field(name="After", value=(after.content or "(no content)")[:1024], inline=False)
-
-        try:
-            if author and getattr(author, "display_avatar", None):
-                embed.set_thumbnail(url=author.display_avatar.url)
-        except Exception:
-            pass
-
-        await self._send(before.guild, embed)
-
-    @commands.Cog.listener()
-    async def on_member_join(self, member: discord.Member):
-        event = "member_join"
-        if not member.guild or not self._is_enabled(member.guild, event):
-            return
-
-        name = member.display_name
-        uid = member.id
-        created = member.created_at.strftime("%Y-%m-%d %H:%M:%S UTC")
-
-        embed = discord.Embed(title="Member Joined", description=f"{name} has joined.", color=discord.Color.green(), timestamp=self._ts())
-        embed.add_field(name="User", value=f"{name} ({uid})", inline=False)
-        embed.add_field(name="Account Created", value=created, inline=False)
-        try:
-            if getattr(member, "display_avatar", None):
-                embed.set_thumbnail(url=member.display_avatar.url)
-        except Exception:
-            pass
-
-        await self._send(member.guild, embed)
-
-    @commands.Cog.listener()
-    async def on_member_remove(self, member: discord.Member):
-        event = "member_remove"
-        if not member.guild or not self._is_enabled(member.guild, event):
-            return
-
-        embed = discord.Embed(title="Member Left", color=discord.Color.dark_grey(), timestamp=self._ts())
-        embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
-        try:
-            if getattr(member, "display_avatar", None):
-                embed.set_thumbnail(url=member.display_avatar.url)
-        except Exception:
-            pass
-
-        await self._send(member.guild, embed)
-
-
-async def setup(bot: commands.Bot):
-    await bot.add_cog(Logs(bot))
-import discord
-from discord.ext import commands
-from discord import app_commands
-import json
-import os
-from json import JSONDecodeError
-
-
-class Logs(commands.Cog):
-    """Simple logging cog. Stores per-guild settings in `logs.json`.
+    """Simple logging cog. Stores per-guild settings in the "logs" section of the config store.
 
     Commands:
     - /setlogchannel channel: set channel for logs
     - /enablelog event: enable logging for an event
     - /disablelog event: disable logging for an event
     - /showlogs: show current log channel and enabled events
+    - /setlogdelay seconds: how long log embeds may be held back to batch them
+    - /searchlogs [event] [user] [channel] [days]: search the local event archive
 
     Events supported: `member_join`, `member_remove`, `message_delete`, `message_edit`
+
+    Deletes and edits are handled through the raw gateway events, so they are
+    logged even for messages discord.py no longer caches. What the "before"
+    side needs (author, content, attachment URLs) comes from a compact cache
+    of messages seen in guilds that log deletes or edits.
+
+    Every logged event is also written to the bot's local archive
+    (`client.archive`, see utils/archive.py), which /searchlogs queries.
+    Log messages are handed to the bot's outbox (`client.outbox`, see
+    utils/outbox.py), which keeps them on disk until Discord accepts them.
     """
 
     SUPPORTED_EVENTS = ["member_join", "member_remove", "message_delete", "message_edit"]
+    DEFAULT_FLUSH_DELAY = 2.0
+    MAX_FLUSH_DELAY = 30.0
+    MESSAGE_CACHE_SIZE = 50_000
+    MESSAGE_CACHE_BYTES = 32 * 1024 * 1024
+    MESSAGE_CACHE_TTL = 6 * 3600
+    # how many of a bulk delete's messages are listed in its log entry
+    MAX_BULK_LISTED = 25
+    MAX_SEARCH_DAYS = 365
 
     def __init__(self, client: commands.Bot):
         self.client = client
-        self.file_path = os.path.join(os.getcwd(), "logs.json")
-
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, "w") as f:
-                json.dump({}, f, indent=4)
-
-    def load_data(self) -> dict:
-        try:
-            with open(self.file_path, "r") as f:
-                return json.load(f)
-        except (FileNotFoundError, JSONDecodeError):
-            return {}
-
-    def save_data(self, data: dict):
-        with open(self.file_path, "w") as f:
-            json.dump(data, f, indent=4)
+        self.store = client.store
+        self.archive = client.archive
+
+        # event -> {guild_id: log channel id}, only for guilds that have the
+        # event enabled *and* a log channel set. Handlers check this first so
+        # unsubscribed guilds cost a single dict lookup.
+        self._subscriptions: Dict[str, Dict[int, int]] = {event: {} for event in self.SUPPORTED_EVENTS}
+        self._flush_delays: Dict[int, float] = {}
+        self.messages = MessageCache(self.MESSAGE_CACHE_SIZE, self.MESSAGE_CACHE_BYTES, self.MESSAGE_CACHE_TTL)
+        for guild_id, conf in self.store.all("logs").items():
+            self._index_guild(guild_id, conf)
+        self.store.subscribe("logs", self._index_guild)
+
+        # log embeds are coalesced per channel, up to 10 per message
+        self.batcher = EmbedBatcher(self._deliver)
+
+    async def cog_unload(self):
+        self.store.unsubscribe("logs", self._index_guild)
+        await self.batcher.close()
+
+    def _index_guild(self, guild_id: int, conf: dict):
+        channel_id = conf.get("channel")
+        enabled = conf.get("enabled", [])
+        was_caching = self._caches_messages(guild_id)
+        for event, guilds in self._subscriptions.items():
+            if channel_id and event in enabled:
+                guilds[guild_id] = channel_id
+            else:
+                guilds.pop(guild_id, None)
+        # forget_guild scans the whole cache; only pay for it when the guild stops caching
+        if was_caching and not self._caches_messages(guild_id):
+            self.messages.forget_guild(guild_id)
+        if "flush_delay" in conf:
+            self._flush_delays[guild_id] = conf["flush_delay"]
+        else:
+            self._flush_delays.pop(guild_id, None)
+
+    def _caches_messages(self, guild_id: int) -> bool:
+        return guild_id in self._subscriptions["message_delete"] or guild_id in self._subscriptions["message_edit"]
+
+    def _queue(self, guild: discord.Guild, channel, embed: discord.Embed):
+        delay = self._flush_delays.get(guild.id, self.DEFAULT_FLUSH_DELAY)
+        self.batcher.submit(channel, embed, delay)
+
+    def _archive(self, kind: str, guild_id: int, user_id: Optional[int], channel_id: Optional[int], **data):
+        if self.archive is not None:
+            self.archive.append(kind, guild_id, user_id, channel_id, data)
+
+    async def _deliver(self, channel, embeds: List[discord.Embed]):
+        # the outbox stores the batch and retries it until Discord takes it
+        self.client.outbox.put(channel, Priority.LOGS, "logs", embeds=embeds)
 
     # ------------------ Commands ------------------
     @app_commands.command(name="setlogchannel", description="Set the channel where logs will be sent.")
@@ -304,11 +113,7 @@ class Logs(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        data = self.load_data()
-        gid = str(interaction.guild.id)
-        data[gid] = data.get(gid, {})
-        data[gid]["channel"] = channel.id
-        self.save_data(data)
+        await self.store.update("logs", interaction.guild.id, {"channel": channel.id})
 
         await interaction.response.send_message(f"Log channel set to {channel.mention}")
 
@@ -326,13 +131,12 @@ class Logs(commands.Cog):
             await interaction.response.send_message(f"Unsupported event. Supported: {', '.join(self.SUPPORTED_EVENTS)}", ephemeral=True)
             return
 
-        data = self.load_data()
-        gid = str(interaction.guild.id)
-        data[gid] = data.get(gid, {})
-        enabled = set(data[gid].get("enabled", []))
-        enabled.add(event)
-        data[gid]["enabled"] = list(enabled)
-        self.save_data(data)
+        def enable(conf: dict):
+            enabled = set(conf.get("enabled", []))
+            enabled.add(event)
+            conf["enabled"] = list(enabled)
+
+        await self.store.modify("logs", interaction.guild.id, enable)
 
         await interaction.response.send_message(f"Enabled logging for `{event}`")
 
@@ -350,54 +154,109 @@ class Logs(commands.Cog):
             await interaction.response.send_message(f"Unsupported event. Supported: {', '.join(self.SUPPORTED_EVENTS)}", ephemeral=True)
             return
 
-        data = self.load_data()
-        gid = str(interaction.guild.id)
-        data[gid] = data.get(gid, {})
-        enabled = set(data[gid].get("enabled", []))
-        if event in enabled:
-            enabled.remove(event)
-        data[gid]["enabled"] = list(enabled)
-        self.save_data(data)
+        def disable(conf: dict):
+            enabled = set(conf.get("enabled", []))
+            if event in enabled:
+                enabled.remove(event)
+            conf["enabled"] = list(enabled)
+
+        await self.store.modify("logs", interaction.guild.id, disable)
 
         await interaction.response.send_message(f"Disabled logging for `{event}`")
 
+    @app_commands.command(name="setlogdelay", description="Set how many seconds log embeds may be held back to batch them.")
+    async def set_log_delay(self, interaction: discord.Interaction, seconds: app_commands.Range[float, 0.0, MAX_FLUSH_DELAY]):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
+            return
+
+        await self.store.update("logs", interaction.guild.id, {"flush_delay": seconds})
+        await interaction.response.send_message(f"Log embeds will be sent at most `{seconds:g}s` after the event.")
+
     @app_commands.command(name="showlogs", description="Show current log settings for this server.")
     async def show_logs(self, interaction: discord.Interaction):
         if not interaction.guild:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
 
-        data = self.load_data()
-        gid = str(interaction.guild.id)
-        conf = data.get(gid, {})
+        conf = self.store.get("logs", interaction.guild.id)
         channel_id = conf.get("channel")
         enabled = conf.get("enabled", [])
 
         channel_mention = f"<#{channel_id}>" if channel_id else "Not set"
 
-        text = f"Log Channel: {channel_mention}\nEnabled events: {', '.join(enabled) if enabled else 'None'}"
+        delay = conf.get("flush_delay", self.DEFAULT_FLUSH_DELAY)
+
+        text = (
+            f"Log Channel: {channel_mention}\nEnabled events: {', '.join(enabled) if enabled else 'None'}"
+            f"\nBatch delay: {delay:g}s"
+        )
         await interaction.response.send_message(text, ephemeral=True)
 
+    @app_commands.command(name="searchlogs", description="Search this server's archived log events.")
+    @app_commands.describe(event="Only this event type", user="Only events for this user", channel="Only events in this channel",
+                           days="How many days back to search", limit="How many events to show")
+    async def search_logs(self, interaction: discord.Interaction, event: Optional[str] = None, user: Optional[discord.User] = None,
+                          channel: Optional[discord.TextChannel] = None,
+                          days: app_commands.Range[int, 1, MAX_SEARCH_DAYS] = 7, limit: app_commands.Range[int, 1, 25] = 10):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
+            return
+        if self.archive is None:
+            await interaction.response.send_message("The log archive is not enabled on this bot.", ephemeral=True)
+            return
+        if event is not None:
+            event = event.lower()
+            if event not in self.SUPPORTED_EVENTS:
+                await interaction.response.send_message(f"Unsupported event. Supported: {', '.join(self.SUPPORTED_EVENTS)}", ephemeral=True)
+                return
+
+        start = time.perf_counter()
+        events, total = await self.archive.search(
+            interaction.guild.id, kind=event, user_id=user.id if user else None, channel_id=channel.id if channel else None,
+            since=time.time() - days * 86400, limit=limit,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+
+        embed = discord.Embed(title="Log Search", color=discord.Color.blurple())
+        embed.description = "\n".join(self._describe(record) for record in events)[:4000] or "No matching events."
+        found = f"{total}+" if total >= COUNT_LIMIT else str(total)
+        embed.set_footer(text=f"{len(events)} of {found} match(es) in the last {days} day(s), {elapsed:.1f} ms")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @staticmethod
+    def _describe(record: dict) -> str:
+        when = f"<t:{int(record['ts'])}:f>"
+        user = f"<@{record['user']}>" if record.get("user") else "unknown user"
+        where = f" in <#{record['channel']}>" if record.get("channel") else ""
+        kind = record["kind"]
+        if kind == "message_delete":
+            detail = record.get("content") or ("(not cached)" if record.get("user") is None else "(no content)")
+        elif kind == "message_edit":
+            detail = f"{record.get('before') or '(not cached)'} → {record.get('after') or '(no content)'}"
+        else:
+            detail = record.get("name", "")
+        detail = detail.replace("\n", " ")
+        if len(detail) > 120:
+            detail = detail[:117] + "..."
+        return f"{when} **{kind}** {user}{where}: {detail}"
+
     # ------------------ Event handlers ------------------
-    def _get_log_channel(self, guild: discord.Guild):
-        data = self.load_data()
-        conf = data.get(str(guild.id), {})
-        ch_id = conf.get("channel")
-        if not ch_id:
+    def _get_log_channel(self, guild: discord.Guild, event: str) -> Optional[discord.abc.GuildChannel]:
+        channel_id = self._subscriptions[event].get(guild.id)
+        if channel_id is None:
             return None
-        return guild.get_channel(ch_id)
-
-    def _is_enabled(self, guild: discord.Guild, event: str) -> bool:
-        data = self.load_data()
-        conf = data.get(str(guild.id), {})
-        enabled = conf.get("enabled", [])
-        return event in enabled
+        return guild.get_channel(channel_id)
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
-        if not self._is_enabled(member.guild, "member_join"):
-            return
-        channel = self._get_log_channel(member.guild)
+        channel = self._get_log_channel(member.guild, "member_join")
         if not channel:
             return
 
@@ -405,62 +264,146 @@ class Logs(commands.Cog):
         embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
         embed.add_field(name="Account Created", value=member.created_at.strftime("%Y-%m-%d %H:%M:%S UTC"), inline=False)
         embed.set_thumbnail(url=member.display_avatar.url if member.display_avatar else None)
-        await channel.send(embed=embed)
+        self._queue(member.guild, channel, embed)
+        self._archive("member_join", member.guild.id, member.id, None, name=str(member))
 
+    # the raw event fires even for members that were never cached (no
+    # chunking under the minimal/standard profiles); on_member_remove doesn't
     @commands.Cog.listener()
-    async def on_member_remove(self, member: discord.Member):
-        if not self._is_enabled(member.guild, "member_remove"):
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        guild = self.client.get_guild(payload.guild_id)
+        if guild is None:
             return
-        channel = self._get_log_channel(member.guild)
+        channel = self._get_log_channel(guild, "member_remove")
         if not channel:
             return
 
+        user = payload.user
         embed = discord.Embed(title="Member Left", color=discord.Color.dark_grey())
-        embed.add_field(name="User", value=f"{member} ({member.id})", inline=False)
-        embed.set_thumbnail(url=member.display_avatar.url if member.display_avatar else None)
-        await channel.send(embed=embed)
+        embed.add_field(name="User", value=f"{user} ({user.id})", inline=False)
+        embed.set_thumbnail(url=user.display_avatar.url if user.display_avatar else None)
+        self._queue(guild, channel, embed)
+        self._archive("member_remove", guild.id, user.id, None, name=str(user))
 
     @commands.Cog.listener()
-    async def on_message_delete(self, message: discord.Message):
-        if not message.guild:
-            return
-        if not self._is_enabled(message.guild, "message_delete"):
-            return
-        if message.author and message.author.bot:
+    async def on_message(self, message: discord.Message):
+        if not message.guild or message.author.bot:
             return
+        if self._caches_messages(message.guild.id):
+            self.messages.add(message)
 
-        channel = self._get_log_channel(message.guild)
+    def _forget(self, message_id: int, message: Optional[discord.Message]) -> Optional[CachedMessage]:
+        """Drop a deleted message from the cache and return what was known about it."""
+        entry = self.messages.pop(message_id)
+        if entry is None and message is not None and not message.author.bot:
+            # still in discord.py's cache, e.g. sent before logging was enabled
+            entry = CachedMessage.from_message(message)
+        return entry
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if payload.guild_id is None or not self._caches_messages(payload.guild_id):
+            return
+        entry = self._forget(payload.message_id, payload.cached_message)
+        guild = self.client.get_guild(payload.guild_id)
+        channel = guild and self._get_log_channel(guild, "message_delete")
         if not channel:
             return
+        if entry is None and payload.cached_message is not None:
+            return  # a bot's message
 
-        content = message.content or "(no content)"
         embed = discord.Embed(title="Message Deleted", color=discord.Color.red())
-        embed.add_field(name="Author", value=f"{message.author} ({getattr(message.author, 'id', 'N/A')})", inline=False)
-        embed.add_field(name="Channel", value=message.channel.mention if message.channel else "Unknown", inline=False)
-        embed.add_field(name="Content", value=content[:1024], inline=False)
-        await channel.send(embed=embed)
+        author = f"{entry.author} ({entry.author_id})" if entry else "Unknown (message not cached)"
+        embed.add_field(name="Author", value=author, inline=False)
+        embed.add_field(name="Channel", value=f"<#{payload.channel_id}>", inline=False)
+        embed.add_field(name="Content", value=(entry.content if entry else "")[:1024] or "(no content)", inline=False)
+        if entry and entry.attachments:
+            embed.add_field(name="Attachments", value="\n".join(entry.attachments)[:1024], inline=False)
+        embed.set_footer(text=f"Message ID: {payload.message_id}")
+        self._queue(guild, channel, embed)
+        self._archive_delete(guild.id, payload.channel_id, payload.message_id, entry)
+
+    def _archive_delete(self, guild_id: int, channel_id: int, message_id: int, entry: Optional[CachedMessage], **data):
+        if entry is None:
+            self._archive("message_delete", guild_id, None, channel_id, message=message_id, **data)
+        else:
+            self._archive("message_delete", guild_id, entry.author_id, channel_id, message=message_id,
+                          author=entry.author, content=entry.content, attachments=list(entry.attachments), **data)
 
     @commands.Cog.listener()
-    async def on_message_edit(self, before: discord.Message, after: discord.Message):
-        if not before.guild:
-            return
-        if not self._is_enabled(before.guild, "message_edit"):
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if payload.guild_id is None or not self._caches_messages(payload.guild_id):
+            return
+        entries = self.messages.pop_many(payload.message_ids)
+        found = {entry.id for entry in entries}
+        bots = 0
+        for message in payload.cached_messages:
+            if message.id in found:
+                continue
+            if message.author.bot:
+                bots += 1
+            else:
+                entries.append(CachedMessage.from_message(message))
+        guild = self.client.get_guild(payload.guild_id)
+        channel = guild and self._get_log_channel(guild, "message_delete")
+        if not channel:
             return
-        if before.author and before.author.bot:
+
+        # one log entry for the whole purge instead of one per message
+        entries.sort(key=lambda entry: entry.id)
+        listed = entries[-self.MAX_BULK_LISTED:]
+        lines = []
+        for entry in listed:
+            content = entry.content.replace("\n", " ") or "(no content)"
+            lines.append(f"**{entry.author}**: {content[:100]}")
+        if len(entries) > len(listed):
+            lines.insert(0, f"...and {len(entries) - len(listed)} earlier message(s)")
+        embed = discord.Embed(title=f"{len(payload.message_ids)} Messages Deleted", description="\n".join(lines)[:4000] or None,
+                              color=discord.Color.dark_red())
+        embed.add_field(name="Channel", value=f"<#{payload.channel_id}>", inline=False)
+        unknown = len(payload.message_ids) - len(entries) - bots
+        if unknown:
+            embed.add_field(name="Not cached", value=f"{unknown} message(s)", inline=False)
+        self._queue(guild, channel, embed)
+
+        # the archive keeps every message, so searches by user find them
+        by_id = {entry.id: entry for entry in entries}
+        for message_id in payload.message_ids:
+            self._archive_delete(guild.id, payload.channel_id, message_id, by_id.get(message_id), bulk=True)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        if payload.guild_id is None or not self._caches_messages(payload.guild_id):
             return
-        if before.content == after.content:
+        if "content" not in payload.data:
+            return  # embed-only updates (link previews) carry no content
+        after = payload.message
+        if after.author and after.author.bot:
             return
 
-        channel = self._get_log_channel(before.guild)
-        if not channel:
+        entry = self.messages.get(payload.message_id)
+        if entry is None and payload.cached_message is not None:
+            entry = CachedMessage.from_message(payload.cached_message)
+        before = entry.content if entry else None
+        if entry is None:
+            self.messages.add(after)
+        else:
+            self.messages.update(entry, after.content)
+
+        guild = self.client.get_guild(payload.guild_id)
+        channel = guild and self._get_log_channel(guild, "message_edit")
+        if not channel or before == after.content:
             return
 
         embed = discord.Embed(title="Message Edited", color=discord.Color.orange())
-        embed.add_field(name="Author", value=f"{before.author} ({getattr(before.author, 'id', 'N/A')})", inline=False)
-        embed.add_field(name="Channel", value=before.channel.mention if before.channel else "Unknown", inline=False)
-        embed.add_field(name="Before", value=before.content[:1024] or "(no content)", inline=False)
+        embed.add_field(name="Author", value=f"{after.author} ({after.author.id})", inline=False)
+        embed.add_field(name="Channel", value=f"<#{payload.channel_id}>", inline=False)
+        embed.add_field(name="Before", value="(not cached)" if before is None else before[:1024] or "(no content)", inline=False)
         embed.add_field(name="After", value=after.content[:1024] or "(no content)", inline=False)
-        await channel.send(embed=embed)
+        embed.set_footer(text=f"Message ID: {payload.message_id}")
+        self._queue(guild, channel, embed)
+        self._archive("message_edit", guild.id, after.author.id, payload.channel_id, message=payload.message_id,
+                      author=str(after.author), before=before, after=after.content)
 
 
 async def setup(client: commands.Bot):
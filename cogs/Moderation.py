@@ -1,35 +1,237 @@
+import asyncio
 import discord
+from datetime import timedelta
 from discord.ext import commands
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from utils.purge import PurgeFilters, PurgeJob
+from utils.scheduler import Priority
+
+# gateway intents this cog needs (read by utils.profiles before the bot starts)
+# members: `joined:` in the mass commands looks at cached members
+INTENTS = ("guild_messages", "message_content", "members")
+
+MAX_PURGE = 5000
+# mass kick/unban run this many requests at once; Discord has no bulk endpoint for them
+BULK_CONCURRENCY = 5
+BULK_BAN_CHUNK = 200
+MAX_BULK_TARGETS = 1000
+
+
+class PurgeFlags(commands.FlagConverter):
+    user: discord.User = None
+    bots: bool = False
+    contains: str = None
+    attachments: bool = False
+
+
+class BulkFlags(commands.FlagConverter):
+    joined: int = None
+    reason: str = "No Reason provided"
+
 
 class Moderation(commands.Cog):
     def __init__(self,client):
         self.client = client
+        self._purges: Dict[int, PurgeJob] = {}
+
+    async def cog_unload(self):
+        for job in self._purges.values():
+            job.cancel()
+
+    # replies jump ahead of queued welcome/log messages in the same channel
+    async def reply(self, ctx, content=None, **kwargs):
+        return await self.client.scheduler.send(ctx, Priority.MODERATION, content, reference=ctx.message, **kwargs)
         
-    @commands.command()
+    # !clear <count> [user: @someone] [bots: yes] [contains: text] [attachments: yes]
+    @commands.group(invoke_without_command=True)
+    @commands.guild_only()
     @commands.has_permissions(manage_messages = True)
-    async def clear(self,ctx,count:int):
-        await ctx.channel.purge(limit=count)
-        await ctx.reply(f"{count} messages have been deleted.")
+    async def clear(self,ctx,count:int,*,flags:PurgeFlags):
+        if ctx.channel.id in self._purges:
+            await self.reply(ctx, f"A purge is already running here, use `{ctx.clean_prefix}clear cancel` to stop it.")
+            return
+        if count < 1:
+            await self.reply(ctx, "Give the number of messages to clear, at least 1.")
+            return
+        if count > MAX_PURGE:
+            await self.reply(ctx, f"Clearing is capped at {MAX_PURGE} messages per run, deleting the last {MAX_PURGE}.")
+            count = MAX_PURGE
+
+        filters = PurgeFilters(
+            author_id=flags.user.id if flags.user else None,
+            bots_only=flags.bots,
+            contains=flags.contains,
+            has_attachments=flags.attachments,
+        )
+        status = await self.reply(ctx, f"Clearing up to {count} messages...")
+
+        async def progress(job: PurgeJob):
+            if job.done:
+                state = "Cancelled" if job.cancelled else "Done"
+            else:
+                state = "Clearing"
+            text = f"{state}: {job.deleted} deleted, {job.scanned} scanned"
+            if job.old_pending:
+                text += f", {job.old_pending} older than 14 days still being deleted one by one"
+            if job.failed:
+                text += f", {job.failed} could not be deleted"
+            await status.edit(content=text)
+
+        job = PurgeJob(ctx.channel, count, filters, before=ctx.message, max_scan=MAX_PURGE * 2, progress=progress)
+        self._purges[ctx.channel.id] = job
+        try:
+            await job.run()
+        finally:
+            self._purges.pop(ctx.channel.id, None)
+        # the scan starts before the command so the status message survives;
+        # the command itself goes last, like the old purge removed it too
+        try:
+            await ctx.message.delete()
+        except discord.HTTPException:
+            pass
+
+    @clear.command(name="cancel")
+    @commands.guild_only()
+    @commands.has_permissions(manage_messages = True)
+    async def clear_cancel(self,ctx):
+        job = self._purges.get(ctx.channel.id)
+        if job is None:
+            await self.reply(ctx, "No purge is running in this channel.")
+            return
+        job.cancel()
+        await self.reply(ctx, "Stopping the purge...")
         
     @commands.command()
     @commands.has_permissions(kick_members = True)
     async def kick(self,ctx,member:discord.Member,*, reason="No Reason Provided"):
         await member.kick(reason=reason)
-        await ctx.reply(f"{member} successfully kicked,{reason}")
+        await self.reply(ctx, f"{member} successfully kicked,{reason}")
         
     @commands.command()
     @commands.has_permissions(ban_members = True)
     async def ban(self,ctx,member:discord.Member,*,reason="No Reason provided"):
         await member.ban(reason=reason)
-        await ctx.reply(f"{member} successfully banned, {reason}")
+        await self.reply(ctx, f"{member} successfully banned, {reason}")
     
     @commands.command()
     @commands.guild_only()
     @commands.has_permissions(ban_members = True)
     async def unban(self,ctx,userId:int):
-        user = await self.client.fetch_user(userId)
-        await ctx.guild.unban(user)
-        await ctx.reply(f"<@{userId}> successfully unbanned...")
+        await ctx.guild.unban(discord.Object(id=userId))
+        await self.reply(ctx, f"<@{userId}> successfully unbanned...")
+
+    # ------------------ Bulk actions ------------------
+    # !massban <ids or mentions...> [joined: minutes] [reason: text]
+    # `joined: 10` adds every cached member who joined in the last 10 minutes.
+    def _bulk_targets(self, ctx, users: List[discord.Object], joined: int = None) -> Tuple[List[discord.Object], int]:
+        """The users to act on, capped at MAX_BULK_TARGETS, and how many were left out by the cap."""
+        targets = {u.id: u for u in users}
+        if joined:
+            since = discord.utils.utcnow() - timedelta(minutes=joined)
+            for member in ctx.guild.members:
+                if member.joined_at and member.joined_at >= since:
+                    targets.setdefault(member.id, discord.Object(id=member.id))
+        # never act on the moderator or the bot itself
+        targets.pop(ctx.author.id, None)
+        targets.pop(ctx.guild.me.id, None)
+        targets = list(targets.values())
+        return targets[:MAX_BULK_TARGETS], max(0, len(targets) - MAX_BULK_TARGETS)
+
+    async def _run_bulk(self, targets: List[discord.Object], action: Callable[[discord.Object], Awaitable[None]]) -> Tuple[List[int], List[Tuple[int, str]]]:
+        done: List[int] = []
+        failed: List[Tuple[int, str]] = []
+        semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+
+        async def run(target: discord.Object):
+            async with semaphore:
+                try:
+                    await action(target)
+                except discord.NotFound:
+                    failed.append((target.id, "not found"))
+                except discord.Forbidden:
+                    failed.append((target.id, "missing permissions"))
+                except discord.HTTPException as e:
+                    failed.append((target.id, e.text or str(e.status)))
+                else:
+                    done.append(target.id)
+
+        await asyncio.gather(*(run(t) for t in targets))
+        return done, failed
+
+    async def _report(self, ctx, verb: str, done: List[int], failed: List[Tuple[int, str]], skipped: int = 0):
+        color = discord.Color.green() if not failed and not skipped else discord.Color.orange() if done else discord.Color.red()
+        description = f"{len(done)} succeeded, {len(failed)} failed."
+        if skipped:
+            # the rest were never attempted; say so, or it reads as if everyone was handled
+            description += f"\n**{skipped} not processed** (limit {MAX_BULK_TARGETS} per run), run the command again for them."
+        embed = discord.Embed(title=f"Mass {verb}", description=description, color=color)
+        if failed:
+            lines = [f"`{uid}`: {why}" for uid, why in failed[:20]]
+            if len(failed) > 20:
+                lines.append(f"... and {len(failed) - 20} more")
+            embed.add_field(name="Failed", value="\n".join(lines), inline=False)
+        await self.reply(ctx, embed=embed)
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.has_permissions(ban_members = True)
+    async def massban(self,ctx,users:commands.Greedy[discord.Object],*,flags:BulkFlags):
+        targets, skipped = self._bulk_targets(ctx, users, flags.joined)
+        if not targets:
+            await self.reply(ctx, "No users to ban.")
+            return
+
+        ban = lambda t: ctx.guild.ban(t, reason=flags.reason)
+        # the bulk endpoint also needs Manage Server; without it ban one by one
+        if not ctx.guild.me.guild_permissions.manage_guild:
+            done, failed = await self._run_bulk(targets, ban)
+            await self._report(ctx, "ban", done, failed, skipped)
+            return
+
+        done: List[int] = []
+        failed: List[Tuple[int, str]] = []
+        for start in range(0, len(targets), BULK_BAN_CHUNK):
+            chunk = targets[start:start + BULK_BAN_CHUNK]
+            try:
+                result = await ctx.guild.bulk_ban(chunk, reason=flags.reason)
+            except discord.Forbidden:
+                # permissions changed since the check
+                chunk_done, chunk_failed = await self._run_bulk(chunk, ban)
+                done.extend(chunk_done)
+                failed.extend(chunk_failed)
+                continue
+            except discord.HTTPException as e:
+                failed.extend((t.id, e.text or str(e.status)) for t in chunk)
+                continue
+            done.extend(u.id for u in result.banned)
+            failed.extend((u.id, "not banned") for u in result.failed)
+        await self._report(ctx, "ban", done, failed, skipped)
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.has_permissions(kick_members = True)
+    async def masskick(self,ctx,users:commands.Greedy[discord.Object],*,flags:BulkFlags):
+        targets, skipped = self._bulk_targets(ctx, users, flags.joined)
+        if not targets:
+            await self.reply(ctx, "No users to kick.")
+            return
+        done, failed = await self._run_bulk(targets, lambda t: ctx.guild.kick(t, reason=flags.reason))
+        await self._report(ctx, "kick", done, failed, skipped)
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.has_permissions(ban_members = True)
+    async def massunban(self,ctx,users:commands.Greedy[discord.Object],*,flags:BulkFlags):
+        if flags.joined:
+            await self.reply(ctx, "`joined:` doesn't work with massunban, banned users aren't members. List their IDs instead.")
+            return
+        targets, skipped = self._bulk_targets(ctx, users)
+        if not targets:
+            await self.reply(ctx, "No users to unban.")
+            return
+        done, failed = await self._run_bulk(targets, lambda t: ctx.guild.unban(t, reason=flags.reason))
+        await self._report(ctx, "unban", done, failed, skipped)
 
     
 async def setup(client):
@@ -0,0 +1,88 @@
+import asyncio
+import io
+import threading
+from typing import List, Optional
+
+import discord
+from discord.ext import commands
+from discord import app_commands
+
+from utils.profiling import SamplingProfiler
+from utils.scheduler import Priority
+
+# gateway intents this cog needs (read by utils.profiles before the bot starts)
+INTENTS = ()
+
+MAX_PROFILE_SECONDS = 120
+
+
+class Owner(commands.Cog):
+    def __init__(self, client):
+        self.client = client
+        self._profiling = False
+
+    # Slash command: sample the event loop thread and return the hottest functions
+    @app_commands.command(name="profile", description="Profile the bot for a few seconds (bot owner only)")
+    @app_commands.describe(seconds="How long to sample (1-120)", top="How many functions to list (5-100)")
+    async def profile(self, interaction: discord.Interaction, seconds: app_commands.Range[int, 1, MAX_PROFILE_SECONDS] = 10,
+                      top: app_commands.Range[int, 5, 100] = 25):
+        if not await self.client.is_owner(interaction.user):
+            await interaction.response.send_message("Only the bot owner can use this command.", ephemeral=True)
+            return
+        if self._profiling:
+            await interaction.response.send_message("A profile is already running.", ephemeral=True)
+            return
+
+        self._profiling = True
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            # commands run on the event loop's thread, which is the one to sample
+            profiler = SamplingProfiler(threading.get_ident())
+            await asyncio.to_thread(profiler.run, seconds)
+        finally:
+            self._profiling = False
+
+        report = io.BytesIO(profiler.report(top).encode())
+        await self.client.scheduler.send(
+            interaction.followup, Priority.INTERACTION,
+            f"Sampled the event loop for {seconds}s ({profiler.samples} samples).",
+            file=discord.File(report, filename="profile.txt"), ephemeral=True
+        )
+
+    # Slash command: reload one cog, or every cog whose file changed
+    @app_commands.command(name="reload", description="Reload changed cogs, or one cog by name (bot owner only)")
+    @app_commands.describe(extension="Cog to reload even if unchanged; leave empty for every changed cog")
+    async def reload(self, interaction: discord.Interaction, extension: Optional[str] = None):
+        if not await self.client.is_owner(interaction.user):
+            await interaction.response.send_message("Only the bot owner can use this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        # this cog may be the one being reloaded; the reply only needs the client
+        client = self.client
+        if extension:
+            lines = [await client.reloader.reload(extension)]
+        else:
+            lines = await client.reloader.check() or ["No cog files changed."]
+        await client.scheduler.send(interaction.followup, Priority.INTERACTION, "\n".join(lines)[:2000], ephemeral=True)
+
+    @reload.autocomplete("extension")
+    async def reload_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        return [app_commands.Choice(name=n, value=n) for n in self.client.reloader.names() if current.lower() in n.lower()][:25]
+
+    # Slash command: pick up config.db changes made outside the bot right away
+    @app_commands.command(name="reloadconfig", description="Reload server settings changed outside the bot (bot owner only)")
+    async def reload_config(self, interaction: discord.Interaction):
+        if not await self.client.is_owner(interaction.user):
+            await interaction.response.send_message("Only the bot owner can use this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        # only guilds whose rows changed are reported to the cogs' caches
+        changed = await self.client.store.refresh()
+        message = "Settings reloaded." if changed else "No settings changed since the last refresh."
+        await self.client.scheduler.send(interaction.followup, Priority.INTERACTION, message, ephemeral=True)
+
+
+async def setup(client):
+    await client.add_cog(Owner(client))
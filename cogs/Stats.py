@@ -0,0 +1,147 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import discord
+from discord.ext import commands, tasks
+from discord import app_commands
+
+from utils.activity import DELETES, EDITS, JOINS, WINDOWS, ActivityCounters, build_report, current_hour
+from utils.scheduler import Priority
+from utils.workers import process_pool
+
+# gateway intents this cog needs (read by utils.profiles before the bot starts)
+INTENTS = ("members", "guild_messages")
+
+
+class Stats(commands.Cog):
+    """Server activity analytics.
+
+    Joins, leaves, deletes and edits are counted per guild and hour as the
+    events arrive. /serverstats turns them into totals, rates, retention
+    and a chart. That work (pandas, matplotlib) runs in a worker process so
+    the event loop never waits on it. Reports end at the last completed
+    hour, so one is cached per guild and window until the hour changes,
+    however busy the guild is.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.activity = ActivityCounters()
+        # (guild_id, window) -> (last hour covered, report task)
+        self._reports: Dict[Tuple[int, str], Tuple[int, asyncio.Task]] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def cog_load(self):
+        self.prune_activity.start()
+
+    async def cog_unload(self):
+        self.prune_activity.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @tasks.loop(hours=1)
+    async def prune_activity(self):
+        self.activity.prune()
+
+    def _record(self, guild_id: int, column: int, count: int = 1):
+        self.activity.record(guild_id, column, count)
+
+    # ------------------ Event handlers ------------------
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        self._record(member.guild.id, JOINS)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        # fires for uncached members too; only a cached Member knows when it joined
+        joined_at = getattr(payload.user, "joined_at", None)
+        self.activity.record_leave(payload.guild_id, joined_at.timestamp() if joined_at else None)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if payload.guild_id is not None:
+            self._record(payload.guild_id, DELETES)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if payload.guild_id is not None:
+            self._record(payload.guild_id, DELETES, len(payload.message_ids))
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        # embed-only updates (link previews) aren't edits
+        if payload.guild_id is not None and "content" in payload.data:
+            self._record(payload.guild_id, EDITS)
+
+    # ------------------ Reports ------------------
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = process_pool()
+        return self._pool
+
+    def _report(self, guild: discord.Guild, window: str) -> asyncio.Task:
+        key = (guild.id, window)
+        # the running hour is still changing; leaving it out lets the
+        # report stay valid until the next one starts
+        hour = current_hour() - 1
+        cached = self._reports.get(key)
+        if cached is not None and cached[0] == hour:
+            return cached[1]
+
+        hours, _ = WINDOWS[window]
+        rows = self.activity.rows(guild.id, hour - hours + 1, hour)
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(loop.run_in_executor(self._executor(), build_report, rows, window, hour, guild.name))
+        # concurrent requests share the task; a failed one isn't cached
+        task.add_done_callback(lambda t: self._forget_failed(key, t))
+        self._reports[key] = (hour, task)
+        return task
+
+    def _forget_failed(self, key: Tuple[int, str], task: asyncio.Task):
+        if task.cancelled() or task.exception() is not None:
+            cached = self._reports.get(key)
+            if cached is not None and cached[1] is task:
+                del self._reports[key]
+
+    @app_commands.command(name="serverstats", description="Show join, leave, delete and edit activity for this server.")
+    @app_commands.describe(window="How far back to look")
+    @app_commands.choices(window=[app_commands.Choice(name=name, value=name) for name in WINDOWS])
+    async def server_stats(self, interaction: discord.Interaction, window: str = "7d"):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
+            return
+
+        await interaction.response.defer(thinking=True)
+        try:
+            summary, chart = await asyncio.shield(self._report(interaction.guild, window))
+        except Exception as e:
+            print(f"Failed to build server stats for {interaction.guild.id}: {e!r}")
+            await self.client.scheduler.send(interaction.followup, Priority.INTERACTION, "Could not build the stats, try again later.")
+            return
+
+        totals, per_hour, peak = summary["totals"], summary["per_hour"], summary["peak_hour"]
+        embed = discord.Embed(title=f"Server Activity: last {window}", color=discord.Color.blurple())
+        for name in ("joins", "leaves", "deletes", "edits"):
+            embed.add_field(
+                name=name.capitalize(),
+                value=f"{totals[name]} total\n{per_hour[name]:.2f}/h avg\n{peak[name]} peak hour",
+                inline=True,
+            )
+        embed.add_field(name="Net Members", value=f"{summary['net_members']:+d}", inline=True)
+        retention = summary["retention"]
+        embed.add_field(name="Retention", value="No joins" if retention is None else f"{retention:.0%} of new members stayed", inline=True)
+        embed.set_image(url="attachment://activity.png")
+        embed.set_footer(text="Counted since the bot last started, up to the last full hour")
+        await self.client.scheduler.send(
+            interaction.followup, Priority.INTERACTION, embed=embed, file=discord.File(io.BytesIO(chart), filename="activity.png")
+        )
+
+
+async def setup(client):
+    await client.add_cog(Stats(client))
@@ -1,33 +1,62 @@
+import os
+import time
+from collections import Counter
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
-import json
-import os
 
-PREFIX_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prefixes.json")
+from utils.scheduler import Priority
+from utils.shards import STALE_AFTER, shard_latencies
+
+# gateway intents this cog needs (read by utils.profiles before the bot starts)
+INTENTS = ("guild_messages", "message_content")
 
 
 class Utility(commands.Cog):
     def __init__(self,client):
         self.client = client
+
+    async def cog_load(self):
+        # a single unsharded bot has nobody to share status with; /shardstatus
+        # shows its own shard without the store. An AutoShardedBot set to
+        # "auto" only learns its shard_count once it connects.
+        if self.client.shard_count or isinstance(self.client, commands.AutoShardedBot):
+            self.report_shards.start()
+
+    async def cog_unload(self):
+        self.report_shards.cancel()
+
+    def _local_shards(self):
+        """(shard_id, latency, guild count) for every shard this process runs."""
+        guilds = Counter(g.shard_id for g in self.client.guilds)
+        return [(shard_id, latency, guilds.get(shard_id, 0)) for shard_id, latency in shard_latencies(self.client)]
+
+    # every process writes its own shards to the shared store, so any of
+    # them can answer /shardstatus for the whole cluster
+    @tasks.loop(seconds=15)
+    async def report_shards(self):
+        try:
+            await self.client.store.report_shards(self._local_shards())
+        except Exception as e:
+            print(f"Failed to report shard status: {e!r}")
+
+    @report_shards.before_loop
+    async def before_report_shards(self):
+        await self.client.wait_until_ready()
     
     # command to set prefix for a server 
     @commands.command()
     async def setprefix(self,ctx,*,newPrefix:str):
-        with open(PREFIX_PATH, "r") as f:
-            prefixes = json.load(f)
-        prefixes[str(ctx.guild.id)] = newPrefix
-        
-        with open(PREFIX_PATH,"w") as f:
-            json.dump(prefixes,f,indent=4)
+        await self.client.prefixes.set(ctx.guild.id, newPrefix)
         
-        await ctx.reply(f"Prefix for your server have been changed to {newPrefix}")
+        await self.client.scheduler.send(ctx, Priority.INTERACTION, f"Prefix for your server have been changed to {newPrefix}", reference=ctx.message)
 
     # ping command
     @commands.command()
     async def ping(self,ctx):
         bot_latency = round(self.client.latency * 1000)
-        await ctx.reply(f"Pong! {bot_latency} ms")
+        await self.client.scheduler.send(ctx, Priority.INTERACTION, f"Pong! {bot_latency} ms", reference=ctx.message)
         
     #slash command for ping
     @app_commands.command(name="ping", description="Shows bot latency")
@@ -35,6 +64,37 @@ class Utility(commands.Cog):
         latency = round(self.client.latency * 1000)
         await interaction.response.send_message(f"Pong! `{latency}ms`",ephemeral=True)
 
+    # Slash command: per-shard latency and guild counts across all processes
+    @app_commands.command(name="shardstatus", description="Shows latency and guild count of every shard")
+    async def shardstatus(self, interaction: discord.Interaction):
+        rows = await self.client.store.shard_statuses()
+        # this process's shards are always current, even before the first report
+        now = time.time()
+        for shard_id, latency, guilds in self._local_shards():
+            rows = [r for r in rows if r["shard_id"] != shard_id]
+            rows.append({"shard_id": shard_id, "pid": os.getpid(), "latency": latency, "guilds": guilds, "updated_at": now})
+        # rows left behind by a run with more shards
+        shard_count = self.client.shard_count or 1
+        rows = sorted((r for r in rows if r["shard_id"] < shard_count), key=lambda r: r["shard_id"])
+
+        lines = []
+        for r in rows:
+            latency = f"{r['latency'] * 1000:.0f}ms" if r["latency"] is not None else "connecting"
+            age = now - r["updated_at"]
+            stale = f" ⚠️ no report for {age:.0f}s" if age > STALE_AFTER else ""
+            lines.append(f"`#{r['shard_id']:<3}` {latency:>10} · {r['guilds']} guilds · pid {r['pid']}{stale}")
+
+        current = interaction.guild.shard_id if interaction.guild else 0
+        live = [r for r in rows if now - r["updated_at"] <= STALE_AFTER and r["latency"] is not None]
+        average = sum(r["latency"] for r in live) / len(live) * 1000 if live else 0
+        embed = discord.Embed(title="Shard Status", description="\n".join(lines)[:4096], color=discord.Color.blurple())
+        embed.add_field(name="Shards", value=str(len(rows)))
+        embed.add_field(name="Guilds", value=str(sum(r["guilds"] for r in rows)))
+        embed.add_field(name="Average Latency", value=f"{average:.0f}ms")
+        embed.add_field(name="Processes", value=str(len({r["pid"] for r in rows})))
+        embed.set_footer(text=f"This server is on shard {current}")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     # Slash command: greet
     @app_commands.command(name="greet", description="Greet a user")
     async def greet(self, interaction: discord.Interaction, user: discord.User):
@@ -1,31 +1,308 @@
+import asyncio
+import io
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
-import os
-from json import JSONDecodeError
+
+from utils.http_cache import FetchError, check_host
+from utils.scheduler import Priority
+from utils.templates import Template, TemplateError, compile_template
+
+# gateway intents this cog needs (read by utils.profiles before the bot starts)
+INTENTS = ("members",)
+
+# order matters: compiled templates refer to placeholders by position
+WELCOME_PLACEHOLDERS = ("user", "user.name", "user.discriminator", "user.id", "server", "member_count")
+
+# templated embed fields and what they render when the guild hasn't set them
+TEMPLATE_DEFAULTS = {
+    "title": "🎉 Welcome to the Server!",
+    "message": "Welcome {user} to the server!",
+    "author_name": "",
+    "footer": "Member #{member_count}",
+}
+
+# join-burst mode: more than `threshold` joins within `window` seconds switches
+# a guild from one embed per member to one digest embed every `window` seconds
+DEFAULT_BURST_THRESHOLD = 10
+DEFAULT_BURST_WINDOW = 10
+DEFAULT_BURST_MENTIONS = 25
+
+
+class JoinBurst:
+    """Per-guild join-rate tracking and the digest queue used during a burst."""
+
+    __slots__ = ("joins", "pending", "task", "expiry")
+
+    def __init__(self):
+        self.joins: Deque[float] = deque()
+        self.pending: List[discord.Member] = []
+        self.task: Optional[asyncio.Task] = None
+        # removes the entry once its window has drained (see Welcome._expire_burst)
+        self.expiry: Optional[asyncio.TimerHandle] = None
+
+    def record(self, now: float, window: float) -> int:
+        """Record a join and return how many joins fall inside the window."""
+        self.joins.append(now)
+        return self.count(now, window)
+
+    def count(self, now: float, window: float) -> int:
+        while self.joins and self.joins[0] <= now - window:
+            self.joins.popleft()
+        return len(self.joins)
+
+    @property
+    def active(self) -> bool:
+        return self.task is not None
+
+
+# ------------------------------------------------
+# /welcome setup: edit a draft of every embed field, save once
+# ------------------------------------------------
+# (config key, label, max length, paragraph style) for each modal page; templated keys are validated
+SETUP_TEXT_FIELDS = (
+    ("title", "Title", 256, False),
+    ("message", "Message", 2000, True),
+    ("author_name", "Author name", 256, False),
+    ("footer", "Footer", 2048, False),
+    ("color", "Color (hex, e.g. #5865F2)", 16, False),
+)
+SETUP_IMAGE_FIELDS = (
+    ("author_icon", "Author icon URL", 1000, False),
+    ("thumbnail", "Thumbnail URL (empty: member's avatar)", 1000, False),
+    ("image", "Image URL", 1000, False),
+)
+# Discord rejects the whole embed when an image URL has any other scheme
+IMAGE_URL_SCHEMES = ("http://", "https://", "attachment://")
+SETUP_KEYS = ("channel",) + tuple(key for key, *_ in SETUP_TEXT_FIELDS + SETUP_IMAGE_FIELDS)
+
+
+class WelcomeDraftModal(discord.ui.Modal):
+    """One modal page of the setup builder. Fields start at the draft's values."""
+
+    def __init__(self, setup_view: "WelcomeSetupView", title: str, fields):
+        super().__init__(title=title)
+        self.setup_view = setup_view
+        self.inputs: Dict[str, discord.ui.TextInput] = {}
+        for key, label, max_length, long in fields:
+            value = setup_view.draft.get(key, TEMPLATE_DEFAULTS.get(key))
+            if key == "color" and value is not None:
+                value = str(discord.Color(value))
+            text_input = discord.ui.TextInput(
+                label=label,
+                style=discord.TextStyle.long if long else discord.TextStyle.short,
+                default=value or None,
+                required=key == "message",
+                max_length=max_length,
+            )
+            self.inputs[key] = text_input
+            self.add_item(text_input)
+
+    async def on_submit(self, interaction: discord.Interaction):
+        changes = {}
+        for key, text_input in self.inputs.items():
+            value = text_input.value.strip()
+            if key == "color" and value:
+                try:
+                    value = discord.Color.from_str(value).value
+                except ValueError:
+                    await interaction.response.send_message(f"`{value}` is not a color, try `#5865F2`.", ephemeral=True)
+                    return
+            elif key in TEMPLATE_DEFAULTS and value:
+                error = Welcome.validate_template(value)
+                if error:
+                    await interaction.response.send_message(f"{text_input.label}: {error}", ephemeral=True)
+                    return
+            elif key not in TEMPLATE_DEFAULTS and value and not value.startswith(IMAGE_URL_SCHEMES):
+                await interaction.response.send_message(
+                    f"{text_input.label}: `{value}` is not a link, it has to start with http:// or https://.", ephemeral=True
+                )
+                return
+            changes[key] = value if value != "" else None
+
+        draft = self.setup_view.draft
+        previous = dict(draft)
+        for key, value in changes.items():
+            if value is None and key in TEMPLATE_DEFAULTS:
+                # an emptied templated field means "no text", not "back to the default"
+                value = ""
+            if value is None or value == TEMPLATE_DEFAULTS.get(key):
+                draft.pop(key, None)
+            else:
+                draft[key] = value
+        await self.setup_view.refresh(interaction, previous)
+
+
+class WelcomeSetupView(discord.ui.View):
+    """Ephemeral builder: edits go to an in-memory draft and the preview is
+    re-rendered from it; nothing is written until Save, which commits every
+    changed field in one store transaction.
+    """
+
+    def __init__(self, cog: "Welcome", member: discord.Member, conf: dict):
+        # well inside the 15 minutes the interaction token can still edit the message
+        super().__init__(timeout=600)
+        self.cog = cog
+        self.member = member
+        self.original = {key: conf[key] for key in SETUP_KEYS if key in conf}
+        self.draft = dict(self.original)
+        self.message_interaction: Optional[discord.Interaction] = None
+        channel = member.guild.get_channel(self.draft.get("channel") or 0)
+        if channel is not None:
+            self.channel_select.default_values = [channel]
+
+    def render(self) -> Tuple[str, discord.Embed]:
+        channel = self.draft.get("channel")
+        changed = sum(1 for key in SETUP_KEYS if self.draft.get(key) != self.original.get(key))
+        content = (
+            f"**Welcome setup** - channel: {f'<#{channel}>' if channel else 'not set'}"
+            f" - {changed} unsaved change(s). Preview below; nothing is saved until you press Save."
+        )
+        embed = self.cog.build_embed(self.member, self.cog._compile(self.draft))
+        return content, embed
+
+    async def refresh(self, interaction: discord.Interaction, previous: dict):
+        """Show the draft; if Discord refuses the preview, put `previous` back so the builder stays usable."""
+        content, embed = self.render()
+        try:
+            await interaction.response.edit_message(content=content, embed=embed, view=self)
+        except discord.HTTPException as e:
+            self.draft = previous
+            await interaction.response.send_message(
+                f"Discord rejected that change, it was undone: {e.text or e.status}", ephemeral=True
+            )
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.member.id:
+            await interaction.response.send_message("This setup belongs to someone else.", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self):
+        if self.message_interaction is not None:
+            try:
+                await self.message_interaction.edit_original_response(content="Welcome setup timed out, nothing was saved.", view=None)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.select(
+        cls=discord.ui.ChannelSelect,
+        channel_types=[discord.ChannelType.text, discord.ChannelType.news],
+        placeholder="Welcome channel",
+        row=0,
+    )
+    async def channel_select(self, interaction: discord.Interaction, select: discord.ui.ChannelSelect):
+        previous = dict(self.draft)
+        self.draft["channel"] = select.values[0].id
+        await self.refresh(interaction, previous)
+
+    @discord.ui.button(label="Text and color", style=discord.ButtonStyle.secondary, row=1)
+    async def edit_text(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(WelcomeDraftModal(self, "Welcome text", SETUP_TEXT_FIELDS))
+
+    @discord.ui.button(label="Images", style=discord.ButtonStyle.secondary, row=1)
+    async def edit_images(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(WelcomeDraftModal(self, "Welcome images", SETUP_IMAGE_FIELDS))
+
+    @discord.ui.button(label="Save", style=discord.ButtonStyle.success, row=2)
+    async def save(self, interaction: discord.Interaction, button: discord.ui.Button):
+        changes = {key: self.draft.get(key) for key in SETUP_KEYS if self.draft.get(key) != self.original.get(key)}
+        if changes:
+            # one transaction for the whole draft; keys it didn't touch are left alone
+            await self.cog.store.update("welcome", self.member.guild.id, changes)
+        self.stop()
+        content, embed = self.render()
+        await interaction.response.edit_message(
+            content=f"Welcome setup saved ({len(changes)} field(s) changed).", embed=embed, view=None
+        )
+
+    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.danger, row=2)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.stop()
+        await interaction.response.edit_message(content="Welcome setup cancelled, nothing was saved.", embed=None, view=None)
+
 
 class Welcome(commands.Cog):
     def __init__(self, client):
         self.client = client
-        self.file_path = os.path.join(os.getcwd(), "welcome.json")
+        # setters use store.update_later(): building an embed is a burst of
+        # commands, and the store commits them together a moment later
+        self.store = client.store
+
+        # guild_id -> (config, compiled templates); dropped whenever the guild's config changes
+        self._templates: Dict[int, Tuple[dict, Dict[str, Template]]] = {}
+        self.store.subscribe("welcome", self._invalidate)
+
+        self._bursts: Dict[int, JoinBurst] = {}
+
+        # generated welcome cards (utils/cards.py); None when the bot runs without them
+        self.cards = client.cards
+
+    async def cog_unload(self):
+        self.store.unsubscribe("welcome", self._invalidate)
+        for burst in self._bursts.values():
+            if burst.task:
+                burst.task.cancel()
+            if burst.expiry:
+                burst.expiry.cancel()
+
+    def _invalidate(self, guild_id: int, conf: dict):
+        self._templates.pop(guild_id, None)
+
+    def _compiled(self, guild_id: int) -> Tuple[dict, Dict[str, Template]]:
+        entry = self._templates.get(guild_id)
+        if entry is None:
+            entry = self._templates[guild_id] = self._compile(self.store.get("welcome", guild_id))
+        return entry
+
+    @staticmethod
+    def _compile(conf: dict) -> Tuple[dict, Dict[str, Template]]:
+        templates = {
+            field: compile_template(conf.get(field, default), WELCOME_PLACEHOLDERS)
+            for field, default in TEMPLATE_DEFAULTS.items()
+        }
+        return conf, templates
+
+    @staticmethod
+    def _color(guild_conf: dict) -> discord.Color:
+        color = guild_conf.get("color")
+        return discord.Color(color) if color is not None else discord.Color.blurple()
+
+    @staticmethod
+    def validate_template(text: str) -> Optional[str]:
+        """Return an error message if `text` isn't a valid welcome template."""
+        try:
+            compile_template(text, WELCOME_PLACEHOLDERS, strict=True)
+        except TemplateError as e:
+            return str(e)
+        return None
 
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, "w") as f:
-                json.dump({}, f, indent=4)
+    # ------------------------------------------------
+    # SLASH COMMAND: /welcome setup (every field in one session)
+    # ------------------------------------------------
+    welcome_group = app_commands.Group(name="welcome", description="Welcome message settings.")
 
-    # utility: load json
-    def load_data(self):
-        try:
-            with open(self.file_path, "r") as f:
-                return json.load(f)
-        except (FileNotFoundError, JSONDecodeError):
-            return {}
+    @welcome_group.command(
+        name="setup",
+        description="Edit the whole welcome embed with a live preview, then save it in one go."
+    )
+    async def welcome_setup(self, interaction: discord.Interaction):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
+            return
 
-    # utility: save json
-    def save_data(self, data):
-        with open(self.file_path, "w") as f:
-            json.dump(data, f, indent=4)
+        view = WelcomeSetupView(self, interaction.user, self.store.get("welcome", interaction.guild.id))
+        content, embed = view.render()
+        await interaction.response.send_message(content, embed=embed, view=view, ephemeral=True)
+        view.message_interaction = interaction
 
     # ------------------------------------------------
     # SLASH COMMAND: Set Welcome Channel
@@ -44,13 +321,7 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        data = self.load_data()
-        guild_id = str(interaction.guild.id)
-
-        data[guild_id] = data.get(guild_id, {})
-        data[guild_id]["channel"] = channel.id
-
-        self.save_data(data)
+        self.store.update_later("welcome", interaction.guild.id, {"channel": channel.id})
 
         embed = discord.Embed(
             title="Welcome Channel Updated",
@@ -77,7 +348,7 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        guild_id = str(interaction.guild.id)
+        guild_id = interaction.guild.id
 
         # Modal for multi-line welcome message
         class WelcomeMessageModal(discord.ui.Modal, title="Set Welcome Message"):
@@ -89,22 +360,26 @@ class Welcome(commands.Cog):
                 max_length=2000,
             )
 
-            def __init__(self, parent_cog, guild_id: str):
+            def __init__(self, parent_cog, guild_id: int):
                 super().__init__()
                 self.parent_cog = parent_cog
                 self.guild_id = guild_id
 
             async def on_submit(self, modal_interaction: discord.Interaction):
-                data = self.parent_cog.load_data()
-                data[self.guild_id] = data.get(self.guild_id, {})
-                data[self.guild_id]["message"] = self.message.value
-                self.parent_cog.save_data(data)
+                error = self.parent_cog.validate_template(self.message.value)
+                if error:
+                    await modal_interaction.response.send_message(f"Welcome message not saved. {error}", ephemeral=True)
+                    return
+
+                self.parent_cog.store.update_later("welcome", self.guild_id, {"message": self.message.value})
 
                 try:
                     await modal_interaction.response.send_message("Welcome message saved.", ephemeral=True)
                 except Exception:
                     # fallback if response already used
-                    await modal_interaction.followup.send("Welcome message saved.", ephemeral=True)
+                    await self.parent_cog.client.scheduler.send(
+                        modal_interaction.followup, Priority.INTERACTION, "Welcome message saved.", ephemeral=True
+                    )
 
         modal = WelcomeMessageModal(self, guild_id)
         await interaction.response.send_modal(modal)
@@ -126,12 +401,12 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        data = self.load_data()
-        guild_id = str(interaction.guild.id)
+        error = self.validate_template(title)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
 
-        data[guild_id] = data.get(guild_id, {})
-        data[guild_id]["title"] = title
-        self.save_data(data)
+        self.store.update_later("welcome", interaction.guild.id, {"title": title})
 
         await interaction.response.send_message(f"Welcome title set to:\n`{title}`")
 
@@ -148,11 +423,12 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        data = self.load_data()
-        guild_id = str(interaction.guild.id)
-        data[guild_id] = data.get(guild_id, {})
-        data[guild_id]["footer"] = footer
-        self.save_data(data)
+        error = self.validate_template(footer)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+
+        self.store.update_later("welcome", interaction.guild.id, {"footer": footer})
 
         await interaction.response.send_message(f"Welcome footer set to:\n`{footer}`")
 
@@ -169,11 +445,7 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        data = self.load_data()
-        guild_id = str(interaction.guild.id)
-        data[guild_id] = data.get(guild_id, {})
-        data[guild_id]["thumbnail"] = url
-        self.save_data(data)
+        self.store.update_later("welcome", interaction.guild.id, {"thumbnail": url})
 
         await interaction.response.send_message(f"Welcome thumbnail URL set.")
 
@@ -190,11 +462,7 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        data = self.load_data()
-        guild_id = str(interaction.guild.id)
-        data[guild_id] = data.get(guild_id, {})
-        data[guild_id]["image"] = url
-        self.save_data(data)
+        self.store.update_later("welcome", interaction.guild.id, {"image": url})
 
         await interaction.response.send_message(f"Welcome image URL set.")
 
@@ -211,11 +479,12 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        data = self.load_data()
-        guild_id = str(interaction.guild.id)
-        data[guild_id] = data.get(guild_id, {})
-        data[guild_id]["author_name"] = name
-        self.save_data(data)
+        error = self.validate_template(name)
+        if error:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+
+        self.store.update_later("welcome", interaction.guild.id, {"author_name": name})
 
         await interaction.response.send_message(f"Welcome author name set to:\n`{name}`")
 
@@ -232,14 +501,81 @@ class Welcome(commands.Cog):
             await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
             return
 
-        data = self.load_data()
-        guild_id = str(interaction.guild.id)
-        data[guild_id] = data.get(guild_id, {})
-        data[guild_id]["author_icon"] = url
-        self.save_data(data)
+        self.store.update_later("welcome", interaction.guild.id, {"author_icon": url})
 
         await interaction.response.send_message(f"Welcome author icon URL set.")
 
+    @app_commands.command(
+        name="setwelcomecard",
+        description="Turn the generated welcome card image on or off, optionally with a background image URL."
+    )
+    async def set_welcome_card(self, interaction: discord.Interaction, enabled: bool, background: Optional[str] = None):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
+            return
+
+        if enabled and self.cards is None:
+            await interaction.response.send_message("Welcome cards are not available on this bot.", ephemeral=True)
+            return
+
+        if background:
+            # the bot host fetches this URL, so it must be a public https address
+            try:
+                await check_host(background)
+            except FetchError as e:
+                await interaction.response.send_message(f"Invalid background URL: {e}", ephemeral=True)
+                return
+
+        changes = {"card": enabled}
+        if background is not None:
+            changes["card_background"] = background or None
+        self.store.update_later("welcome", interaction.guild.id, changes)
+
+        if enabled:
+            await interaction.response.send_message("Welcome card enabled. Use `/previewwelcome` to see it.")
+        else:
+            await interaction.response.send_message("Welcome card disabled.")
+
+    # ------------------------------------------------
+    # SLASH COMMAND: Join-burst (digest) settings
+    # ------------------------------------------------
+    @app_commands.command(
+        name="setwelcomeburst",
+        description="Switch to a digest welcome when more than `threshold` members join within `window` seconds."
+    )
+    async def set_welcome_burst(
+        self,
+        interaction: discord.Interaction,
+        threshold: app_commands.Range[int, 0, 1000],
+        window: app_commands.Range[int, 1, 600] = DEFAULT_BURST_WINDOW,
+        max_mentions: app_commands.Range[int, 1, 80] = DEFAULT_BURST_MENTIONS,
+    ):
+        if not interaction.guild:
+            await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
+            return
+
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("You need the Manage Server permission to use this command.", ephemeral=True)
+            return
+
+        self.store.update_later(
+            "welcome",
+            interaction.guild.id,
+            {"burst_threshold": threshold, "burst_window": window, "burst_mentions": max_mentions},
+        )
+
+        if threshold == 0:
+            await interaction.response.send_message("Join-burst digests disabled, every member gets their own welcome.")
+        else:
+            await interaction.response.send_message(
+                f"More than `{threshold}` joins within `{window}s` will be welcomed with one digest every `{window}s` "
+                f"(mentioning up to `{max_mentions}` members)."
+            )
+
     # ------------------------------------------------
     # SLASH COMMAND: Show available placeholders
     # ------------------------------------------------
@@ -256,6 +592,7 @@ class Welcome(commands.Cog):
             "`{user.id}` - user's ID\n"
             "`{server}` - server name\n"
             "`{member_count}` - server member count\n"
+            "Use `{{` and `}}` for literal braces.\n"
         )
 
         await interaction.response.send_message(desc, ephemeral=True)
@@ -266,15 +603,12 @@ class Welcome(commands.Cog):
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
 
-        data = self.load_data()
-        guild_id = str(member.guild.id)
+        guild_conf, _ = self._compiled(member.guild.id)
 
-        if guild_id not in data:
+        if not guild_conf:
             return
 
-        channel_id = data[guild_id].get("channel")
-        welcome_msg = data[guild_id].get("message", "Welcome {user} to the server!")
-
+        channel_id = guild_conf.get("channel")
         if not channel_id:
             return
 
@@ -282,28 +616,143 @@ class Welcome(commands.Cog):
         if not channel:
             return
 
-        # Prepare welcome embed, allowing customized fields
-        guild_conf = data.get(guild_id, {})
+        if self._coalesce(member, guild_conf):
+            return
+
+        embed = self.build_embed(member)
+        card = await self._card_file(member, guild_conf, embed)
+        # stored, then delivered in order and retried if Discord is having trouble
+        self.client.outbox.put(channel, Priority.WELCOME, "welcome", embeds=[embed], file=card)
+
+    # ------------------------------------------------
+    # Helper: join-burst detection and digests
+    # ------------------------------------------------
+    def _coalesce(self, member: discord.Member, guild_conf: dict) -> bool:
+        """Queue the member for a digest if the guild is in a join burst."""
+        threshold = guild_conf.get("burst_threshold", DEFAULT_BURST_THRESHOLD)
+        if not threshold:
+            return False
+        window = guild_conf.get("burst_window", DEFAULT_BURST_WINDOW)
+
+        burst = self._bursts.get(member.guild.id)
+        if burst is None:
+            burst = self._bursts[member.guild.id] = JoinBurst()
+        joins = burst.record(time.monotonic(), window)
+
+        if not burst.active and joins <= threshold:
+            self._schedule_expiry(member.guild.id, burst, window)
+            return False
+
+        burst.pending.append(member)
+        if not burst.active:
+            burst.task = asyncio.create_task(self._run_digests(member.guild, burst))
+        return True
+
+    def _schedule_expiry(self, guild_id: int, burst: JoinBurst, window: float):
+        # one timer per guild; it re-arms itself while joins are still in the window
+        if burst.expiry is None and burst.joins:
+            delay = burst.joins[-1] + window - time.monotonic()
+            burst.expiry = asyncio.get_running_loop().call_later(max(0.0, delay), self._expire_burst, guild_id, burst)
+
+    def _expire_burst(self, guild_id: int, burst: JoinBurst):
+        burst.expiry = None
+        if burst.active or self._bursts.get(guild_id) is not burst:
+            return
+        guild_conf, _ = self._compiled(guild_id)
+        window = guild_conf.get("burst_window", DEFAULT_BURST_WINDOW)
+        if burst.count(time.monotonic(), window):
+            self._schedule_expiry(guild_id, burst, window)
+        else:
+            del self._bursts[guild_id]
+
+    async def _run_digests(self, guild: discord.Guild, burst: JoinBurst):
+        try:
+            while True:
+                guild_conf, _ = self._compiled(guild.id)
+                window = guild_conf.get("burst_window", DEFAULT_BURST_WINDOW)
+                await asyncio.sleep(window)
+
+                guild_conf, _ = self._compiled(guild.id)
+                members, burst.pending = burst.pending, []
+                if members:
+                    await self._send_digest(guild, guild_conf, members)
+
+                # leave burst mode once joins in the last window are back under the threshold
+                threshold = guild_conf.get("burst_threshold", DEFAULT_BURST_THRESHOLD)
+                if not members and burst.count(time.monotonic(), window) <= threshold:
+                    break
+        finally:
+            burst.task = None
+            if not burst.joins:
+                self._bursts.pop(guild.id, None)
+            elif self._bursts.get(guild.id) is burst:
+                guild_conf, _ = self._compiled(guild.id)
+                self._schedule_expiry(guild.id, burst, guild_conf.get("burst_window", DEFAULT_BURST_WINDOW))
+
+    async def _send_digest(self, guild: discord.Guild, guild_conf: dict, members: List[discord.Member]):
+        channel = guild.get_channel(guild_conf.get("channel") or 0)
+        if not channel:
+            return
+
+        limit = guild_conf.get("burst_mentions", DEFAULT_BURST_MENTIONS)
+        mentions = ", ".join(m.mention for m in members[:limit])
+        extra = len(members) - limit
+        if extra > 0:
+            mentions += f" and {extra} more"
+
+        embed = discord.Embed(
+            title=f"🎉 Welcome to {guild.name}, {len(members)} new members!",
+            description=f"Welcome {mentions}!",
+            color=self._color(guild_conf),
+        )
+        embed.set_footer(text=f"Member #{guild.member_count}")
+        self.client.outbox.put(channel, Priority.WELCOME, "welcome", embeds=[embed])
 
-        def fmt(text: str) -> str:
-            if not text:
-                return text
-            return (
-                text.replace("{user}", member.mention)
-                    .replace("{user.name}", member.name)
-                    .replace("{user.discriminator}", member.discriminator)
-                    .replace("{user.id}", str(member.id))
-                    .replace("{server}", member.guild.name)
-                    .replace("{member_count}", str(member.guild.member_count))
+    # ------------------------------------------------
+    # Helper: generated welcome card
+    # ------------------------------------------------
+    async def _card_file(self, member: discord.Member, guild_conf: dict, embed: discord.Embed) -> Optional[discord.File]:
+        """Render (or reuse) the member's card and point the embed's image at it."""
+        if not guild_conf.get("card") or self.cards is None:
+            return None
+        avatar = member.display_avatar
+        try:
+            data = await self.cards.card(
+                guild_conf.get("card_background"),
+                avatar.key,
+                avatar.replace(size=256, static_format="png").url,
+                f"Welcome, {member.name}!",
+                f"Member #{member.guild.member_count} of {member.guild.name}",
             )
+        except Exception as e:
+            print(f"Failed to render welcome card in {member.guild.id}: {e!r}")
+            return None
+        embed.set_image(url="attachment://welcome.png")
+        return discord.File(io.BytesIO(data), filename="welcome.png")
 
-        title = fmt(guild_conf.get("title", "🎉 Welcome to the Server!"))
-        description = fmt(guild_conf.get("message", welcome_msg.replace("{user}", member.mention)))
+    # ------------------------------------------------
+    # Helper: build the welcome embed for a member
+    # ------------------------------------------------
+    def build_embed(self, member: discord.Member, compiled: Optional[Tuple[dict, Dict[str, Template]]] = None) -> discord.Embed:
+        # `compiled` renders an unsaved draft (/welcome setup) instead of the stored config
+        guild_conf, templates = compiled or self._compiled(member.guild.id)
+
+        values = (
+            member.mention,
+            member.name,
+            member.discriminator,
+            str(member.id),
+            member.guild.name,
+            str(member.guild.member_count),
+        )
+        title = templates["title"].render(values)
+        description = templates["message"].render(values)
+        author_name = templates["author_name"].render(values)
+        footer_text = templates["footer"].render(values)
 
-        embed = discord.Embed(title=title, description=description, color=discord.Color.blurple())
+        embed = discord.Embed(title=title, description=description, color=self._color(guild_conf))
 
         # author
-        author_name = fmt(guild_conf.get("author_name", ""))
         author_icon = guild_conf.get("author_icon")
         if author_name:
             try:
@@ -331,26 +780,10 @@ class Welcome(commands.Cog):
                 pass
 
         # footer
-        footer_text = fmt(guild_conf.get("footer", f"Member #{member.guild.member_count}"))
         if footer_text:
             embed.set_footer(text=footer_text)
 
-        await channel.send(embed=embed)
-
-    # ------------------------------------------------
-    # Helper: format placeholders in text for a given member
-    # ------------------------------------------------
-    def format_placeholders(self, text: str, member: discord.Member) -> str:
-        if text is None:
-            return text
-        return (
-            text.replace("{user}", member.mention)
-                .replace("{user.name}", member.name)
-                .replace("{user.discriminator}", member.discriminator)
-                .replace("{user.id}", str(member.id))
-                .replace("{server}", member.guild.name)
-                .replace("{member_count}", str(member.guild.member_count))
-        )
+        return embed
 
     # ------------------------------------------------
     # SLASH COMMAND: Preview Welcome Embed
@@ -367,51 +800,19 @@ class Welcome(commands.Cog):
 
         member = member or interaction.user
 
-        data = self.load_data()
-        guild_id = str(interaction.guild.id)
-        guild_conf = data.get(guild_id, {})
-
         # Build preview using same logic as on_member_join
-        title = self.format_placeholders(guild_conf.get("title", "🎉 Welcome to the Server!"), member)
-        message_template = guild_conf.get("message", "Welcome {user} to the server!")
-        description = self.format_placeholders(guild_conf.get("message", message_template.replace("{user}", member.mention)), member)
-
-        embed = discord.Embed(title=title, description=description, color=discord.Color.blurple())
+        embed = self.build_embed(member)
 
-        # author
-        author_name = self.format_placeholders(guild_conf.get("author_name", ""), member)
-        author_icon = guild_conf.get("author_icon")
-        if author_name:
-            try:
-                embed.set_author(name=author_name, icon_url=author_icon)
-            except Exception:
-                embed.set_author(name=author_name)
-
-        # thumbnail (fallback to user's avatar if not set)
-        thumbnail_url = guild_conf.get("thumbnail")
-        if not thumbnail_url:
-            try:
-                thumbnail_url = member.display_avatar.url
-            except Exception:
-                thumbnail_url = None
-
-        if thumbnail_url:
-            embed.set_thumbnail(url=thumbnail_url)
-
-        # image
-        image_url = guild_conf.get("image")
-        if image_url:
-            try:
-                embed.set_image(url=image_url)
-            except Exception:
-                pass
-
-        # footer
-        footer_text = self.format_placeholders(guild_conf.get("footer", f"Member #{member.guild.member_count}"), member)
-        if footer_text:
-            embed.set_footer(text=footer_text)
+        guild_conf, _ = self._compiled(interaction.guild.id)
+        if not guild_conf.get("card") or self.cards is None:
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
 
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        # a card that isn't cached yet may take longer than the 3s reply window
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        card = await self._card_file(member, guild_conf, embed)
+        kwargs = {"file": card} if card else {}
+        await self.client.scheduler.send(interaction.followup, Priority.INTERACTION, embed=embed, ephemeral=True, **kwargs)
 
 async def setup(client):
     await client.add_cog(Welcome(client))
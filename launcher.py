@@ -0,0 +1,140 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+from dotenv import load_dotenv
+
+from utils.shards import format_shard_ids, split_shards
+
+# Runs the bot as several processes, each with an AutoShardedBot over its own
+# range of shards. All of them share config.db, so settings changed through one
+# process reach the others on their next store refresh.
+#
+#   python launcher.py --processes 4              # shard count from Discord
+#   python launcher.py --processes 2 --shards 8
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN = os.path.join(BASE_DIR, "main.py")
+# a worker that crashes is restarted after this many seconds, doubling up to the max
+RESTART_DELAY = 5.0
+MAX_RESTART_DELAY = 300.0
+# a worker that ran this long is considered healthy again
+HEALTHY_AFTER = 600.0
+
+
+def recommended_shards(token: str) -> int:
+    response = requests.get(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={"Authorization": f"Bot {token}"},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return response.json()["shards"]
+
+
+class Worker:
+    def __init__(self, shard_ids, shard_count: int, metrics_port: int, extra_args):
+        self.shard_ids = format_shard_ids(shard_ids)
+        self.shard_count = shard_count
+        self.metrics_port = metrics_port
+        self.extra_args = extra_args
+        self.process = None
+        self.started_at = 0.0
+        self.restart_at = 0.0
+        self.delay = RESTART_DELAY
+
+    def start(self):
+        env = dict(
+            os.environ,
+            SHARD_COUNT=str(self.shard_count),
+            SHARD_IDS=self.shard_ids,
+            METRICS_PORT=str(self.metrics_port),
+        )
+        self.process = subprocess.Popen([sys.executable, MAIN, *self.extra_args], env=env, cwd=BASE_DIR)
+        self.started_at = time.monotonic()
+        print(f"[launcher] shards {self.shard_ids}: started pid {self.process.pid}")
+
+    def check(self):
+        """Restart the worker with backoff if it exited."""
+        now = time.monotonic()
+        if self.process is None:
+            if now >= self.restart_at:
+                self.start()
+            return
+        code = self.process.poll()
+        if code is None:
+            return
+        if now - self.started_at >= HEALTHY_AFTER:
+            self.delay = RESTART_DELAY
+        print(f"[launcher] shards {self.shard_ids}: exited with {code}, restarting in {self.delay:.0f}s")
+        self.process = None
+        self.restart_at = now + self.delay
+        self.delay = min(self.delay * 2, MAX_RESTART_DELAY)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def wait(self, timeout: float):
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot as several sharded processes")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--shards", type=int, help="total shard count (default: Discord's recommendation)")
+    args, extra_args = parser.parse_known_args()
+
+    shard_count = args.shards
+    if shard_count is None:
+        shard_count = recommended_shards(os.getenv("DISCORD_TOKEN"))
+        print(f"[launcher] Discord recommends {shard_count} shards")
+
+    # each worker serves its own /metrics, on consecutive ports
+    metrics_port = int(os.getenv("METRICS_PORT", "9100"))
+    workers = [
+        Worker(ids, shard_count, metrics_port + i if metrics_port else 0, extra_args)
+        for i, ids in enumerate(split_shards(shard_count, args.processes))
+    ]
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for worker in workers:
+        worker.start()
+        # identify calls are rate limited per bot; don't start every process at once
+        time.sleep(5)
+        if stopping:
+            break
+
+    while not stopping:
+        for worker in workers:
+            worker.check()
+        time.sleep(1)
+
+    print("[launcher] stopping workers...")
+    for worker in workers:
+        worker.stop()
+    for worker in workers:
+        worker.wait(30)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,239 @@
+import argparse
 import asyncio
 import json
 import logging
 import os
 import sys
+import time
 from pathlib import Path
 from typing import Optional
 import discord
+import yarl
 from discord.ext import commands, tasks
 from itertools import cycle
 from dotenv import load_dotenv
+from utils.archive import EventArchive
+from utils.cards import CardRenderer
+from utils.loader import CogLoader
+from utils.monitoring import MetricsServer, instrumented
+from utils.outbox import Outbox
+from utils.prefixes import PrefixCache
+from utils.profiling import HandlerProfiler
+from utils.profiles import bot_options, memory_usage_mb
+from utils.reloader import CogReloader
+from utils.scheduler import SendScheduler
+from utils.shards import parse_shard_ids
+from utils.store import ConfigStore
+from utils.tree_sync import TreeSyncer
+
+# Worker processes (utils/workers.py) are spawned and import this file
+# again as __mp_main__. Module level therefore only reads configuration;
+# everything that prints, patches discord or builds the bot runs in main().
 
 # Load environment variables
 load_dotenv()
 
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 DEFAULT_PREFIX = os.getenv("PREFIX", "!")
+# minimal / standard / full, see utils/profiles.py
+BOT_PROFILE = os.getenv("BOT_PROFILE", "standard")
+# sharding: SHARD_COUNT ("auto" or a number) switches to AutoShardedBot,
+# SHARD_IDS ("0-3" or "0,1,2") limits this process to some of the shards and
+# needs a numeric SHARD_COUNT, so the ids mean the same in every process.
+# launcher.py sets both when it splits the shards across processes.
+SHARD_COUNT = os.getenv("SHARD_COUNT")
+SHARD_IDS = parse_shard_ids(os.getenv("SHARD_IDS"))
+SHARDED = bool(SHARD_COUNT or SHARD_IDS)
+# Prometheus metrics at http://METRICS_HOST:METRICS_PORT/metrics, 0 turns them off
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+# PROFILE_HANDLERS=1 measures how long every listener and command blocks the
+# event loop and logs a stack when one blocks for longer than SLOW_HANDLER_MS
+PROFILE_HANDLERS = os.getenv("PROFILE_HANDLERS", "").lower() in ("1", "true", "yes")
+SLOW_HANDLER_MS = float(os.getenv("SLOW_HANDLER_MS", "100"))
+# Logs also writes every logged event to a local archive (searchable with
+# /searchlogs); segments older than ARCHIVE_RETENTION_DAYS are deleted, 0 keeps them
+ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "30"))
+# HOT_RELOAD=1 reloads a cog as soon as its file in cogs/ changes; the owner
+# can always reload by hand with /reload
+HOT_RELOAD = os.getenv("HOT_RELOAD", "").lower() in ("1", "true", "yes")
+# talk to another API and gateway than Discord's, e.g. benchmarks/mock_discord.py
+DISCORD_API_BASE = os.getenv("DISCORD_API_BASE")
+DISCORD_GATEWAY_URL = os.getenv("DISCORD_GATEWAY_URL")
+
+STARTED_AT = time.perf_counter()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_DB = os.getenv("CONFIG_DB", os.path.join(BASE_DIR, "config.db"))
+COGS_DIR = os.path.join(BASE_DIR, "cogs")
+TREE_STATE = os.getenv("TREE_STATE", os.path.join(BASE_DIR, ".tree_sync.json"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(BASE_DIR, "archive"))
+# welcome and log messages waiting for delivery (utils/outbox.py)
+OUTBOX_DB = os.getenv("OUTBOX_DB", os.path.join(BASE_DIR, "outbox.db"))
+# rendered welcome cards, by content hash; safe to share between processes
+CARD_CACHE_DIR = os.getenv("CARD_CACHE_DIR", os.path.join(BASE_DIR, "card_cache"))
+if SHARD_IDS:
+    # one archive per shard process; a guild's events stay with its shard
+    ARCHIVE_DIR = os.path.join(ARCHIVE_DIR, f"shard-{SHARD_IDS[0]}")
+    # same for the outbox: only this process can deliver to its guilds' channels
+    OUTBOX_DB = f"{os.path.splitext(OUTBOX_DB)[0]}-shard-{SHARD_IDS[0]}.db"
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--force-sync", action="store_true", help="upload slash commands even if they haven't changed")
+    parser.add_argument("--dev-guild", type=int, default=os.getenv("DEV_GUILD_ID"), help="sync slash commands to this guild only")
+    args, _ = parser.parse_known_args()
+    return args
+
+def configure():
+    if SHARD_IDS and not (SHARD_COUNT or "").isdigit():
+        sys.exit(f"SHARD_IDS={os.getenv('SHARD_IDS')} needs SHARD_COUNT set to the total number of shards, not {SHARD_COUNT or 'unset'}.")
+    if SHARD_IDS and max(SHARD_IDS) >= int(SHARD_COUNT):
+        sys.exit(f"SHARD_IDS={os.getenv('SHARD_IDS')} goes past SHARD_COUNT={SHARD_COUNT}; shard ids start at 0.")
 
-# Debug
-print("Loaded Token:", DISCORD_TOKEN)
-print("Loaded Default Prefix:", DEFAULT_PREFIX)
+    # Debug
+    print("Loaded Token:", DISCORD_TOKEN)
+    print("Loaded Default Prefix:", DEFAULT_PREFIX)
+    print("Loaded Profile:", BOT_PROFILE)
+    if SHARDED:
+        print("Loaded Shards:", SHARD_IDS or "all", "of", SHARD_COUNT or "auto")
+
+    if DISCORD_API_BASE:
+        print("Using API:", DISCORD_API_BASE)
+        discord.http.Route.BASE = DISCORD_API_BASE.rstrip("/")
+    if DISCORD_GATEWAY_URL:
+        print("Using Gateway:", DISCORD_GATEWAY_URL)
+        discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(DISCORD_GATEWAY_URL)
 
 def get_server_prefix(client, message):
-    try:
-        with open("prefixes.json", "r") as f:
-            prefix = json.load(f)
-        return prefix.get(str(message.guild.id), DEFAULT_PREFIX)
-    except:
+    if message.guild is None:
         return DEFAULT_PREFIX
+    return client.prefixes.get(message.guild.id)
+
+def cog_files():
+    return [os.path.join(COGS_DIR, f) for f in sorted(os.listdir(COGS_DIR)) if f.endswith(".py")]
+
+def create_client(args) -> commands.Bot:
+    # every cog sends through this so moderation replies aren't stuck behind logs
+    scheduler = SendScheduler()
 
-client = commands.Bot(
-    command_prefix=get_server_prefix,
-    intents=discord.Intents.all()
-)
+    # intents, member cache and chunking follow the profile and what the cogs declare
+    options = bot_options(BOT_PROFILE, cog_files())
+    if SHARDED:
+        if SHARD_COUNT and SHARD_COUNT != "auto":
+            options["shard_count"] = int(SHARD_COUNT)
+        if SHARD_IDS:
+            options["shard_ids"] = SHARD_IDS
+        bot_class = commands.AutoShardedBot
+    else:
+        bot_class = commands.Bot
 
-@client.event
-async def on_ready():
-    await client.tree.sync()
-    print("Synced slash commands.")
-    print("Bot is connected to Discord...")
+    # times listeners and commands, tracks gateway latency and event loop lag
+    client = instrumented(bot_class)(
+        command_prefix=get_server_prefix,
+        http_trace=scheduler.trace_config(),
+        **options
+    )
+    client.scheduler = scheduler
+    if PROFILE_HANDLERS:
+        client.handler_profiler = HandlerProfiler(SLOW_HANDLER_MS / 1000)
+    first_ready = True
 
-async def load():
-    for filename in os.listdir("./cogs"):
-        if filename.endswith(".py"):
-            await client.load_extension(f"cogs.{filename[:-3]}")
-            print(f"{filename[:-3]} loaded...")
+    async def sync_tree(force: bool = False) -> Optional[bool]:
+        """Upload slash commands if they changed. None if another process does it."""
+        # commands are global, so with several shard processes only the one
+        # running shard 0 uploads them
+        if SHARD_IDS and 0 not in SHARD_IDS:
+            return None
+        return await TreeSyncer(TREE_STATE).sync(client, force=force, dev_guild_id=args.dev_guild)
+
+    async def after_reload():
+        # a reloaded cog may have added, removed or changed slash commands
+        if client.is_ready() and await sync_tree():
+            print("Synced slash commands after reload.")
+
+    client.reloader = CogReloader(client, COGS_DIR, on_change=after_reload)
+
+    @client.event
+    async def on_ready():
+        nonlocal first_ready
+        print("Bot is connected to Discord...")
+        # on_ready fires again after every reconnect; only sync and report once
+        if first_ready:
+            first_ready = False
+            synced = await sync_tree(force=args.force_sync)
+            if synced is None:
+                print("Slash commands are synced by the process running shard 0.")
+            elif synced:
+                print(f"Synced slash commands{f' to guild {args.dev_guild}' if args.dev_guild else ''}.")
+            else:
+                print("Slash commands unchanged, skipped sync.")
+            members = sum(len(g.members) for g in client.guilds)
+            print(
+                f"Profile {BOT_PROFILE}: ready in {time.perf_counter() - STARTED_AT:.1f}s, "
+                f"{memory_usage_mb():.0f} MiB RSS, {len(client.guilds)} guilds, {members} members cached"
+            )
+
+    return client
+
+async def load(client):
+    # extensions load concurrently; prints import/setup time per cog
+    await CogLoader(client).load([os.path.basename(f)[:-3] for f in cog_files()])
+
+async def open_store():
+    store = ConfigStore(CONFIG_DB)
+    # other shard processes write to the same database; poll for their
+    # commits more often so prefixes and settings agree across processes
+    await store.open(watch_interval=1.0 if SHARD_IDS else 5.0)
+    # one-time import of the JSON files the cogs used to read and write directly
+    await store.migrate_json("prefixes", os.path.join(BASE_DIR, "prefixes.json"), lambda prefix: {"prefix": prefix})
+    await store.migrate_json("welcome", os.path.join(BASE_DIR, "welcome.json"))
+    await store.migrate_json("logs", os.path.join(BASE_DIR, "logs.json"))
+    return store
+
+def start_metrics():
+    if not METRICS_PORT:
+        return None
+    server = MetricsServer(METRICS_HOST, METRICS_PORT)
+    try:
+        server.start()
+    except OSError as e:
+        print(f"Metrics endpoint disabled, could not listen on {METRICS_HOST}:{METRICS_PORT}: {e!r}")
+        return None
+    print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return server
 
 async def main():
-    async with client:
-        await load()
-        await client.start(DISCORD_TOKEN)
+    args = parse_args()
+    configure()
+    client = create_client(args)
+    metrics = start_metrics()
+    if client.handler_profiler:
+        client.handler_profiler.start()
+    client.store = await open_store()
+    client.prefixes = PrefixCache(client.store, DEFAULT_PREFIX)
+    client.archive = EventArchive(ARCHIVE_DIR, ARCHIVE_RETENTION_DAYS)
+    await client.archive.open()
+    client.cards = CardRenderer(CARD_CACHE_DIR)
+    client.outbox = Outbox(OUTBOX_DB, client)
+    await client.outbox.open()
+    try:
+        async with client:
+            await load(client)
+            if HOT_RELOAD:
+                client.reloader.start()
+            await client.start(DISCORD_TOKEN)
+    finally:
+        client.reloader.stop()
+        # the cogs are unloaded by now, so their last log batches are in the outbox
+        await client.outbox.close()
+        await client.cards.close()
+        await client.archive.close()
+        await client.store.close()
+        if metrics:
+            metrics.stop()
+        if client.handler_profiler:
+            client.handler_profiler.stop()
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+import io
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.loader import lazy_import
+
+# only loaded in the worker process that builds reports
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+HOUR = 3600
+JOINS, LEAVES, DELETES, EDITS, CHURNED = range(5)
+COLUMNS = ("joins", "leaves", "deletes", "edits", "churned")
+PLOTTED = ("joins", "leaves", "deletes", "edits")
+
+# window name -> (hours covered, hours per chart bucket)
+WINDOWS = {"24h": (24, 1), "7d": (7 * 24, 6), "30d": (30 * 24, 24)}
+# chart lines are the mean rate over this many buckets
+ROLLING_BUCKETS = 3
+
+
+def current_hour(now: Optional[float] = None) -> int:
+    return int((now or time.time()) // HOUR)
+
+
+class ActivityCounters:
+    """Per-guild hourly counts of joins, leaves, deletes and edits.
+
+    Recording is a dict lookup and an increment. `churned` is counted at
+    the hour the member *joined*, which makes retention over a window a
+    plain sum.
+    """
+
+    def __init__(self, keep_hours: int = max(hours for hours, _ in WINDOWS.values()) + 24):
+        self.keep_hours = keep_hours
+        self._hours: Dict[int, Dict[int, List[int]]] = {}
+
+    def record(self, guild_id: int, column: int, count: int = 1, hour: Optional[int] = None):
+        hours = self._hours.get(guild_id)
+        if hours is None:
+            hours = self._hours[guild_id] = {}
+        hour = current_hour() if hour is None else hour
+        row = hours.get(hour)
+        if row is None:
+            row = hours[hour] = [0] * len(COLUMNS)
+        row[column] += count
+
+    def record_leave(self, guild_id: int, joined_at: Optional[float]):
+        self.record(guild_id, LEAVES)
+        if joined_at is not None:
+            joined = current_hour(joined_at)
+            if joined > current_hour() - self.keep_hours:
+                self.record(guild_id, CHURNED, hour=joined)
+
+    def rows(self, guild_id: int, since_hour: int, until_hour: int) -> List[Tuple[int, ...]]:
+        """(hour, joins, leaves, deletes, edits, churned) for every hour with activity in [since_hour, until_hour]."""
+        return [(hour, *row) for hour, row in self._hours.get(guild_id, {}).items() if since_hour <= hour <= until_hour]
+
+    def prune(self):
+        cutoff = current_hour() - self.keep_hours
+        for guild_id in list(self._hours):
+            hours = self._hours[guild_id]
+            for hour in [h for h in hours if h < cutoff]:
+                del hours[hour]
+            if not hours:
+                del self._hours[guild_id]
+
+
+# --------- run in a worker process ---------
+def build_report(rows: Sequence[Tuple[int, ...]], window: str, now_hour: int, title: str) -> Tuple[dict, bytes]:
+    """Summary numbers and a PNG chart for one guild and window.
+
+    Heavy on pandas and matplotlib, so it is meant for a process pool:
+    everything it needs comes in as plain tuples and goes out as a dict
+    and bytes.
+    """
+    hours, bucket = WINDOWS[window]
+    first = now_hour - hours + 1
+    frame = pd.DataFrame(list(rows), columns=("hour",) + COLUMNS).set_index("hour")
+    frame = frame.reindex(np.arange(first, now_hour + 1), fill_value=0)
+
+    totals = frame.sum()
+    joins = int(totals["joins"])
+    summary = {
+        "window": window,
+        "totals": {name: int(totals[name]) for name in PLOTTED},
+        "per_hour": {name: float(totals[name]) / hours for name in PLOTTED},
+        "peak_hour": {name: int(frame[name].max()) for name in PLOTTED},
+        "net_members": joins - int(totals["leaves"]),
+        # members who joined in the window and are still here
+        "retention": 1.0 - min(int(totals["churned"]), joins) / joins if joins else None,
+    }
+
+    buckets = frame.groupby((frame.index.to_numpy() - first) // bucket).sum()
+    buckets.index = pd.to_datetime((first + buckets.index.to_numpy() * bucket) * HOUR, unit="s", utc=True)
+    rates = (buckets[list(PLOTTED)] / bucket).rolling(ROLLING_BUCKETS, min_periods=1).mean()
+    return summary, _render_chart(rates, title, window)
+
+
+def _render_chart(rates, title: str, window: str) -> bytes:
+    # the object API needs no pyplot state and no GUI backend
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 4), dpi=100)
+    ax = figure.add_subplot()
+    for name in PLOTTED:
+        ax.plot(rates.index, rates[name].to_numpy(), label=name, linewidth=1.8)
+    ax.set_title(f"{title}: activity over the last {window}")
+    ax.set_ylabel("events per hour")
+    ax.grid(True, alpha=0.3)
+    ax.legend(loc="upper left")
+    figure.autofmt_xdate()
+    figure.tight_layout()
+    out = io.BytesIO()
+    figure.savefig(out, format="png")
+    return out.getvalue()
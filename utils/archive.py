@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+import sqlite3
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+ARCHIVE_SECONDS = REGISTRY.histogram(
+    "bot_archive_seconds", "Event archive operation time, including the wait for the worker thread.", ["op"]
+)
+ARCHIVED = REGISTRY.counter("bot_archived_events_total", "Events written to the local archive.")
+
+# every block on disk is a big-endian length followed by that many bytes of zlib data
+_BLOCK_HEADER = struct.Struct(">I")
+# counting every match of a broad query would cost more than finding the page
+COUNT_LIMIT = 1000
+
+
+class EventArchive:
+    """Append-only, compressed log of events, indexed in SQLite.
+
+    Events are buffered and written as blocks: a batch of JSON lines,
+    zlib-compressed, appended to the current segment file. A segment is
+    closed once it grows past `segment_bytes` or gets older than
+    `segment_seconds`, and whole segments are deleted once everything in
+    them is older than `retention_days` (0 keeps them forever).
+
+    The index holds one row per event (guild, time, kind, user, channel)
+    pointing at its block, so a search reads only the blocks that have a
+    match, never whole segments. Segment files are never rewritten.
+    """
+
+    def __init__(self, directory: str, retention_days: float = 30, segment_bytes: int = 8 * 1024 * 1024,
+                 segment_seconds: float = 86400, block_events: int = 500, flush_interval: float = 2.0):
+        self.directory = directory
+        self.retention = retention_days * 86400
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.block_events = block_events
+        self.flush_interval = flush_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-archive")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[float, int, str, Optional[int], Optional[int], dict]] = []
+        self._wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        # (segment id, file, size, created at) of the segment being appended to
+        self._segment: Optional[Tuple[int, object, int, float]] = None
+        self._pruned_at = 0.0
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            ARCHIVE_SECONDS.observe(time.perf_counter() - start, op=func.__name__.lstrip("_"))
+
+    # --------- lifecycle ---------
+    async def open(self):
+        await self._run(self._open)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.directory, "index.db"), isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " id INTEGER PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " first_ts REAL,"
+            " last_ts REAL,"
+            " bytes INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            " id INTEGER PRIMARY KEY,"
+            " segment INTEGER NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " length INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " guild_id INTEGER NOT NULL,"
+            " ts REAL NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " user_id INTEGER,"
+            " channel_id INTEGER,"
+            " block INTEGER NOT NULL,"
+            " position INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS events_by_time ON events (guild_id, ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS events_by_user ON events (guild_id, user_id, ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS events_by_channel ON events (guild_id, channel_id, ts)")
+        conn.execute("CREATE INDEX IF NOT EXISTS events_by_block ON events (block)")
+        conn.execute("CREATE INDEX IF NOT EXISTS blocks_by_segment ON blocks (segment)")
+        self._conn = conn
+
+    def _close(self):
+        if self._segment:
+            self._segment[1].close()
+            self._segment = None
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    # --------- writes ---------
+    def append(self, kind: str, guild_id: int, user_id: Optional[int] = None, channel_id: Optional[int] = None,
+               data: Optional[dict] = None, ts: Optional[float] = None):
+        """Queue an event; it is written with the next block. Never blocks."""
+        self._pending.append((ts or time.time(), guild_id, kind, user_id, channel_id, data or {}))
+        if len(self._pending) >= self.block_events:
+            self._wakeup.set()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await self._run(self._write, batch)
+        except Exception as e:
+            print(f"Failed to archive {len(batch)} event(s): {e!r}")
+            return
+        ARCHIVED.inc(len(batch))
+
+    async def _flush_loop(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            if self.retention and time.monotonic() - self._pruned_at > 3600:
+                self._pruned_at = time.monotonic()
+                try:
+                    removed = await self.prune()
+                except Exception as e:
+                    print(f"Archive retention pass failed: {e!r}")
+                else:
+                    if removed:
+                        print(f"Archive: removed {removed} expired segment(s)")
+
+    def _current_segment(self, now: float) -> Tuple[int, object, int, float]:
+        segment = self._segment
+        if segment is not None:
+            _, f, size, created = segment
+            if size < self.segment_bytes and now - created < self.segment_seconds:
+                return segment
+            f.close()
+        name = f"segment-{int(now * 1000)}.z"
+        segment_id = self._conn.execute("INSERT INTO segments (name) VALUES (?)", (name,)).lastrowid
+        f = open(os.path.join(self.directory, name), "ab")
+        self._segment = (segment_id, f, 0, now)
+        return self._segment
+
+    def _write(self, batch):
+        # blocks stay small so a search hit only decompresses a few KiB
+        for start in range(0, len(batch), self.block_events):
+            self._write_block(batch[start:start + self.block_events])
+
+    def _write_block(self, batch):
+        now = time.time()
+        segment_id, f, size, created = self._current_segment(now)
+        lines = [
+            json.dumps({"ts": ts, "guild": guild_id, "kind": kind, "user": user_id, "channel": channel_id, **data},
+                       separators=(",", ":"))
+            for ts, guild_id, kind, user_id, channel_id, data in batch
+        ]
+        block = zlib.compress("\n".join(lines).encode(), 6)
+        # the block goes to disk before it is indexed; a crash in between
+        # leaves unreferenced bytes, never an index row pointing at nothing
+        f.write(_BLOCK_HEADER.pack(len(block)) + block)
+        f.flush()
+        offset = size + _BLOCK_HEADER.size
+        size += _BLOCK_HEADER.size + len(block)
+        self._segment = (segment_id, f, size, created)
+
+        conn = self._conn
+        with conn:
+            block_id = conn.execute(
+                "INSERT INTO blocks (segment, offset, length) VALUES (?, ?, ?)", (segment_id, offset, len(block))
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO events (guild_id, ts, kind, user_id, channel_id, block, position) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(guild_id, ts, kind, user_id, channel_id, block_id, position)
+                 for position, (ts, guild_id, kind, user_id, channel_id, _) in enumerate(batch)],
+            )
+            conn.execute(
+                "UPDATE segments SET first_ts = COALESCE(first_ts, ?), last_ts = ?, bytes = ? WHERE id = ?",
+                (min(event[0] for event in batch), max(event[0] for event in batch), size, segment_id),
+            )
+
+    # --------- retention ---------
+    async def prune(self) -> int:
+        """Delete segments whose newest event is past the retention period."""
+        if not self.retention:
+            return 0
+        return await self._run(self._prune, time.time() - self.retention)
+
+    def _prune(self, cutoff: float) -> int:
+        conn = self._conn
+        current = self._segment[0] if self._segment else None
+        expired = conn.execute(
+            "SELECT id, name FROM segments WHERE last_ts < ? AND id IS NOT ?", (cutoff, current)
+        ).fetchall()
+        for segment_id, name in expired:
+            with conn:
+                conn.execute("DELETE FROM events WHERE block IN (SELECT id FROM blocks WHERE segment = ?)", (segment_id,))
+                conn.execute("DELETE FROM blocks WHERE segment = ?", (segment_id,))
+                conn.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        return len(expired)
+
+    # --------- search ---------
+    async def search(self, guild_id: int, kind: Optional[str] = None, user_id: Optional[int] = None,
+                     channel_id: Optional[int] = None, since: Optional[float] = None, until: Optional[float] = None,
+                     limit: int = 25) -> Tuple[List[dict], int]:
+        """Newest first. Returns up to `limit` events and the number of matches (at most COUNT_LIMIT)."""
+        await self.flush()
+        return await self._run(self._search, guild_id, kind, user_id, channel_id, since, until, limit)
+
+    def _search(self, guild_id, kind, user_id, channel_id, since, until, limit) -> Tuple[List[dict], int]:
+        where = ["guild_id = ?"]
+        params: list = [guild_id]
+        for column, value in (("kind", kind), ("user_id", user_id), ("channel_id", channel_id)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            params.append(until)
+        clause = " AND ".join(where)
+
+        conn = self._conn
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM events WHERE {clause} LIMIT ?)", params + [COUNT_LIMIT]
+        ).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT events.block, events.position, blocks.offset, blocks.length, segments.name"
+            f" FROM events JOIN blocks ON blocks.id = events.block JOIN segments ON segments.id = blocks.segment"
+            f" WHERE {clause} ORDER BY ts DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+
+        # each matching block is read and decompressed once, however many hits it has
+        blocks: Dict[int, List[str]] = {}
+        files: Dict[str, object] = {}
+        results = []
+        try:
+            for block_id, position, offset, length, name in rows:
+                lines = blocks.get(block_id)
+                if lines is None:
+                    f = files.get(name)
+                    if f is None:
+                        f = files[name] = open(os.path.join(self.directory, name), "rb")
+                    f.seek(offset)
+                    lines = blocks[block_id] = zlib.decompress(f.read(length)).decode().split("\n")
+                results.append(json.loads(lines[position]))
+        finally:
+            for f in files.values():
+                f.close()
+        return results, total
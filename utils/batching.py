@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Tuple
+
+import discord
+
+# Discord's limits for a single message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+
+class _ChannelQueue:
+    __slots__ = ("channel", "delay", "pending", "wakeup", "task")
+
+    def __init__(self, channel, delay: float):
+        self.channel = channel
+        self.delay = delay
+        self.pending: Deque[Tuple[discord.Embed, float]] = deque()
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+
+class EmbedBatcher:
+    """Coalesces embeds bound for the same channel into multi-embed messages.
+
+    Each channel gets its own FIFO queue and a single flush task, so embeds
+    are delivered in the order they were submitted. A batch is sent as soon
+    as it holds 10 embeds (or would exceed Discord's 6000 character total),
+    or once the oldest queued embed has waited `delay` seconds, whichever
+    comes first. `delay` is the max time an embed sits in the queue before
+    its message is sent.
+    """
+
+    def __init__(self, send: Callable[[object, List[discord.Embed]], Awaitable[None]]):
+        self._send = send
+        self._queues: Dict[int, _ChannelQueue] = {}
+        self._closing = False
+
+    def submit(self, channel, embed: discord.Embed, delay: float):
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = _ChannelQueue(channel, delay)
+        queue.channel = channel
+        queue.delay = delay
+        queue.pending.append((embed, time.monotonic()))
+        if len(queue.pending) >= MAX_EMBEDS:
+            queue.wakeup.set()
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._drain(queue))
+
+    def pending(self) -> int:
+        return sum(len(q.pending) for q in self._queues.values())
+
+    async def close(self):
+        """Flush everything that is still queued, then stop."""
+        self._closing = True
+        for queue in self._queues.values():
+            queue.wakeup.set()
+        tasks = [q.task for q in self._queues.values() if q.task]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _take_batch(self, queue: _ChannelQueue) -> List[discord.Embed]:
+        batch: List[discord.Embed] = []
+        chars = 0
+        while queue.pending and len(batch) < MAX_EMBEDS:
+            embed = queue.pending[0][0]
+            size = len(embed)
+            if batch and chars + size > MAX_EMBED_CHARS:
+                break
+            queue.pending.popleft()
+            batch.append(embed)
+            chars += size
+        return batch
+
+    async def _drain(self, queue: _ChannelQueue):
+        try:
+            while queue.pending:
+                if len(queue.pending) < MAX_EMBEDS and not self._closing:
+                    oldest = queue.pending[0][1]
+                    timeout = oldest + queue.delay - time.monotonic()
+                    if timeout > 0:
+                        queue.wakeup.clear()
+                        try:
+                            await asyncio.wait_for(queue.wakeup.wait(), timeout)
+                        except asyncio.TimeoutError:
+                            pass
+
+                batch = self._take_batch(queue)
+                try:
+                    await self._send(queue.channel, batch)
+                except Exception as e:
+                    print(f"Failed to deliver {len(batch)} log embed(s) to {queue.channel.id}: {e!r}")
+        finally:
+            queue.task = None
+            if not queue.pending:
+                self._queues.pop(queue.channel.id, None)
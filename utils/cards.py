@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import io
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from utils.http_cache import HttpCache
+from utils.metrics import REGISTRY
+from utils.workers import process_pool
+
+CARDS = REGISTRY.counter("bot_welcome_cards_total", "Welcome cards by where they came from.", ["source"])
+
+# bump when render_card draws differently, so old cached cards aren't reused
+LAYOUT_VERSION = 1
+CARD_SIZE = (1024, 360)
+AVATAR_SIZE = 220
+
+
+def card_key(background: Optional[str], avatar_key: str, title: str, subtitle: str) -> str:
+    """Content address of a card: everything that changes its pixels."""
+    parts = (str(LAYOUT_VERSION), background or "", avatar_key, title, subtitle)
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class CardCache:
+    """Rendered cards by content address: an in-memory LRU in front of a disk directory.
+
+    Disk reads and writes go through the caller's executor; the directory
+    is trimmed to `max_disk_bytes`, least recently used files first.
+    """
+
+    def __init__(self, directory: str, max_memory: int = 128, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory = max_memory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".png")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            CARDS.inc(source="memory")
+            return data
+        data = await asyncio.to_thread(self._read, key)
+        if data is not None:
+            self._remember(key, data)
+            CARDS.inc(source="disk")
+        return data
+
+    async def put(self, key: str, data: bytes):
+        self._remember(key, data)
+        await asyncio.to_thread(self._write, key, data)
+
+    def _remember(self, key: str, data: bytes):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mtime is the LRU clock for trimming
+        return data
+
+    def _write(self, key: str, data: bytes):
+        # write-then-rename so a reader never sees half a file
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._trim()
+
+    def _trim(self):
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".png"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class CardRenderer:
+    """Welcome cards: cache lookup, image fetches and rendering in a worker process.
+
+    A card that was rendered before (same background, avatar and text) is
+    served from the cache without fetching or drawing anything, so re-joins
+    and previews are cheap. Concurrent requests for the same card share
+    one render.
+    """
+
+    def __init__(self, directory: str):
+        self.cache = CardCache(directory)
+        self.http = HttpCache()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def close(self):
+        await self.http.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def card(self, background: Optional[str], avatar_key: str, avatar_url: str, title: str, subtitle: str) -> bytes:
+        key = card_key(background, avatar_key, title, subtitle)
+        data = await self.cache.get(key)
+        if data is not None:
+            return data
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._render(key, background, avatar_url, title, subtitle))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _render(self, key: str, background: Optional[str], avatar_url: str, title: str, subtitle: str) -> bytes:
+        fetches = [self.http.get(avatar_url)]
+        if background:
+            fetches.append(self.http.get(background))
+        images = await asyncio.gather(*fetches)
+
+        if self._pool is None:
+            self._pool = process_pool()
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(
+            self._pool, render_card, images[1] if background else None, images[0], title, subtitle
+        )
+        CARDS.inc(source="rendered")
+        await self.cache.put(key, data)
+        return data
+
+
+# --------- run in a worker process ---------
+def render_card(background: Optional[bytes], avatar: bytes, title: str, subtitle: str) -> bytes:
+    """Draw the card: background (cover-fitted and dimmed), round avatar, two lines of text."""
+    from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+    width, height = CARD_SIZE
+    if background:
+        card = ImageOps.fit(Image.open(io.BytesIO(background)).convert("RGB"), CARD_SIZE)
+        card = Image.blend(card, Image.new("RGB", CARD_SIZE, (0, 0, 0)), 0.45)
+    else:
+        # vertical blurple gradient
+        top, bottom = (88, 101, 242), (35, 39, 42)
+        card = Image.linear_gradient("L").resize(CARD_SIZE)
+        card = ImageOps.colorize(card, top, bottom)
+
+    avatar_image = ImageOps.fit(Image.open(io.BytesIO(avatar)).convert("RGBA"), (AVATAR_SIZE, AVATAR_SIZE))
+    mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, AVATAR_SIZE - 1, AVATAR_SIZE - 1), fill=255)
+    left = 60
+    top = (height - AVATAR_SIZE) // 2
+    draw = ImageDraw.Draw(card)
+    draw.ellipse((left - 6, top - 6, left + AVATAR_SIZE + 5, top + AVATAR_SIZE + 5), fill=(255, 255, 255))
+    card.paste(avatar_image, (left, top), mask)
+
+    text_left = left + AVATAR_SIZE + 50
+    max_width = width - text_left - 40
+    title_font = _fit_font(ImageFont, draw, title, 56, max_width)
+    subtitle_font = _fit_font(ImageFont, draw, subtitle, 34, max_width)
+    draw.text((text_left, height // 2 - 12), title, font=title_font, fill=(255, 255, 255), anchor="ls")
+    draw.text((text_left, height // 2 + 40), subtitle, font=subtitle_font, fill=(220, 221, 222), anchor="ls")
+
+    out = io.BytesIO()
+    card.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _fit_font(ImageFont, draw, text: str, size: int, max_width: int):
+    # shrink until the line fits; the default font is scalable since Pillow 10.1
+    while size > 16:
+        font = ImageFont.load_default(size=size)
+        if draw.textlength(text, font=font) <= max_width:
+            return font
+        size -= 4
+    return ImageFont.load_default(size=size)
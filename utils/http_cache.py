@@ -0,0 +1,206 @@
+import asyncio
+import ipaddress
+import socket
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+from aiohttp.abc import AbstractResolver, ResolveResult
+from aiohttp.resolver import DefaultResolver
+
+from utils.metrics import REGISTRY
+
+HTTP_CACHE = REGISTRY.counter("bot_http_cache_total", "Image fetches by cache outcome.", ["result"])
+
+
+class FetchError(Exception):
+    """The URL could not be fetched, wasn't an allowed size, or returned an error."""
+
+
+class UnsafeURL(FetchError):
+    """The URL isn't https or points at a loopback, private or otherwise non-public address."""
+
+
+MAX_REDIRECTS = 3
+
+
+def _public_ip(address: str) -> bool:
+    # IPv4-mapped IPv6 addresses count as non-global, so they are refused too
+    return ipaddress.ip_address(address.split("%", 1)[0]).is_global
+
+
+def check_url(url: str) -> str:
+    """Reject URLs the bot host must not fetch on a guild's behalf. Returns the host.
+
+    Only https is allowed, and a host given as an IP address must be public.
+    Host names are checked when they are resolved (see `PublicResolver`),
+    so every redirect hop and every DNS answer is covered, not just the
+    URL as it was saved.
+    """
+    try:
+        parts = urlsplit(url)
+        parts.port
+    except ValueError:
+        raise UnsafeURL(f"{url!r} is not a valid URL")
+    if parts.scheme != "https" or not parts.hostname:
+        raise UnsafeURL(f"{url!r} is not an https URL")
+    host = parts.hostname
+    try:
+        public = _public_ip(host)
+    except ValueError:
+        if host == "localhost" or host.endswith(".localhost"):
+            raise UnsafeURL(f"{host} is not a public host")
+        return host
+    if not public:
+        raise UnsafeURL(f"{host} is not a public address")
+    return host
+
+
+class PublicResolver(AbstractResolver):
+    """Resolves like aiohttp's default resolver, but refuses non-public answers.
+
+    Checking the addresses the connection will actually use (instead of
+    resolving once up front) keeps a short-TTL DNS record from passing the
+    check and then rebinding to an internal address.
+    """
+
+    def __init__(self):
+        self._resolver = DefaultResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> List[ResolveResult]:
+        results = await self._resolver.resolve(host, port, family)
+        for result in results:
+            if not _public_ip(result["host"]):
+                raise UnsafeURL(f"{host} resolves to non-public address {result['host']}")
+        return results
+
+    async def close(self):
+        await self._resolver.close()
+
+
+async def check_host(url: str):
+    """`check_url`, plus a lookup of the host name so a private address is refused when it is saved."""
+    host = check_url(url)
+    try:
+        ipaddress.ip_address(host)
+        return
+    except ValueError:
+        pass
+    resolver = PublicResolver()
+    try:
+        await resolver.resolve(host, 443, socket.AF_UNSPEC)
+    except OSError as e:
+        raise FetchError(f"could not resolve {host}: {e!r}") from e
+    finally:
+        await resolver.close()
+
+
+class HttpCache:
+    """Small GET cache for images (avatars, card backgrounds).
+
+    Requests share one pooled session. Bodies are kept in an LRU bounded by
+    total bytes and expire after `ttl` seconds; anything larger than
+    `max_item_bytes` is refused while it streams in, not after. Concurrent
+    requests for the same URL share one fetch.
+
+    Only public https URLs are fetched: every redirect hop goes through
+    `check_url` and every connection through `PublicResolver`.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_item_bytes: int = 8 * 1024 * 1024,
+                 ttl: float = 3600, connections: int = 8, timeout: float = 10.0):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.ttl = ttl
+        self._connections = connections
+        self._timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.bytes = 0
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get(self, url: str) -> bytes:
+        entry = self._entries.get(url)
+        if entry is not None:
+            data, fetched_at = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                self._entries.move_to_end(url)
+                HTTP_CACHE.inc(result="hit")
+                return data
+            self._drop(url)
+
+        pending = self._inflight.get(url)
+        if pending is not None:
+            HTTP_CACHE.inc(result="shared")
+            return await asyncio.shield(pending)
+
+        future = self._inflight[url] = asyncio.get_running_loop().create_future()
+        try:
+            data = await self._fetch(url)
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else FetchError("fetch cancelled"))
+            # nobody else may be waiting; don't leave the exception unretrieved
+            future.exception()
+            HTTP_CACHE.inc(result="error")
+            raise
+        finally:
+            del self._inflight[url]
+        future.set_result(data)
+        HTTP_CACHE.inc(result="miss")
+        self._store(url, data)
+        return data
+
+    async def _fetch(self, url: str) -> bytes:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._connections, ttl_dns_cache=300,
+                                               resolver=PublicResolver()),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                check_url(url)
+                # redirects are followed by hand so each hop is checked
+                async with self._session.get(url, allow_redirects=False) as response:
+                    if response.status in (301, 302, 303, 307, 308) and "Location" in response.headers:
+                        url = urljoin(url, response.headers["Location"])
+                        continue
+                    return await self._read(url, response)
+            raise FetchError(f"{url}: too many redirects")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise FetchError(f"could not fetch {url}: {e!r}") from e
+
+    async def _read(self, url: str, response: aiohttp.ClientResponse) -> bytes:
+        if response.status != 200:
+            raise FetchError(f"{url} returned HTTP {response.status}")
+        if response.content_length and response.content_length > self.max_item_bytes:
+            raise FetchError(f"{url} is larger than {self.max_item_bytes} bytes")
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            if size > self.max_item_bytes:
+                raise FetchError(f"{url} is larger than {self.max_item_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _store(self, url: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        if url in self._entries:
+            self._drop(url)
+        self._entries[url] = (data, time.monotonic())
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, url: str):
+        data, _ = self._entries.pop(url)
+        self.bytes -= len(data)
@@ -0,0 +1,112 @@
+import asyncio
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import sys
+import time
+from typing import Dict, List, Optional
+
+from discord.ext import commands
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Wraps a module loader and records how long executing the module took."""
+
+    def __init__(self, loader, timings: Dict[str, float]):
+        self._loader = loader
+        self._timings = timings
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timings[module.__name__] = time.perf_counter() - start
+
+    def __getattr__(self, name):
+        # get_source, get_filename, ... for tracebacks and inspect
+        return getattr(self._loader, name)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def __init__(self, package: str, timings: Dict[str, float]):
+        self._prefix = package + "."
+        self._timings = timings
+
+    def find_spec(self, fullname, path, target=None):
+        if not fullname.startswith(self._prefix):
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path, target)
+        if spec is not None and spec.loader is not None:
+            spec.loader = _TimedLoader(spec.loader, self._timings)
+        return spec
+
+
+class CogLoader:
+    """Loads extensions from a package concurrently and times each one.
+
+    Import time is measured around the module's execution, setup time is
+    the rest of `load_extension` (the extension's `setup`, `add_cog`,
+    `cog_load`). Extensions whose setup awaits I/O overlap each other.
+    """
+
+    def __init__(self, client: commands.Bot, package: str = "cogs"):
+        self.client = client
+        self.package = package
+        self.import_times: Dict[str, float] = {}
+        self.load_times: Dict[str, float] = {}
+
+    async def _load_one(self, name: str):
+        start = time.perf_counter()
+        try:
+            await self.client.load_extension(name)
+        finally:
+            self.load_times[name] = time.perf_counter() - start
+
+    async def load(self, modules: List[str]):
+        names = [f"{self.package}.{m}" for m in modules]
+        # only installed while loading; later (re)imports of cogs aren't timed
+        finder = _TimingFinder(self.package, self.import_times)
+        sys.meta_path.insert(0, finder)
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(self._load_one(n) for n in names), return_exceptions=True)
+            wall = time.perf_counter() - start
+        finally:
+            sys.meta_path.remove(finder)
+
+        failed: Optional[BaseException] = None
+        for name, result in zip(names, results):
+            total = self.load_times.get(name, 0.0)
+            imported = self.import_times.get(name, 0.0)
+            status = "loaded" if result is None else f"FAILED: {result!r}"
+            print(f"{name[len(self.package) + 1:]:<12} import {imported * 1000:7.1f} ms  setup {(total - imported) * 1000:7.1f} ms  {status}")
+            if result is not None and failed is None:
+                failed = result
+        print(f"{len(names)} extensions in {wall * 1000:.1f} ms")
+        if failed is not None:
+            raise failed
+
+
+def lazy_import(name: str):
+    """Import `name` now, but only execute it on first attribute access.
+
+    For heavy optional dependencies (pandas, matplotlib, PIL): a cog can
+    bind them at module level and still load instantly, paying the import
+    cost the first time a command actually uses them.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
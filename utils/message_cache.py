@@ -0,0 +1,127 @@
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+CACHE_LOOKUPS = REGISTRY.counter("bot_message_cache_lookups_total", "Message cache lookups for deletes and edits.", ["result"])
+CACHE_SIZE = REGISTRY.gauge("bot_message_cache_size", "Messages and approximate bytes held in the message cache.", ["unit"])
+
+# rough per-entry cost of the object, its slots and the dict slot, on top of the strings
+ENTRY_OVERHEAD = 240
+
+
+class CachedMessage:
+    """What the logs need to know about a message after it is gone."""
+
+    __slots__ = ("id", "guild_id", "channel_id", "author_id", "author", "content", "attachments", "touched", "size")
+
+    def __init__(self, message_id: int, guild_id: int, channel_id: int, author_id: int, author: str,
+                 content: str, attachments: Tuple[str, ...]):
+        self.id = message_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.author = author
+        self.content = content
+        self.attachments = attachments
+        self.touched = 0.0
+        self.size = 0
+
+    @classmethod
+    def from_message(cls, message) -> "CachedMessage":
+        return cls(
+            message.id, message.guild.id, message.channel.id, message.author.id, str(message.author),
+            message.content or "", tuple(a.url for a in message.attachments),
+        )
+
+    def _measure(self) -> int:
+        return ENTRY_OVERHEAD + len(self.author) + len(self.content) + sum(len(url) for url in self.attachments)
+
+
+class MessageCache:
+    """Bounded id -> CachedMessage map for logging deletes and edits.
+
+    discord.py's own cache keeps whole Message objects and only a fixed
+    number of them; this keeps a few strings per message and is bounded by
+    entry count, approximate bytes and age. Entries are kept in LRU order
+    (an edit counts as a use), so the least recently seen message is
+    evicted first and expired ones are always at the front.
+    """
+
+    def __init__(self, max_entries: int = 50_000, max_bytes: int = 32 * 1024 * 1024, ttl: float = 6 * 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, CachedMessage]" = OrderedDict()
+        self.bytes = 0
+        CACHE_SIZE.set_function(lambda: {("messages",): len(self._entries), ("bytes",): self.bytes})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, message) -> CachedMessage:
+        entry = CachedMessage.from_message(message)
+        self._put(entry)
+        return entry
+
+    def get(self, message_id: int) -> Optional[CachedMessage]:
+        entry = self._entries.get(message_id)
+        if entry is not None and entry.touched + self.ttl < time.monotonic():
+            self._remove(message_id)
+            entry = None
+        CACHE_LOOKUPS.inc(result="miss" if entry is None else "hit")
+        return entry
+
+    def pop(self, message_id: int) -> Optional[CachedMessage]:
+        entry = self.get(message_id)
+        if entry is not None:
+            self._remove(message_id)
+        return entry
+
+    def pop_many(self, message_ids: Iterable[int]) -> List[CachedMessage]:
+        """Remove and return the cached ones among `message_ids`, oldest message first."""
+        found = [entry for entry in map(self.pop, message_ids) if entry is not None]
+        found.sort(key=lambda entry: entry.id)
+        return found
+
+    def update(self, entry: CachedMessage, content: str):
+        """Record an edit: new content, and the message counts as recently used.
+
+        `entry` doesn't have to be cached yet (e.g. built from discord.py's cache).
+        """
+        entry.content = content
+        self._put(entry)
+
+    def forget_guild(self, guild_id: int):
+        for message_id in [m for m, entry in self._entries.items() if entry.guild_id == guild_id]:
+            self._remove(message_id)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def _put(self, entry: CachedMessage):
+        now = time.monotonic()
+        if entry.id in self._entries:
+            self._remove(entry.id)
+        entry.touched = now
+        entry.size = entry._measure()
+        self._entries[entry.id] = entry
+        self.bytes += entry.size
+        self._evict(now)
+
+    def _remove(self, message_id: int):
+        entry = self._entries.pop(message_id)
+        self.bytes -= entry.size
+
+    def _evict(self, now: float):
+        entries = self._entries
+        while entries and (len(entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._remove(next(iter(entries)))
+        expired = now - self.ttl
+        while entries:
+            oldest = next(iter(entries.values()))
+            if oldest.touched >= expired:
+                break
+            self._remove(oldest.id)
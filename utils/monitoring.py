@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional, Type
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from utils.metrics import CONTENT_TYPE, REGISTRY, render
+from utils.profiling import HandlerProfiler
+from utils.shards import shard_latencies
+
+LISTENER_SECONDS = REGISTRY.histogram("bot_listener_seconds", "Time spent in an event listener.", ["listener"])
+LISTENER_CALLS = REGISTRY.counter("bot_listener_calls_total", "Event listener invocations.", ["listener", "outcome"])
+COMMAND_SECONDS = REGISTRY.histogram("bot_command_seconds", "Time spent running a command.", ["command", "kind"])
+COMMAND_CALLS = REGISTRY.counter("bot_command_calls_total", "Command invocations.", ["command", "kind", "outcome"])
+GATEWAY_LATENCY = REGISTRY.gauge("bot_gateway_latency_seconds", "Gateway heartbeat latency.", ["shard"])
+LOOP_LAG = REGISTRY.histogram("bot_event_loop_lag_seconds", "How late the event loop woke a sleeping task.")
+
+# how often the event loop lag is sampled
+LOOP_LAG_INTERVAL = 0.5
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    """Command tree that times every slash command and autocomplete."""
+
+    async def _call(self, interaction: discord.Interaction):
+        start = time.perf_counter()
+        try:
+            await _profiled(self.client, "/", interaction, super()._call(interaction))
+        finally:
+            command = interaction.command
+            name = command.qualified_name if command else "unknown"
+            kind = "autocomplete" if interaction.type is discord.InteractionType.autocomplete else "slash"
+            COMMAND_SECONDS.observe(time.perf_counter() - start, command=name, kind=kind)
+            COMMAND_CALLS.inc(command=name, kind=kind, outcome="error" if interaction.command_failed else "ok")
+
+
+def _profiled(client, prefix: str, source, coro):
+    """`coro`, wrapped by the bot's handler profiler if profiling is on."""
+    profiler: Optional[HandlerProfiler] = getattr(client, "handler_profiler", None)
+    if profiler is None:
+        return coro
+    command = source.command
+    return profiler.wrap(prefix + (command.qualified_name if command else "unknown"), coro)
+
+
+class InstrumentedBot:
+    """Bot mixin that records listener, command, gateway and event loop metrics.
+
+    Listeners are timed where discord.py runs them, so every cog listener
+    shows up as e.g. "Welcome.on_member_join" without the cogs doing anything.
+    Setting `handler_profiler` also measures how long each handler blocks
+    the event loop (see utils/profiling.py).
+    """
+
+    handler_profiler: Optional[HandlerProfiler] = None
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("tree_cls", InstrumentedTree)
+        super().__init__(*args, **kwargs)
+        self._loop_lag_task: Optional[asyncio.Task] = None
+        GATEWAY_LATENCY.set_function(
+            lambda: {(str(shard_id),): latency for shard_id, latency in shard_latencies(self) if latency is not None}
+        )
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        name = getattr(coro, "__qualname__", event_name)
+
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "cancelled"
+            try:
+                if self.handler_profiler is None:
+                    await coro(*args, **kwargs)
+                else:
+                    await self.handler_profiler.wrap(name, coro(*args, **kwargs))
+                outcome = "ok"
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                LISTENER_SECONDS.observe(time.perf_counter() - start, listener=name)
+                LISTENER_CALLS.inc(listener=name, outcome=outcome)
+
+        await super()._run_event(timed, event_name, *args, **kwargs)
+
+    async def invoke(self, ctx: commands.Context):
+        if ctx.command is None:
+            return await super().invoke(ctx)
+        start = time.perf_counter()
+        try:
+            await _profiled(self, ctx.prefix or "", ctx, super().invoke(ctx))
+        finally:
+            name = ctx.command.qualified_name
+            COMMAND_SECONDS.observe(time.perf_counter() - start, command=name, kind="prefix")
+            COMMAND_CALLS.inc(command=name, kind="prefix", outcome="error" if ctx.command_failed else "ok")
+
+    async def setup_hook(self):
+        await super().setup_hook()
+        self._loop_lag_task = asyncio.create_task(self._watch_loop_lag())
+
+    async def close(self):
+        if self._loop_lag_task:
+            self._loop_lag_task.cancel()
+            self._loop_lag_task = None
+        await super().close()
+
+    async def _watch_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            LOOP_LAG.observe(max(0.0, loop.time() - start - LOOP_LAG_INTERVAL))
+
+
+def instrumented(bot_class: Type[commands.Bot]) -> Type[commands.Bot]:
+    """`bot_class` (Bot or AutoShardedBot) with `InstrumentedBot` mixed in."""
+    return type(bot_class.__name__, (InstrumentedBot, bot_class), {})
+
+
+class MetricsServer:
+    """Serves the metrics registry at /metrics in Prometheus text format.
+
+    The Flask app runs on its own daemon thread, so scrapes never wait on
+    (or hold up) the bot's event loop.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100):
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        # Flask is only imported when metrics are actually served
+        from flask import Flask, Response
+        from werkzeug.serving import make_server
+
+        app = Flask("metrics")
+        # one access log line per scrape is just noise
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+        @app.route("/metrics")
+        def metrics():
+            return Response(render(), content_type=CONTENT_TYPE)
+
+        self._server = make_server(self.host, self.port, app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
@@ -0,0 +1,359 @@
+import asyncio
+import io
+import json
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+from utils.metrics import REGISTRY
+from utils.scheduler import Priority, SendShed
+
+OUTBOX_SECONDS = REGISTRY.histogram(
+    "bot_outbox_seconds", "Outbox database operation time, including the wait for the worker thread.", ["op"]
+)
+OUTBOX_MESSAGES = REGISTRY.counter(
+    "bot_outbox_messages_total", "Messages through the outbox by what happened to them.", ["kind", "outcome"]
+)
+OUTBOX_DELAY = REGISTRY.histogram(
+    "bot_outbox_delay_seconds", "Time from a message entering the outbox to its delivery.", ["kind"],
+    (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0, 3600.0),
+)
+OUTBOX_PENDING = REGISTRY.gauge("bot_outbox_pending", "Messages in the outbox waiting for delivery.")
+
+# (id, priority, kind, payload, file name, file data, created, attempts, next attempt)
+_Row = Tuple[int, int, str, str, Optional[str], Optional[bytes], float, int, float]
+# a missing server may only be missing from the cache (fresh session after a
+# reconnect); it is given this many retries before its messages are dropped
+GUILD_MISSING_ATTEMPTS = 5
+
+
+def _retryable(e: Exception) -> bool:
+    """Worth trying again later: Discord or the network is having trouble, not the message."""
+    if isinstance(e, discord.HTTPException):
+        return e.status == 429 or e.status >= 500
+    return isinstance(e, (SendShed, aiohttp.ClientError, asyncio.TimeoutError, OSError))
+
+
+class Outbox:
+    """Durable queue in front of the send scheduler for welcome and log messages.
+
+    `put()` never blocks and never raises: the message is serialised and
+    written to SQLite with the next batch (a few ms later), and from then on
+    it survives a crash or restart. One worker per channel delivers that
+    channel's messages strictly in the order they were put, deleting each
+    row once Discord accepted it, so delivery is at least once.
+
+    A delivery that fails because of Discord or the network (5xx, 429,
+    connection errors, a full scheduler queue) is retried with exponential
+    backoff, and the channel's later messages wait behind it. Everything in
+    backoff is retried right away when the gateway reconnects. Messages the
+    channel will never accept (403, 404, deleted channel) or that are older
+    than `max_age` are dropped.
+
+    Memory holds only the rows of the batch being written, the rows a
+    worker is sending and, per channel with a backlog, when its oldest
+    message is due (read from disk once at startup, then kept up to date
+    by put and delivery). The backlog lives on disk, capped at `max_rows`;
+    past that, the oldest log messages are shed before any welcome.
+    """
+
+    def __init__(self, path: str, client: commands.Bot, max_rows: int = 100_000, max_age: float = 86400,
+                 base_backoff: float = 2.0, max_backoff: float = 300.0, concurrency: int = 32,
+                 batch_delay: float = 0.05):
+        self.path = path
+        self.client = client
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self.batch_delay = batch_delay
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[tuple] = []
+        # rows on disk; only changed on the worker thread
+        self._stored = 0
+        self._workers: Dict[int, asyncio.Task] = {}
+        # channel -> when its oldest row is due; a channel with a worker is
+        # only here if rows arrived while the worker ran
+        self._heads: Dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        OUTBOX_PENDING.set_function(lambda: {(): float(self._stored + len(self._pending))})
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            OUTBOX_SECONDS.observe(time.perf_counter() - start, op=func.__name__.lstrip("_"))
+
+    # --------- lifecycle ---------
+    async def open(self):
+        await self._run(self._open)
+        self._heads = dict(await self._run(self._scan_heads))
+        if self._stored:
+            print(f"Outbox: {self._stored} message(s) left from the last run will be delivered")
+        self.client.add_listener(self._on_connected, "on_ready")
+        self.client.add_listener(self._on_connected, "on_resumed")
+        self._task = asyncio.create_task(self._dispatch())
+
+    async def close(self):
+        """Stop delivering and write everything queued to disk. Undelivered rows wait for the next start."""
+        self.client.remove_listener(self._on_connected, "on_ready")
+        self.client.remove_listener(self._on_connected, "on_resumed")
+        tasks = [t for t in (self._task, *self._workers.values()) if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        await self._flush()
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " guild_id INTEGER NOT NULL,"
+            " channel_id INTEGER NOT NULL,"
+            " priority INTEGER NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " file_name TEXT,"
+            " file_data BLOB,"
+            " created REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt REAL NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_by_channel ON outbox (channel_id, id)")
+        self._conn = conn
+        self._stored = conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def _close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    # --------- queueing ---------
+    def put(self, channel, priority: Priority, kind: str, content: Optional[str] = None,
+            embeds: Sequence[discord.Embed] = (), file: Optional[discord.File] = None):
+        """Queue a message for `channel` (a guild channel). Returns immediately."""
+        payload = json.dumps({"content": content, "embeds": [embed.to_dict() for embed in embeds]}, separators=(",", ":"))
+        file_name = file_data = None
+        if file is not None:
+            file_name, file_data = file.filename, file.fp.read()
+        self._pending.append(
+            (channel.guild.id, channel.id, int(priority), kind, payload, file_name, file_data, time.time())
+        )
+        OUTBOX_MESSAGES.inc(kind=kind, outcome="queued")
+        self._wakeup.set()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            shed = await self._run(self._insert, batch)
+        except Exception as e:
+            # still in memory; the next flush tries again
+            print(f"Outbox: failed to store {len(batch)} message(s): {e!r}")
+            self._pending[:0] = batch
+            return
+        for channel_id in {row[1] for row in batch}:
+            if channel_id in self._workers:
+                # the worker may already have looked and found nothing; look again after it
+                self._heads[channel_id] = 0.0
+            else:
+                # an existing head is older than the new rows and keeps its due time
+                self._heads.setdefault(channel_id, 0.0)
+        for kind, channel_id in shed:
+            OUTBOX_MESSAGES.inc(kind=kind, outcome="shed")
+            # the shed row may have been the head; a worker finds the real one
+            self._heads[channel_id] = 0.0
+
+    def _insert(self, batch) -> List[Tuple[str, int]]:
+        conn = self._conn
+        shed: List[Tuple[str, int]] = []
+        with conn:
+            conn.executemany(
+                "INSERT INTO outbox (guild_id, channel_id, priority, kind, payload, file_name, file_data, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            stored = self._stored + len(batch)
+            if stored > self.max_rows:
+                # least important first (logs before welcomes), oldest first within that
+                victims = conn.execute(
+                    "SELECT id, kind, channel_id FROM outbox ORDER BY priority DESC, id LIMIT ?", (stored - self.max_rows,)
+                ).fetchall()
+                conn.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id, _, _ in victims])
+                shed = [(kind, channel_id) for _, kind, channel_id in victims]
+                stored -= len(victims)
+        self._stored = stored
+        return shed
+
+    # --------- delivery ---------
+    async def _on_connected(self):
+        # Discord is reachable again: whatever is backing off goes now, in order
+        await self._run(self._retry_now)
+        for channel_id in self._heads:
+            self._heads[channel_id] = 0.0
+        self._wakeup.set()
+
+    def _retry_now(self):
+        with self._conn:
+            self._conn.execute("UPDATE outbox SET next_attempt = 0 WHERE next_attempt > 0")
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            # messages are stored right away, even during a long startup or
+            # reconnect; only sending waits for the connection (on_ready wakes us)
+            if self._pending:
+                # let a burst of puts land in one transaction
+                await asyncio.sleep(self.batch_delay)
+                await self._flush()
+            next_due = self._start_workers() if self.client.is_ready() else None
+            timeout = None if next_due is None else max(0.0, next_due - time.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start_workers(self) -> Optional[float]:
+        """Start a worker for every channel whose oldest message is due. Returns when the next one is."""
+        now = time.time()
+        next_due = None
+        for channel_id, due in list(self._heads.items()):
+            if channel_id in self._workers:
+                continue
+            if due > now:
+                next_due = due if next_due is None else min(next_due, due)
+            elif len(self._workers) < self.concurrency:
+                # the worker owns the channel now and reports back where it stopped
+                del self._heads[channel_id]
+                self._workers[channel_id] = asyncio.create_task(self._deliver_channel(channel_id))
+        return next_due
+
+    def _scan_heads(self) -> List[Tuple[int, float]]:
+        return self._conn.execute(
+            "SELECT outbox.channel_id, outbox.next_attempt FROM outbox"
+            " JOIN (SELECT MIN(id) AS id FROM outbox GROUP BY channel_id) AS heads ON heads.id = outbox.id"
+        ).fetchall()
+
+    def _rows(self, channel_id: int, limit: int) -> List[tuple]:
+        # (guild_id, *_Row)
+        return self._conn.execute(
+            "SELECT guild_id, id, priority, kind, payload, file_name, file_data, created, attempts, next_attempt"
+            " FROM outbox WHERE channel_id = ? ORDER BY id LIMIT ?",
+            (channel_id, limit),
+        ).fetchall()
+
+    def _delete(self, row_id: int):
+        with self._conn:
+            self._stored -= self._conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,)).rowcount
+
+    def _postpone(self, row_id: int, attempts: int, next_attempt: float):
+        with self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt = ? WHERE id = ?", (attempts, next_attempt, row_id)
+            )
+
+    async def _deliver_channel(self, channel_id: int):
+        # when the channel's oldest remaining row is due; None once it is empty
+        due: Optional[float] = None
+        try:
+            while True:
+                rows = await self._run(self._rows, channel_id, 10)
+                if not rows:
+                    return
+                for guild_id, *row in rows:
+                    # anything after a message in backoff waits for it, to keep the order
+                    if row[-1] > time.time() or not await self._deliver(guild_id, channel_id, row):
+                        due = await self._run(self._head_due, channel_id)
+                        return
+        except Exception as e:
+            print(f"Outbox: delivery to {channel_id} failed: {e!r}")
+            due = time.time() + self.base_backoff
+        finally:
+            del self._workers[channel_id]
+            if due is not None:
+                self._heads[channel_id] = min(due, self._heads.get(channel_id, due))
+            self._wakeup.set()
+
+    def _head_due(self, channel_id: int) -> Optional[float]:
+        row = self._conn.execute(
+            "SELECT next_attempt FROM outbox WHERE channel_id = ? ORDER BY id LIMIT 1", (channel_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    async def _deliver(self, guild_id: int, channel_id: int, row: _Row) -> bool:
+        """Send one message. False if it has to be retried later."""
+        row_id, priority, kind, payload, file_name, file_data, created, attempts, _ = row
+        if time.time() - created > self.max_age:
+            await self._drop(row_id, kind, "too old")
+            return True
+
+        guild = self.client.get_guild(guild_id)
+        if guild is None and attempts < GUILD_MISSING_ATTEMPTS:
+            await self._retry_later(row_id, kind, attempts)
+            return False
+        channel = guild.get_channel(channel_id) if guild else None
+        if channel is None:
+            await self._drop(row_id, kind, "the channel or server is gone")
+            return True
+
+        data = json.loads(payload)
+        kwargs = {}
+        if data["embeds"]:
+            kwargs["embeds"] = [discord.Embed.from_dict(embed) for embed in data["embeds"]]
+        if file_data is not None:
+            kwargs["file"] = discord.File(io.BytesIO(file_data), filename=file_name)
+        try:
+            await self.client.scheduler.send(channel, Priority(priority), data["content"], **kwargs)
+        except Exception as e:
+            if not _retryable(e):
+                await self._drop(row_id, kind, repr(e))
+                return True
+            await self._retry_later(row_id, kind, attempts)
+            return False
+
+        await self._run(self._delete, row_id)
+        OUTBOX_MESSAGES.inc(kind=kind, outcome="sent")
+        OUTBOX_DELAY.observe(time.time() - created, kind=kind)
+        return True
+
+    async def _retry_later(self, row_id: int, kind: str, attempts: int):
+        delay = min(self.max_backoff, self.base_backoff * 2 ** attempts) * random.uniform(0.5, 1.0)
+        await self._run(self._postpone, row_id, attempts + 1, time.time() + delay)
+        OUTBOX_MESSAGES.inc(kind=kind, outcome="retried")
+
+    async def _drop(self, row_id: int, kind: str, reason: str):
+        await self._run(self._delete, row_id)
+        OUTBOX_MESSAGES.inc(kind=kind, outcome="dropped")
+        print(f"Outbox: dropped a {kind} message: {reason}")
+
+    # --------- waiting ---------
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    async def drain(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far was delivered or dropped. False on timeout."""
+        deadline = time.monotonic() + timeout
+        self._wakeup.set()
+        while self._pending or self._workers or await self._run(self._count):
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
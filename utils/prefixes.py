@@ -0,0 +1,33 @@
+from typing import Dict
+
+from utils.store import ConfigStore
+
+
+class PrefixCache:
+    """In-memory guild -> prefix map, kept in sync with the config store.
+
+    Resolving a prefix is a single dict lookup. Changes made through `set`,
+    and changes the store picks up from other connections, are applied
+    through the store's change notifications.
+    """
+
+    def __init__(self, store: ConfigStore, default: str):
+        self.store = store
+        self.default = default
+        self._prefixes: Dict[int, str] = {
+            gid: conf["prefix"] for gid, conf in store.all("prefixes").items() if "prefix" in conf
+        }
+        store.subscribe("prefixes", self._on_change)
+
+    def _on_change(self, guild_id: int, conf: dict):
+        prefix = conf.get("prefix")
+        if prefix is None:
+            self._prefixes.pop(guild_id, None)
+        else:
+            self._prefixes[guild_id] = prefix
+
+    def get(self, guild_id: int) -> str:
+        return self._prefixes.get(guild_id, self.default)
+
+    async def set(self, guild_id: int, prefix: str):
+        await self.store.update("prefixes", guild_id, {"prefix": prefix})
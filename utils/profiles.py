@@ -0,0 +1,93 @@
+import ast
+import os
+import sys
+from typing import Dict, Iterable, Set
+
+import discord
+
+# what the bot itself needs regardless of cogs: guild events, and message
+# content for prefix commands
+BASE_INTENTS = ("guilds", "guild_messages", "message_content")
+
+PROFILES = ("minimal", "standard", "full")
+
+
+def declared_intents(path: str) -> Set[str]:
+    """Read a cog's module-level `INTENTS = (...)` without importing it.
+
+    Intents have to be known before the bot is constructed, but cogs are
+    only imported when they are loaded; parsing keeps the import (and its
+    side effects) where it belongs.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "INTENTS" for t in node.targets):
+            names = set(ast.literal_eval(node.value))
+            unknown = names - set(discord.Intents.VALID_FLAGS)
+            if unknown:
+                raise ValueError(f"{os.path.basename(path)} declares unknown intents: {', '.join(sorted(unknown))}")
+            return names
+    return set()
+
+
+def bot_options(profile: str, cog_paths: Iterable[str]) -> Dict[str, object]:
+    """Keyword arguments for the bot constructor under a runtime profile.
+
+    - minimal:  only the intents the cogs declare, no member cache, no
+                startup chunking, small message cache.
+    - standard: declared intents, members are cached only once they are
+                seen (e.g. joining), no startup chunking.
+    - full:     every intent, every member cached and chunked at startup
+                (the old `Intents.all()` behaviour).
+
+    Without a full member cache, member events for uncached members are
+    only delivered raw, so cogs listen for e.g. `on_raw_member_remove`.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}, expected one of: {', '.join(PROFILES)}")
+
+    if profile == "full":
+        return {
+            "intents": discord.Intents.all(),
+            "member_cache_flags": discord.MemberCacheFlags.all(),
+            "chunk_guilds_at_startup": True,
+        }
+
+    names = set(BASE_INTENTS)
+    for path in cog_paths:
+        names |= declared_intents(path)
+    intents = discord.Intents.none()
+    for name in names:
+        setattr(intents, name, True)
+
+    if profile == "minimal":
+        return {
+            "intents": intents,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False,
+            "max_messages": 200,
+        }
+    return {
+        "intents": intents,
+        "member_cache_flags": discord.MemberCacheFlags.from_intents(intents),
+        "chunk_guilds_at_startup": False,
+    }
+
+
+def memory_usage_mb() -> float:
+    """Current resident set size in MiB (peak RSS where /proc isn't available)."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
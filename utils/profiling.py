@@ -0,0 +1,183 @@
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Awaitable, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+BLOCKING_SECONDS = REGISTRY.histogram(
+    "bot_handler_blocking_seconds", "Time a listener or command spent running on the event loop, not awaiting.", ["handler"]
+)
+SLOW_HANDLERS = REGISTRY.counter(
+    "bot_slow_handlers_total", "Handler runs that blocked the event loop longer than the watchdog threshold.", ["handler"]
+)
+
+
+class _Step:
+    __slots__ = ("name", "started", "reported")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.reported = False
+
+
+class _Profiled:
+    """Awaits `awaitable`, timing every step it runs on the event loop.
+
+    A coroutine only blocks the loop between being resumed and its next
+    suspension, so the sum of those steps is its blocking time; wall time
+    also includes everything it awaited.
+    """
+
+    __slots__ = ("profiler", "name", "awaitable")
+
+    def __init__(self, profiler: "HandlerProfiler", name: str, awaitable: Awaitable):
+        self.profiler = profiler
+        self.name = name
+        self.awaitable = awaitable
+
+    def __await__(self):
+        profiler = self.profiler
+        gen = self.awaitable.__await__()
+        value, error = None, None
+        wall = time.perf_counter()
+        blocking = 0.0
+        try:
+            while True:
+                step = _Step(self.name)
+                outer, profiler._current = profiler._current, step
+                try:
+                    yielded = gen.send(value) if error is None else gen.throw(error)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    blocking += time.perf_counter() - step.started
+                    profiler._current = outer
+                try:
+                    value, error = (yield yielded), None
+                except BaseException as e:
+                    value, error = None, e
+        finally:
+            profiler._record(self.name, time.perf_counter() - wall, blocking)
+
+
+class HandlerProfiler:
+    """Opt-in blocking-time measurement for listeners and commands, plus a watchdog.
+
+    `wrap(name, coro)` is applied by the instrumented bot to every handler.
+    A watchdog thread looks at the step currently running on the event loop
+    and, once it has run longer than `threshold`, prints the loop thread's
+    stack so the blocking call shows up in the log while it is happening.
+    """
+
+    def __init__(self, threshold: float = 0.1, check_interval: Optional[float] = None):
+        self.threshold = threshold
+        self.check_interval = check_interval or max(threshold / 4, 0.005)
+        self._current: Optional[_Step] = None
+        self._loop_thread: Optional[int] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the watchdog. Call from the event loop's thread."""
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, name="handler-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wrap(self, name: str, awaitable: Awaitable) -> Awaitable:
+        return _Profiled(self, name, awaitable)
+
+    def _record(self, name: str, wall: float, blocking: float):
+        BLOCKING_SECONDS.observe(blocking, handler=name)
+        if blocking > self.threshold:
+            SLOW_HANDLERS.inc(handler=name)
+            print(f"Slow handler {name}: blocked the event loop for {blocking * 1000:.0f} ms ({wall * 1000:.0f} ms wall)")
+
+    def _watch(self):
+        while not self._stopped.wait(self.check_interval):
+            step = self._current
+            if step is None or step.reported or time.perf_counter() - step.started < self.threshold:
+                continue
+            step.reported = True
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            print(f"Handler {step.name} has been blocking the event loop for over {self.threshold * 1000:.0f} ms:\n{stack}")
+
+
+_FrameKey = Tuple[str, int, str]
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and counts where it is.
+
+    Unlike cProfile nothing is hooked into the sampled thread, so it can be
+    turned on for a running bot; the cost is one stack walk per interval on
+    the sampling thread.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.duration = 0.0
+        self.own: Counter[_FrameKey] = Counter()
+        self.total: Counter[_FrameKey] = Counter()
+
+    def run(self, seconds: float) -> "SamplingProfiler":
+        """Sample for `seconds`. Blocks; run it in a thread."""
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self._sample(frame)
+            time.sleep(self.interval)
+        self.duration = time.perf_counter() - start
+        return self
+
+    def _sample(self, frame):
+        self.samples += 1
+        code = frame.f_code
+        self.own[(code.co_filename, code.co_firstlineno, code.co_name)] += 1
+        seen = set()
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_filename, code.co_firstlineno, code.co_name)
+            if key not in seen:
+                seen.add(key)
+                self.total[key] += 1
+            frame = frame.f_back
+
+    def report(self, top: int = 25) -> str:
+        lines = [f"{self.samples} samples over {self.duration:.1f}s (every {self.interval * 1000:.0f} ms)", ""]
+        for title, counts in (("Own time (function at the top of the stack)", self.own),
+                              ("Total time (function anywhere on the stack)", self.total)):
+            lines.append(title)
+            lines.append(f"{'%':>6} {'samples':>8}  function")
+            for (filename, lineno, name), count in counts.most_common(top):
+                share = count / self.samples * 100 if self.samples else 0.0
+                lines.append(f"{share:6.1f} {count:8d}  {name} ({_short_path(filename)}:{lineno})")
+            lines.append("")
+        return "\n".join(lines)
+
+
+def _short_path(filename: str) -> str:
+    """Path relative to the bot's directory, site-packages or the stdlib, for readable reports."""
+    roots = [os.getcwd()] + [p for p in sys.path if p.endswith("site-packages")] + [os.path.dirname(os.__file__)]
+    for root in roots:
+        if root and filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
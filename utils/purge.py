@@ -0,0 +1,181 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, List, Optional
+
+import discord
+
+# Discord refuses to bulk-delete messages older than 14 days; keep a margin
+# so a message doesn't cross the line between the scan and the request.
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)
+BULK_CHUNK = 100
+# single deletes of old messages have a much tighter limit than bulk deletes
+OLD_DELETE_INTERVAL = 1.2
+
+
+class PurgeFilters:
+    """Which messages a purge deletes. Empty filters match everything."""
+
+    __slots__ = ("author_id", "bots_only", "contains", "has_attachments")
+
+    def __init__(self, author_id: Optional[int] = None, bots_only: bool = False,
+                 contains: Optional[str] = None, has_attachments: bool = False):
+        self.author_id = author_id
+        self.bots_only = bots_only
+        self.contains = contains.lower() if contains else None
+        self.has_attachments = has_attachments
+
+    def matches(self, message: discord.Message) -> bool:
+        if self.author_id is not None and message.author.id != self.author_id:
+            return False
+        if self.bots_only and not message.author.bot:
+            return False
+        if self.contains is not None and self.contains not in message.content.lower():
+            return False
+        if self.has_attachments and not message.attachments:
+            return False
+        return True
+
+
+class PurgeJob:
+    """Deletes up to `count` matching messages from a channel in one history scan.
+
+    Messages are streamed from `channel.history`; recent ones are bulk
+    deleted in chunks of 100 while the scan keeps going, and ones past the
+    bulk-delete age go to a separate, rate-limited single-delete lane. At
+    most `max_scan` messages are read. `progress` is called at most every
+    `progress_interval` seconds and once at the end; `cancel()` stops the
+    scan and both lanes as soon as their current request finishes.
+    """
+
+    def __init__(
+        self,
+        channel: discord.abc.Messageable,
+        count: int,
+        filters: PurgeFilters,
+        before: Optional[discord.abc.Snowflake] = None,
+        max_scan: int = 10_000,
+        progress: Optional[Callable[["PurgeJob"], Awaitable[None]]] = None,
+        progress_interval: float = 3.0,
+    ):
+        self.channel = channel
+        self.count = count
+        self.filters = filters
+        self.before = before
+        self.max_scan = max_scan
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+        self.scanned = 0
+        self.matched = 0
+        self.deleted = 0
+        self.failed = 0
+        self.old_pending = 0
+        self.cancelled = False
+        self.done = False
+
+        self._bulk: asyncio.Queue = asyncio.Queue(maxsize=4)
+        self._old: asyncio.Queue = asyncio.Queue()
+        self._last_progress = 0.0
+
+    def cancel(self):
+        self.cancelled = True
+
+    async def run(self) -> "PurgeJob":
+        bulk_lane = asyncio.create_task(self._bulk_lane())
+        old_lane = asyncio.create_task(self._old_lane())
+        try:
+            await self._scan()
+        finally:
+            # a lane that is gone would never empty its queue; don't wait on it
+            if not bulk_lane.done():
+                await self._bulk.put(None)
+            if not old_lane.done():
+                await self._old.put(None)
+            await asyncio.gather(bulk_lane, old_lane, return_exceptions=True)
+            self.done = True
+            await self._report(force=True)
+        return self
+
+    async def _scan(self):
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        chunk: List[discord.Message] = []
+
+        async for message in self.channel.history(limit=self.max_scan, before=self.before):
+            if self.cancelled:
+                break
+            self.scanned += 1
+            if not self.filters.matches(message):
+                continue
+
+            self.matched += 1
+            if message.created_at > cutoff:
+                chunk.append(message)
+                if len(chunk) == BULK_CHUNK:
+                    await self._bulk.put(chunk)
+                    chunk = []
+            else:
+                self.old_pending += 1
+                self._old.put_nowait(message)
+
+            await self._report()
+            if self.matched >= self.count:
+                break
+
+        if chunk and not self.cancelled:
+            await self._bulk.put(chunk)
+
+    async def _bulk_lane(self):
+        while True:
+            chunk = await self._bulk.get()
+            if chunk is None:
+                return
+            if self.cancelled:
+                continue
+            # any failure only costs this chunk: if the lane died, the scan
+            # would block forever putting into the full queue
+            try:
+                await self.channel.delete_messages(chunk)
+                self.deleted += len(chunk)
+            except discord.HTTPException:
+                self.failed += len(chunk)
+            except Exception as e:
+                print(f"Purge: bulk delete failed: {e!r}")
+                self.failed += len(chunk)
+            await self._report()
+
+    async def _old_lane(self):
+        while True:
+            message = await self._old.get()
+            if message is None:
+                return
+            if self.cancelled:
+                self.old_pending -= 1
+                continue
+            try:
+                await message.delete()
+                self.deleted += 1
+            except discord.NotFound:
+                pass
+            except discord.HTTPException:
+                self.failed += 1
+            except Exception as e:
+                print(f"Purge: delete failed: {e!r}")
+                self.failed += 1
+            self.old_pending -= 1
+            await self._report()
+            await asyncio.sleep(OLD_DELETE_INTERVAL)
+
+    async def _report(self, force: bool = False):
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        try:
+            await self.progress(self)
+        except discord.HTTPException:
+            pass
+        except Exception as e:
+            print(f"Purge: progress update failed: {e!r}")
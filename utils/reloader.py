@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from discord.ext import commands
+
+from utils.metrics import REGISTRY
+from utils.profiles import declared_intents
+
+RELOADS = REGISTRY.counter("bot_extension_reloads_total", "Extension loads, reloads and unloads at runtime.", ["result"])
+
+
+class CogReloader:
+    """Reloads extensions whose source file changed, without restarting the bot.
+
+    Files are compared by (mtime, size) against the snapshot taken when the
+    reloader was created or last checked. Before a loaded cog is touched,
+    the new source must parse and must not declare intents the running
+    gateway connection lacks (those need a restart). `reload_extension`
+    itself puts the old module back if the new one fails to import or set
+    up, so a broken edit leaves the running cog in place.
+
+    Only the changed extension is re-created; utils modules, the config
+    store and the other cogs keep their state. `on_change` (e.g. a tree
+    sync) runs once after any extension was (re)loaded or unloaded.
+    """
+
+    def __init__(self, client: commands.Bot, directory: str, package: str = "cogs",
+                 on_change: Optional[Callable[[], Awaitable[None]]] = None, interval: float = 2.0):
+        self.client = client
+        self.directory = directory
+        self.package = package
+        self.on_change = on_change
+        self.interval = interval
+        self._seen = self._snapshot()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        files = {}
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".py") and entry.is_file():
+                stat = entry.stat()
+                files[entry.name[:-3]] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def names(self) -> List[str]:
+        """Module names of every extension file in the directory."""
+        return sorted(self._snapshot())
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + ".py")
+
+    # --------- watching ---------
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                for line in await self.check():
+                    print(f"Hot reload: {line}")
+            except Exception as e:
+                print(f"Hot reload check failed: {e!r}")
+
+    # --------- reloading ---------
+    async def check(self) -> List[str]:
+        """Load, reload or unload every extension whose file changed. Returns one line per extension."""
+        async with self._lock:
+            current = self._snapshot()
+            if current == self._seen:
+                return []
+            # an editor may still be writing; wait for the files to settle
+            await asyncio.sleep(0.25)
+            current = self._snapshot()
+            changed = sorted(name for name in current if current[name] != self._seen.get(name))
+            removed = sorted(name for name in self._seen if name not in current)
+            # a failed reload is not retried until the file changes again
+            self._seen = current
+
+            results = [await self._reload(name) for name in changed]
+            results += [await self._unload(name) for name in removed]
+        await self._changed(results)
+        return [line for _, line in results]
+
+    async def reload(self, name: str) -> str:
+        """Reload (or load) one extension by its module name, changed or not."""
+        async with self._lock:
+            if not os.path.exists(self._path(name)):
+                return f"{name}: no such file in {os.path.basename(self.directory)}/"
+            # other changed files stay pending for the next check
+            self._seen[name] = self._snapshot().get(name)
+            result = await self._reload(name)
+        await self._changed([result])
+        return result[1]
+
+    async def _changed(self, results: List[Tuple[bool, str]]):
+        if self.on_change is not None and any(ok for ok, _ in results):
+            try:
+                await self.on_change()
+            except Exception as e:
+                print(f"Hot reload: post-reload hook failed: {e!r}")
+
+    async def _reload(self, name: str) -> Tuple[bool, str]:
+        extension = f"{self.package}.{name}"
+        try:
+            # parses the file too, so a syntax error never unloads the running cog
+            declared = declared_intents(self._path(name))
+        except (SyntaxError, ValueError) as e:
+            RELOADS.inc(result="rejected")
+            return False, f"{name}: not reloaded, {e!r}"
+        missing = sorted(intent for intent in declared if not getattr(self.client.intents, intent))
+        if missing:
+            RELOADS.inc(result="rejected")
+            return False, f"{name}: not reloaded, needs intents {', '.join(missing)} (restart the bot)"
+
+        start = time.perf_counter()
+        loaded = extension in self.client.extensions
+        try:
+            if loaded:
+                await self.client.reload_extension(extension)
+            else:
+                await self.client.load_extension(extension)
+        except Exception as e:
+            RELOADS.inc(result="failed")
+            cause = e.__cause__ or e
+            kept = "old version kept" if loaded else "not loaded"
+            return False, f"{name}: failed, {kept}: {cause!r}"
+        RELOADS.inc(result="reloaded" if loaded else "loaded")
+        return True, f"{name}: {'reloaded' if loaded else 'loaded'} in {(time.perf_counter() - start) * 1000:.1f} ms"
+
+    async def _unload(self, name: str) -> Tuple[bool, str]:
+        extension = f"{self.package}.{name}"
+        if extension not in self.client.extensions:
+            return False, f"{name}: file removed, was not loaded"
+        try:
+            await self.client.unload_extension(extension)
+        except commands.ExtensionError as e:
+            RELOADS.inc(result="failed")
+            return False, f"{name}: file removed, unload failed: {e!r}"
+        RELOADS.inc(result="unloaded")
+        return True, f"{name}: file removed, unloaded"
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+from utils.metrics import REGISTRY
+
+QUEUE_DEPTH = REGISTRY.gauge("bot_send_queue_depth", "Messages waiting in the send scheduler.", ["priority"])
+QUEUE_WAIT = REGISTRY.histogram("bot_send_wait_seconds", "Time a message waited in the send scheduler.", ["priority"])
+SENDS = REGISTRY.counter("bot_sends_total", "Messages handled by the send scheduler.", ["priority", "outcome"])
+RATE_LIMITED = REGISTRY.counter("bot_rate_limited_total", "429 responses seen from Discord.", ["scope"])
+HTTP_REQUESTS = REGISTRY.counter("bot_http_requests_total", "REST requests made to Discord.", ["method", "status"])
+
+# routes whose buckets we model: message creates and webhook/followup executes
+_CHANNEL_PATH = re.compile(r"/channels/(\d+)/messages$")
+_WEBHOOK_PATH = re.compile(r"/webhooks/(\d+)/([^/]+)$")
+
+
+class Priority(IntEnum):
+    """Lower value is sent first. Only WELCOME and LOGS are ever shed."""
+
+    MODERATION = 0
+    INTERACTION = 1  # interaction followups and other command replies
+    WELCOME = 2
+    LOGS = 3
+
+
+SHEDDABLE = (Priority.WELCOME, Priority.LOGS)
+
+
+class SendShed(Exception):
+    """Raised to the sender when a low-priority message is dropped under pressure."""
+
+
+class TokenBucket:
+    """Local model of one Discord rate-limit bucket.
+
+    Starts from Discord's usual message limit (5 per 5s) and is corrected
+    from the X-RateLimit-* headers of every response on the route.
+    """
+
+    __slots__ = ("limit", "remaining", "window", "reset_at")
+
+    def __init__(self, limit: int = 5, window: float = 5.0):
+        self.limit = limit
+        self.remaining = limit
+        self.window = window
+        self.reset_at = 0.0
+
+    def delay(self, now: float) -> float:
+        if now >= self.reset_at:
+            return 0.0
+        return 0.0 if self.remaining > 0 else self.reset_at - now
+
+    def take(self, now: float):
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        self.remaining -= 1
+
+    def learn(self, now: float, limit: int, remaining: int, reset_after: float):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = now + reset_after
+        if remaining == limit - 1:
+            # first request of a fresh window: reset_after is the window length
+            self.window = reset_after
+
+
+class _Job:
+    __slots__ = ("priority", "factory", "future", "queued_at")
+
+    def __init__(self, priority: Priority, factory: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        self.priority = priority
+        self.factory = factory
+        self.future = future
+        self.queued_at = time.monotonic()
+
+
+class _Route:
+    __slots__ = ("bucket", "heap", "task")
+
+    def __init__(self):
+        self.bucket = TokenBucket()
+        self.heap: List[tuple] = []
+        self.task: Optional[asyncio.Task] = None
+
+
+class SendScheduler:
+    """Single outbound path for bot messages, with per-route priority queues.
+
+    Each route (a channel, or a webhook/interaction token) has its own token
+    bucket and a heap ordered by priority, then arrival. One worker per
+    route takes the highest-priority message whenever the bucket has a
+    token, so moderation replies overtake queued welcome and log messages.
+    When a route's queue is full, an incoming message displaces the newest
+    queued message of a lower sheddable priority; if there is none, an
+    incoming welcome or log message is itself dropped with SendShed.
+
+    Pass `trace_config()` to the bot as `http_trace` so buckets learn from
+    Discord's rate-limit headers.
+    """
+
+    def __init__(self, max_queue: int = 50):
+        self.max_queue = max_queue
+        self._routes: Dict[str, _Route] = {}
+        self._seq = itertools.count()
+        self._depth = {p: 0 for p in Priority}
+        QUEUE_DEPTH.set_function(lambda: {(p.name.lower(),): float(n) for p, n in self._depth.items()})
+
+    # --------- public API ---------
+    async def send(self, target, priority: Priority, *args, **kwargs) -> Optional[discord.Message]:
+        """Queue `target.send(*args, **kwargs)` and wait for it to be delivered."""
+        route_key = self._route_key(target)
+        return await self.submit(route_key, priority, lambda: target.send(*args, **kwargs))
+
+    async def submit(self, route_key: str, priority: Priority, factory: Callable[[], Awaitable[Any]]):
+        route = self._routes.get(route_key)
+        if route is None:
+            route = self._routes[route_key] = _Route()
+
+        job = _Job(priority, factory, asyncio.get_running_loop().create_future())
+        if len(route.heap) >= self.max_queue and not self._shed(route, job) and priority in SHEDDABLE:
+            # nothing less important to drop; moderation and replies are queued regardless
+            self._count(job, "shed")
+            raise SendShed(f"send queue for {route_key} is full")
+
+        heapq.heappush(route.heap, (priority, next(self._seq), job))
+        self._depth[priority] += 1
+        if route.task is None:
+            route.task = asyncio.create_task(self._work(route_key, route))
+        return await job.future
+
+    def queue_depth(self) -> Dict[str, int]:
+        return {p.name.lower(): n for p, n in self._depth.items()}
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+        trace.on_request_end.append(self._on_request_end)
+        return trace
+
+    # --------- internals ---------
+    @staticmethod
+    def _route_key(target) -> str:
+        if isinstance(target, discord.Webhook):
+            return f"webhook:{target.id}:{target.token}"
+        if isinstance(target, commands.Context):
+            target = target.channel
+        return f"channel:{target.id}"
+
+    def _shed(self, route: _Route, incoming: _Job) -> bool:
+        """Make room for `incoming` by dropping a queued, strictly less important job."""
+        victim_index = None
+        for i, (priority, seq, job) in enumerate(route.heap):
+            if priority not in SHEDDABLE or priority <= incoming.priority:
+                continue
+            if victim_index is None or (priority, seq) > route.heap[victim_index][:2]:
+                victim_index = i
+        if victim_index is None:
+            return False
+
+        _, _, victim = route.heap[victim_index]
+        route.heap[victim_index] = route.heap[-1]
+        route.heap.pop()
+        heapq.heapify(route.heap)
+        self._depth[victim.priority] -= 1
+        self._count(victim, "shed")
+        if not victim.future.done():
+            victim.future.set_exception(SendShed("dropped for higher-priority traffic"))
+        return True
+
+    def _count(self, job: _Job, outcome: str):
+        SENDS.inc(priority=job.priority.name.lower(), outcome=outcome)
+
+    async def _work(self, route_key: str, route: _Route):
+        try:
+            while route.heap:
+                delay = route.bucket.delay(time.monotonic())
+                if delay > 0:
+                    # the pick below happens after the wait, so anything
+                    # more urgent queued meanwhile still goes first
+                    await asyncio.sleep(delay)
+                    continue
+
+                priority, _, job = heapq.heappop(route.heap)
+                self._depth[priority] -= 1
+                if job.future.done():  # sender gave up
+                    continue
+
+                now = time.monotonic()
+                route.bucket.take(now)
+                QUEUE_WAIT.observe(now - job.queued_at, priority=priority.name.lower())
+                try:
+                    result = await job.factory()
+                except Exception as e:
+                    self._count(job, "failed")
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                else:
+                    self._count(job, "sent")
+                    if not job.future.done():
+                        job.future.set_result(result)
+        finally:
+            route.task = None
+            for _, _, job in route.heap:
+                self._depth[job.priority] -= 1
+                if not job.future.done():
+                    job.future.cancel()
+            route.heap.clear()
+            if route.bucket.reset_at <= time.monotonic():
+                self._routes.pop(route_key, None)
+            else:
+                # keep what we learned until the window resets
+                asyncio.get_running_loop().call_later(
+                    route.bucket.reset_at - time.monotonic(), self._forget, route_key, route
+                )
+
+    def _forget(self, route_key: str, route: _Route):
+        if self._routes.get(route_key) is route and route.task is None:
+            del self._routes[route_key]
+
+    async def _on_request_end(self, session, ctx, params: aiohttp.TraceRequestEndParams):
+        headers = params.response.headers
+        HTTP_REQUESTS.inc(method=params.method, status=params.response.status)
+        if params.response.status == 429:
+            RATE_LIMITED.inc(scope=headers.get("X-RateLimit-Scope", "unknown"))
+        if params.method != "POST" or "X-RateLimit-Remaining" not in headers:
+            return
+
+        path = params.url.path
+        match = _CHANNEL_PATH.search(path)
+        if match:
+            route_key = f"channel:{match.group(1)}"
+        else:
+            match = _WEBHOOK_PATH.search(path)
+            if not match:
+                return
+            route_key = f"webhook:{match.group(1)}:{match.group(2)}"
+
+        route = self._routes.get(route_key)
+        if route is None:
+            return
+        try:
+            route.bucket.learn(
+                time.monotonic(),
+                int(headers["X-RateLimit-Limit"]),
+                int(headers["X-RateLimit-Remaining"]),
+                float(headers["X-RateLimit-Reset-After"]),
+            )
+        except (KeyError, ValueError):
+            pass
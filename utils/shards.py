@@ -0,0 +1,59 @@
+import math
+from typing import List, Optional, Tuple
+
+from discord.ext import commands
+
+# a shard that hasn't reported for this long is shown as stale
+STALE_AFTER = 60.0
+
+
+def parse_shard_ids(text: Optional[str]) -> Optional[List[int]]:
+    """Parse "0-3", "4,5,7" or "0-3,8" into a sorted list of shard ids."""
+    if not text:
+        return None
+    ids = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (int(x) for x in part.split("-", 1))
+            if last < first:
+                raise ValueError(f"Bad shard range {part!r}")
+            ids.update(range(first, last + 1))
+        else:
+            ids.add(int(part))
+    return sorted(ids)
+
+
+def format_shard_ids(ids: List[int]) -> str:
+    """Inverse of `parse_shard_ids` for a contiguous range, a list otherwise."""
+    if ids == list(range(ids[0], ids[-1] + 1)):
+        return f"{ids[0]}-{ids[-1]}"
+    return ",".join(str(i) for i in ids)
+
+
+def split_shards(shard_count: int, processes: int) -> List[List[int]]:
+    """Split shards 0..shard_count-1 into `processes` contiguous, near-equal ranges."""
+    if shard_count < 1 or processes < 1:
+        raise ValueError("shard_count and processes must be at least 1")
+    processes = min(processes, shard_count)
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for i in range(processes):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def shard_latencies(client: commands.Bot) -> List[Tuple[int, Optional[float]]]:
+    """(shard_id, heartbeat latency) for every shard this process runs.
+
+    Latency is None until the shard's first heartbeat is acknowledged.
+    """
+    if isinstance(client, commands.AutoShardedBot):
+        latencies = client.latencies
+    else:
+        latencies = [(0, client.latency)]
+    return [(shard_id, latency if math.isfinite(latency) else None) for shard_id, latency in latencies]
@@ -0,0 +1,384 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from json import JSONDecodeError
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+# reads are dict lookups, writes are a transaction on the worker thread
+STORE_BUCKETS = (0.000001, 0.00001, 0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+STORE_SECONDS = REGISTRY.histogram(
+    "bot_store_seconds", "Config store operation time, including the wait for the worker thread.", ["op"], STORE_BUCKETS
+)
+FLUSH_DELAY = REGISTRY.histogram(
+    "bot_store_flush_delay_seconds", "Time from a deferred config change to its commit.", (),
+    (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0),
+)
+PENDING_ROWS = REGISTRY.gauge("bot_store_pending_rows", "Config rows changed in memory and not yet committed.")
+
+
+def _merge(conf: dict, changes: dict):
+    # a value of None removes the key
+    for key, value in changes.items():
+        if value is None:
+            conf.pop(key, None)
+        else:
+            conf[key] = value
+
+
+class ConfigStore:
+    """Per-guild config shared by all cogs, stored in SQLite (WAL mode).
+
+    Every guild has one row per section ("prefixes", "welcome", "logs"), so a
+    setter only rewrites that row instead of the whole file. All SQLite work
+    runs on a single worker thread, which keeps it off the event loop and
+    serialises writes; each update is its own transaction.
+
+    Reads come from an in-memory copy of the table and never touch the disk.
+    Commits made by another connection (a second process, sqlite3 shell) are
+    picked up by `refresh()`, which the watch task calls periodically.
+
+    `update_later()` is the write-behind path for settings that come in
+    bursts: the change is visible to readers at once, and all rows changed
+    within `flush_delay` seconds of each other (but no later than
+    `max_flush_delay` after the first) are committed together in one
+    transaction. A failed flush keeps its changes and retries; `close()`
+    flushes whatever is left, so only a hard crash can lose the last
+    `max_flush_delay` seconds of deferred changes, and never half of a flush.
+    """
+
+    def __init__(self, path: str, flush_delay: float = 0.5, max_flush_delay: float = 2.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.max_flush_delay = max_flush_delay
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="config-store")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data: Dict[str, Dict[int, dict]] = {}
+        self._listeners: Dict[str, List[Callable[[int, dict], None]]] = {}
+        self._data_version: Optional[int] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        # (section, guild_id) -> changes not committed yet, and when the oldest was made
+        self._pending: Dict[Tuple[str, int], dict] = {}
+        self._dirty_since: Optional[float] = None
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        PENDING_ROWS.set_function(lambda: {(): float(len(self._pending))})
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            STORE_SECONDS.observe(time.perf_counter() - start, op=func.__name__.lstrip("_"))
+
+    # --------- lifecycle ---------
+    async def open(self, watch_interval: float = 5.0):
+        self._data = await self._run(self._open)
+        if watch_interval:
+            self._watch_task = asyncio.create_task(self._watch(watch_interval))
+
+    async def close(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            self._watch_task = None
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._conn:
+            await self.flush()
+            if self._pending:
+                print(f"Config store closed with {len(self._pending)} uncommitted row(s)")
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+    def _open(self) -> Dict[str, Dict[int, dict]]:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS guild_config ("
+            " section TEXT NOT NULL,"
+            " guild_id INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (section, guild_id))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shard_status ("
+            " shard_id INTEGER PRIMARY KEY,"
+            " pid INTEGER NOT NULL,"
+            " latency REAL,"
+            " guilds INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn = conn
+        return self._read_all()
+
+    def _read_all(self) -> Dict[str, Dict[int, dict]]:
+        data: Dict[str, Dict[int, dict]] = {}
+        for section, guild_id, raw in self._conn.execute("SELECT section, guild_id, data FROM guild_config"):
+            data.setdefault(section, {})[guild_id] = json.loads(raw)
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return data
+
+    # --------- reads (in memory) ---------
+    def get(self, section: str, guild_id: int) -> dict:
+        """Return a shallow copy of the guild's config for `section` ({} if unset)."""
+        start = time.perf_counter()
+        conf = dict(self._data.get(section, {}).get(guild_id, {}))
+        STORE_SECONDS.observe(time.perf_counter() - start, op="get")
+        return conf
+
+    def all(self, section: str) -> Dict[int, dict]:
+        """Every guild's config for `section`. Treat the result as read-only."""
+        return self._data.get(section, {})
+
+    def subscribe(self, section: str, callback: Callable[[int, dict], None]):
+        """Call `callback(guild_id, new_conf)` whenever a guild's row changes."""
+        self._listeners.setdefault(section, []).append(callback)
+
+    def unsubscribe(self, section: str, callback: Callable[[int, dict], None]):
+        try:
+            self._listeners.get(section, []).remove(callback)
+        except ValueError:
+            pass
+
+    def _apply(self, section: str, guild_id: int, conf: Optional[dict]):
+        rows = self._data.setdefault(section, {})
+        if conf is None:
+            rows.pop(guild_id, None)
+            conf = {}
+        else:
+            rows[guild_id] = conf
+        for callback in list(self._listeners.get(section, [])):
+            callback(guild_id, conf)
+
+    # --------- writes (worker thread, one transaction each) ---------
+    async def update(self, section: str, guild_id: int, changes: dict) -> dict:
+        """Merge `changes` into the guild's row. A value of None removes the key."""
+        return await self.modify(section, guild_id, lambda conf: _merge(conf, changes))
+
+    async def modify(self, section: str, guild_id: int, func: Callable[[dict], None]) -> dict:
+        """Atomically read the guild's row, let `func` mutate it, and write it back.
+
+        `func` runs on the store's worker thread inside the transaction, so it
+        must be quick and must not touch the event loop.
+        """
+        # deferred changes go first, or the row read below would miss them
+        await self.flush()
+        conf = await self._run(self._modify, section, guild_id, func)
+        self._apply(section, guild_id, conf)
+        return dict(conf)
+
+    async def delete(self, section: str, guild_id: int):
+        await self.flush()
+        await self._run(self._delete, section, guild_id)
+        self._apply(section, guild_id, None)
+
+    def _modify(self, section: str, guild_id: int, func: Callable[[dict], None]) -> dict:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM guild_config WHERE section = ? AND guild_id = ?", (section, guild_id)
+            ).fetchone()
+            conf = json.loads(row[0]) if row else {}
+            func(conf)
+            conn.execute(
+                "INSERT INTO guild_config (section, guild_id, data) VALUES (?, ?, ?)"
+                " ON CONFLICT (section, guild_id) DO UPDATE SET data = excluded.data",
+                (section, guild_id, json.dumps(conf)),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return conf
+
+    def _delete(self, section: str, guild_id: int):
+        self._conn.execute("DELETE FROM guild_config WHERE section = ? AND guild_id = ?", (section, guild_id))
+
+    # --------- deferred writes (write-behind) ---------
+    def update_later(self, section: str, guild_id: int, changes: dict) -> dict:
+        """Like `update()`, but the commit happens with the next flush.
+
+        The in-memory copy and subscribers see the change immediately.
+        """
+        conf = dict(self._data.get(section, {}).get(guild_id, {}))
+        _merge(conf, changes)
+        self._pending.setdefault((section, guild_id), {}).update(changes)
+        if self._dirty_since is None:
+            self._dirty_since = time.monotonic()
+        self._apply(section, guild_id, conf)
+        self._schedule_flush()
+        return dict(conf)
+
+    def _schedule_flush(self):
+        if self._flush_handle:
+            self._flush_handle.cancel()
+        # debounce, but never past max_flush_delay from the oldest change
+        deadline = self._dirty_since + self.max_flush_delay - time.monotonic()
+        self._flush_handle = asyncio.get_running_loop().call_later(
+            max(0.0, min(self.flush_delay, deadline)), self._start_flush
+        )
+
+    def _start_flush(self):
+        self._flush_handle = None
+        self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> bool:
+        """Commit every deferred change in one transaction. Returns False if it failed."""
+        if not self._pending:
+            return True
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            batch, self._pending = self._pending, {}
+            since, self._dirty_since = self._dirty_since, None
+            try:
+                await self._run(self._flush, batch)
+            except Exception as e:
+                print(f"Failed to commit {len(batch)} config row(s), retrying: {e!r}")
+                # changes made while this flush ran are newer and win
+                for key, changes in batch.items():
+                    self._pending[key] = {**changes, **self._pending.get(key, {})}
+                self._dirty_since = time.monotonic()
+                self._schedule_flush()
+                return False
+            FLUSH_DELAY.observe(time.monotonic() - since)
+            return True
+
+    def _flush(self, batch: Dict[Tuple[str, int], dict]):
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # merged into the stored row, so keys another process changed survive
+            for (section, guild_id), changes in batch.items():
+                row = conn.execute(
+                    "SELECT data FROM guild_config WHERE section = ? AND guild_id = ?", (section, guild_id)
+                ).fetchone()
+                conf = json.loads(row[0]) if row else {}
+                _merge(conf, changes)
+                conn.execute(
+                    "INSERT INTO guild_config (section, guild_id, data) VALUES (?, ?, ?)"
+                    " ON CONFLICT (section, guild_id) DO UPDATE SET data = excluded.data",
+                    (section, guild_id, json.dumps(conf)),
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # --------- external changes ---------
+    async def refresh(self) -> bool:
+        """Reload if another connection committed since we last looked.
+
+        Only guilds whose row actually changed are reported to subscribers.
+        Returns True if anything was reloaded.
+        """
+        await self.flush()
+        data = await self._run(self._reload_if_changed)
+        if data is None:
+            return False
+        # deferred changes made during the reload are still ours
+        for (section, guild_id), changes in self._pending.items():
+            rows = data.setdefault(section, {})
+            rows[guild_id] = conf = dict(rows.get(guild_id, {}))
+            _merge(conf, changes)
+        old = self._data
+        for section in set(old) | set(data):
+            old_rows = old.get(section, {})
+            new_rows = data.get(section, {})
+            for guild_id in set(old_rows) | set(new_rows):
+                if old_rows.get(guild_id) != new_rows.get(guild_id):
+                    self._apply(section, guild_id, new_rows.get(guild_id))
+        return True
+
+    def _reload_if_changed(self) -> Optional[Dict[str, Dict[int, dict]]]:
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return None
+        return self._read_all()
+
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Config store refresh failed: {e!r}")
+
+    # --------- shard status (shared by every process on this database) ---------
+    async def report_shards(self, shards: List[Tuple[int, Optional[float], int]]):
+        """Record (shard_id, latency, guild count) for the shards this process runs."""
+        await self._run(self._report_shards, shards, os.getpid(), time.time())
+
+    def _report_shards(self, shards, pid: int, now: float):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO shard_status (shard_id, pid, latency, guilds, updated_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (shard_id) DO UPDATE SET pid = excluded.pid, latency = excluded.latency,"
+                " guilds = excluded.guilds, updated_at = excluded.updated_at",
+                [(shard_id, pid, latency, guilds, now) for shard_id, latency, guilds in shards],
+            )
+
+    async def shard_statuses(self) -> List[dict]:
+        return await self._run(self._shard_statuses)
+
+    def _shard_statuses(self) -> List[dict]:
+        rows = self._conn.execute(
+            "SELECT shard_id, pid, latency, guilds, updated_at FROM shard_status ORDER BY shard_id"
+        ).fetchall()
+        keys = ("shard_id", "pid", "latency", "guilds", "updated_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    # --------- one-time JSON import ---------
+    async def migrate_json(self, section: str, path: str, convert: Callable = None) -> int:
+        """Import a legacy `{guild_id: conf}` JSON file into `section`, once.
+
+        The file is left on disk; a marker in the meta table stops it from
+        being imported again. Returns the number of guilds imported.
+        """
+        count = await self._run(self._migrate_json, section, path, convert)
+        if count:
+            self._data = await self._run(self._read_all)
+        return count
+
+    def _migrate_json(self, section: str, path: str, convert: Optional[Callable]) -> int:
+        conn = self._conn
+        marker = f"migrated:{section}"
+        # the marker check is inside the transaction so that several shard
+        # processes starting together import the file exactly once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+                conn.execute("ROLLBACK")
+                return 0
+            try:
+                with open(path, "r") as f:
+                    legacy = json.load(f)
+            except FileNotFoundError:
+                legacy = {}
+            except JSONDecodeError:
+                raise RuntimeError(f"{os.path.basename(path)} is not valid JSON, fix it or remove it before migrating")
+
+            for guild_id, conf in legacy.items():
+                if convert:
+                    conf = convert(conf)
+                conn.execute(
+                    "INSERT OR IGNORE INTO guild_config (section, guild_id, data) VALUES (?, ?, ?)",
+                    (section, int(guild_id), json.dumps(conf)),
+                )
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, path))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return len(legacy)
@@ -0,0 +1,84 @@
+from typing import Sequence, Tuple
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class Template:
+    """A placeholder template compiled down to a `str.format` pattern.
+
+    Placeholders are `{name}` with names from a fixed list; `{{` and `}}`
+    produce literal braces. Compiling rewrites every placeholder to its
+    position in that list, so rendering is one `str.format(*values)` call
+    instead of a chain of `str.replace`.
+    """
+
+    __slots__ = ("source", "_pattern", "placeholders")
+
+    def __init__(self, source: str, pattern: str, placeholders: Tuple[str, ...]):
+        self.source = source
+        self._pattern = pattern
+        self.placeholders = placeholders
+
+    def render(self, values: Sequence[str]) -> str:
+        return self._pattern.format(*values)
+
+
+def compile_template(text: str, names: Sequence[str], strict: bool = False) -> Template:
+    """Compile `text` against the allowed placeholder `names`.
+
+    With `strict=True`, unknown placeholders and stray braces raise
+    TemplateError; use it when a template is being set. Otherwise they are
+    kept as literal text, which is how templates saved before validation
+    existed have always rendered.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    out = []
+    used = []
+    unknown = []
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "{":
+            if text.startswith("{{", i):
+                out.append("{{")
+                i += 2
+                continue
+            end = text.find("}", i + 1)
+            nested = text.find("{", i + 1)
+            if end == -1 or nested != -1 and nested < end:
+                if strict:
+                    raise TemplateError(f"Unclosed `{{` at position {i + 1}. Use `{{{{` for a literal brace.")
+                out.append("{{")
+                i += 1
+                continue
+            name = text[i + 1:end]
+            if name in index:
+                out.append("{%d}" % index[name])
+                used.append(name)
+            else:
+                # unknown placeholders are kept verbatim (and reported when strict)
+                unknown.append(name)
+                out.append("{{" + name + "}}")
+            i = end + 1
+        elif ch == "}":
+            if text.startswith("}}", i):
+                i += 2
+            else:
+                if strict:
+                    raise TemplateError(f"Unmatched `}}` at position {i + 1}. Use `}}}}` for a literal brace.")
+                i += 1
+            out.append("}}")
+        else:
+            j = i
+            while j < n and text[j] not in "{}":
+                j += 1
+            out.append(text[i:j])
+            i = j
+
+    if unknown and strict:
+        listed = ", ".join(f"`{{{name}}}`" for name in dict.fromkeys(unknown))
+        raise TemplateError(f"Unknown placeholder(s): {listed}")
+    return Template(text, "".join(out), tuple(dict.fromkeys(used)))
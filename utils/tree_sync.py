@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+from json import JSONDecodeError
+from typing import Dict, Optional
+
+import discord
+from discord import app_commands
+
+
+def tree_hash(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """Hash of the command payload `tree.sync(guild=guild)` would upload."""
+    payload = [cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda c: (c.get("type", 1), c["name"]))
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class TreeSyncer:
+    """Syncs application commands only when they changed since the last sync.
+
+    Hashes of the last uploaded payloads are kept in a small JSON file,
+    keyed by application id and scope ("global" or a guild id), so a
+    restart or reconnect with unchanged commands costs no REST call.
+    """
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, JSONDecodeError):
+            return {}
+
+    def _save(self, state: Dict[str, str]):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp, self.state_path)
+
+    async def sync(self, client: discord.Client, force: bool = False, dev_guild_id: Optional[int] = None) -> bool:
+        """Sync globally, or only to `dev_guild_id` for instant updates while developing.
+
+        Returns True if commands were uploaded.
+        """
+        tree = client.tree
+        guild = None
+        if dev_guild_id:
+            guild = discord.Object(id=dev_guild_id)
+            tree.copy_global_to(guild=guild)
+
+        key = f"{client.application_id}:{dev_guild_id or 'global'}"
+        digest = tree_hash(tree, guild=guild)
+        state = self._load()
+        if not force and state.get(key) == digest:
+            return False
+
+        await tree.sync(guild=guild)
+        state[key] = digest
+        self._save(state)
+        return True
@@ -0,0 +1,13 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_pool(max_workers: int = 1) -> ProcessPoolExecutor:
+    """A process pool for CPU-heavy work (charts, images) off the event loop.
+
+    Workers are spawned, not forked: the bot process has threads (config
+    store, archive, metrics) that a forked child would inherit in whatever
+    state they were in. Spawned workers import the entry script again,
+    which is why main.py keeps all of its setup inside `main()`.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))